@@ -1,68 +1,111 @@
 #!/usr/bin/env python3
-
+"""
+Extract track page URLs from kworb artist pages and write them to a URL list.
+
+Pages are memory-mapped and scanned with a bytes regex across a pool of worker
+processes (see track_links.py). Results come back in page order; URLs are
+deduplicated in one streaming pass and written as they are found.
+
+Usage:
+  python3 extract_track_urls.py
+  python3 extract_track_urls.py --input-dir git_ignore/artists_songs_list --output git_ignore/songs_url_repo.txt
+  python3 extract_track_urls.py --archive git_ignore/page_archive --workers 4
+"""
+import argparse
 import os
-import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# Shared modules live with the other processor scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "processor-scripts"))
 
-def extract_track_urls():
-    """
-    Extract track URLs from all HTML files in the artists_songs_list directory
-    and write them to songs_url_repo.txt
-    """
-
-    # Define paths
-    artists_dir = Path("/Users/hojoon/Code/active/streams-chart/git_ignore/artists_songs_list")
-    output_file = Path("/Users/hojoon/Code/active/streams-chart/git_ignore/songs_url_repo.txt")
-
-    # Pattern to match the track links
-    # Looking for: <td class="text"><div><a href="../track/TRACK_ID.html">
-    pattern = r'<td class="text"><div><a href="\.\./track/([a-zA-Z0-9]+)\.html">'
-
-    all_urls = []
-
-    # Process each HTML file in the directory
-    for html_file in sorted(artists_dir.glob("*.html")):
-        try:
-            print(f"Processing: {html_file.name}")
-
-            with open(html_file, "r", encoding="utf-8") as f:
-                content = f.read()
+from ordered_pool import iter_chunks, map_chunks_in_order  # noqa: E402
+from page_archive import PageArchive  # noqa: E402
+from track_links import TRACK_URL_TEMPLATE, scan_bytes, scan_files  # noqa: E402
 
-            # Find all track IDs in the file
-            matches = re.findall(pattern, content)
+ARTISTS_DIR = "git_ignore/artists_songs_list"
+OUTPUT_FILE = "git_ignore/songs_url_repo.txt"
 
-            # Convert to full URLs
-            for track_id in matches:
-                url = f"https://kworb.net/spotify/track/{track_id}.html"
-                all_urls.append(url)
 
-            print(f"Found {len(matches)} tracks in {html_file.name}")
-
-        except Exception as e:
-            print(f"Error processing {html_file.name}: {e}")
+def iter_track_ids(artists_dir, archive_dir=None, workers=1, chunk_size=256):
+    """
+    Yield (name, track IDs, links found, error) for each artist page, in a stable order.
 
-    # Remove duplicates while preserving order
+    Loose files are scanned by `workers` processes, `chunk_size` files per
+    task, and IDs already seen earlier in a chunk are left out; pages from a
+    page archive are decompressed and scanned here.
+    """
+    if archive_dir:
+        with PageArchive(archive_dir) as archive:
+            for url, data in archive.iter_page_bytes():
+                if url.endswith("_songs.html"):
+                    track_ids = scan_bytes(data)
+                    yield url, track_ids, len(track_ids), None
+        return
+
+    paths = sorted(str(path) for path in Path(artists_dir).glob("*.html"))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = map_chunks_in_order(executor, scan_files, iter_chunks(paths, chunk_size), workers * 4)
+            for path, track_ids, links, error in results:
+                yield os.path.basename(path), track_ids, links, error
+    else:
+        for chunk in iter_chunks(paths, chunk_size):
+            for path, track_ids, links, error in scan_files(chunk):
+                yield os.path.basename(path), track_ids, links, error
+
+
+def extract_track_urls(
+    artists_dir=ARTISTS_DIR, output_file=OUTPUT_FILE, archive_dir=None, workers=1, progress_every=10000
+):
+    """
+    Extract track URLs from all HTML files in `artists_dir` (or the artist
+    pages of a page archive) and write them to `output_file`, first
+    occurrence first.
+    """
     seen = set()
-    unique_urls = []
-    for url in all_urls:
-        if url not in seen:
-            seen.add(url)
-            unique_urls.append(url)
-
-    # Write to output file
-    try:
-        with open(output_file, "w", encoding="utf-8") as f:
-            for url in unique_urls:
-                f.write(url + "\n")
-
-        print(f"\nSuccessfully extracted {len(unique_urls)} unique track URLs")
-        print(f"Results written to: {output_file}")
-        print(f"Total files processed: {len(list(artists_dir.glob('*.html')))}")
-
-    except Exception as e:
-        print(f"Error writing to output file: {e}")
+    processed_files = 0
+    found_links = 0
+    errors = 0
+    started = time.monotonic()
+
+    # Written to a temporary file and moved into place, so an interrupted run keeps the old list
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for name, track_ids, links, error in iter_track_ids(artists_dir, archive_dir, workers):
+            processed_files += 1
+            if error:
+                errors += 1
+                print(f"Error processing {name}: {error}")
+                continue
+
+            found_links += links
+            for track_id in track_ids:
+                if track_id not in seen:
+                    seen.add(track_id)
+                    f.write(TRACK_URL_TEMPLATE.format(track_id) + "\n")
+
+            if processed_files % progress_every == 0:
+                rate = processed_files / max(time.monotonic() - started, 1e-9)
+                print(f"  {processed_files:,} files ({rate:,.0f}/s), {len(seen):,} unique track URLs")
+    os.replace(tmp_file, output_file)
+
+    print(f"\nSuccessfully extracted {len(seen)} unique track URLs")
+    print(f"Results written to: {output_file}")
+    print(f"Total files processed: {processed_files}")
+    print(f"Track links found: {found_links}")
+    if errors:
+        print(f"Files with errors: {errors}")
 
 
 if __name__ == "__main__":
-    extract_track_urls()
+    parser = argparse.ArgumentParser(description="Extract track URLs from kworb artist pages")
+    parser.add_argument("--input-dir", default=ARTISTS_DIR, help=f"Directory of artist pages (default: {ARTISTS_DIR})")
+    parser.add_argument("--output", default=OUTPUT_FILE, help=f"URL list to write (default: {OUTPUT_FILE})")
+    parser.add_argument("--archive", metavar="DIR", help="Read pages from a page archive instead of loose files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scanner processes (default: CPU count)")
+    args = parser.parse_args()
+
+    extract_track_urls(args.input_dir, args.output, archive_dir=args.archive, workers=args.workers)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Parser backends for kworb artist catalog pages ("<artist> - Spotify Top Songs").
+
+Every backend pulls the same raw pieces out of a page: the <title> text and,
+for each row of the `addpos sortable` table, the first link's href and text
+plus the text of the second and third cells. The shared code below turns
+those into the artist record, so all backends produce identical output:
+
+  bs4         BeautifulSoup with html.parser (the original implementation)
+  lxml        lxml.html tree
+  selectolax  selectolax tree (lexbor, or Modest on selectolax < 1.0)
+  scan        regex scanner that only tokenizes the songs table; no tree
+
+lxml and selectolax are optional; `available_parsers()` lists the usable ones.
+Check a backend against bs4 with bench_artist_parsers.py.
+"""
+import html
+import re
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+DEFAULT_PARSER = "bs4"
+
+TITLE_ARTIST_PATTERN = re.compile(r"(.*?) - Spotify Top Songs")
+ARTIST_ID_PATTERN = re.compile(r'/spotify/artist/([^_]+)_songs\.html">Songs</a>')
+TRACK_ID_PATTERN = re.compile(r'https://open\.spotify\.com/track/([^"]+)')
+TBODY_PATTERN = re.compile(r"<tbody\b", re.IGNORECASE)
+
+
+def _bs4_extract(content):
+    soup = BeautifulSoup(content, "html.parser")
+
+    title_tag = soup.find("title")
+    title = title_tag.get_text() if title_tag else None
+
+    table = soup.find("table", class_="addpos sortable")
+    if not table:
+        return title, None
+
+    rows = []
+    tbody = table.find("tbody")
+    for row in tbody.find_all("tr") if tbody else []:
+        cells = row.find_all("td")
+        if len(cells) < 3:
+            continue
+        track_link = cells[0].find("a")
+        if not track_link:
+            continue
+        rows.append((track_link.get("href", ""), track_link.get_text(), cells[1].get_text(), cells[2].get_text()))
+    return title, rows
+
+
+def _lxml_extract(content):
+    document = lxml.html.document_fromstring(content)
+
+    title_tag = next(document.iter("title"), None)
+    title = title_tag.text_content() if title_tag is not None else None
+
+    table = next((t for t in document.iter("table") if t.get("class") == "addpos sortable"), None)
+    if table is None:
+        return title, None
+
+    rows = []
+    tbody = next(table.iter("tbody"), None)
+    for row in tbody.iter("tr") if tbody is not None else []:
+        cells = list(row.iter("td"))
+        if len(cells) < 3:
+            continue
+        track_link = next(cells[0].iter("a"), None)
+        if track_link is None:
+            continue
+        rows.append(
+            (track_link.get("href", ""), track_link.text_content(), cells[1].text_content(), cells[2].text_content())
+        )
+    return title, rows
+
+
+def _selectolax_extract(content):
+    tree = SelectolaxParser(content)
+
+    title_tag = tree.css_first("title")
+    title = title_tag.text() if title_tag is not None else None
+
+    table = tree.css_first('table[class="addpos sortable"]')
+    if table is None:
+        return title, None
+
+    # An HTML5 parser adds a <tbody> that html.parser would not have seen
+    tbody = table.css_first("tbody") if TBODY_PATTERN.search(content) else None
+    rows = []
+    for row in tbody.css("tr") if tbody is not None else []:
+        cells = row.css("td")
+        if len(cells) < 3:
+            continue
+        track_link = cells[0].css_first("a")
+        if track_link is None:
+            continue
+        rows.append(
+            (track_link.attributes.get("href") or "", track_link.text(), cells[1].text(), cells[2].text())
+        )
+    return title, rows
+
+
+SCAN_TITLE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+SCAN_TABLE = re.compile(r"""<table\b[^>]*\bclass\s*=\s*(["'])addpos sortable\1[^>]*>""", re.IGNORECASE)
+SCAN_TABLE_END = re.compile(r"</table\s*>", re.IGNORECASE)
+SCAN_TBODY = re.compile(r"<tbody\b[^>]*>(.*?)(?:</tbody\s*>|</table\s*>|$)", re.IGNORECASE | re.DOTALL)
+SCAN_ROW = re.compile(r"<tr\b[^>]*>(.*?)(?=<tr\b|</tr\s*>|$)", re.IGNORECASE | re.DOTALL)
+SCAN_CELL = re.compile(r"<td\b[^>]*>(.*?)(?:</td\s*>|(?=<td\b)|$)", re.IGNORECASE | re.DOTALL)
+SCAN_LINK = re.compile(r"<a\b([^>]*)>(.*?)</a\s*>", re.IGNORECASE | re.DOTALL)
+SCAN_HREF = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+SCAN_TAG = re.compile(r"<[^>]*>")
+
+
+def _scan_text(fragment):
+    return html.unescape(SCAN_TAG.sub("", fragment))
+
+
+def _scan_extract(content):
+    title_match = SCAN_TITLE.search(content)
+    title = _scan_text(title_match.group(1)) if title_match else None
+
+    table_match = SCAN_TABLE.search(content)
+    if not table_match:
+        return title, None
+
+    # Only this table's body counts, not the rows of a later table
+    table_end = SCAN_TABLE_END.search(content, table_match.end())
+    end = table_end.start() if table_end else len(content)
+
+    rows = []
+    tbody_match = SCAN_TBODY.search(content, table_match.end(), end)
+    for row_match in SCAN_ROW.finditer(tbody_match.group(1)) if tbody_match else []:
+        cells = SCAN_CELL.findall(row_match.group(1))
+        if len(cells) < 3:
+            continue
+        link_match = SCAN_LINK.search(cells[0])
+        if not link_match:
+            continue
+        href_match = SCAN_HREF.search(link_match.group(1))
+        href = html.unescape(next(value for value in href_match.groups() if value is not None)) if href_match else ""
+        rows.append((href, _scan_text(link_match.group(2)), _scan_text(cells[1]), _scan_text(cells[2])))
+    return title, rows
+
+
+# name -> (extract function, module it needs or None when always usable)
+PARSERS = {
+    "bs4": (_bs4_extract, "BeautifulSoup"),
+    "lxml": (_lxml_extract, "lxml"),
+    "selectolax": (_selectolax_extract, "SelectolaxParser"),
+    "scan": (_scan_extract, None),
+}
+
+
+def available_parsers():
+    """Names of the backends whose libraries are installed."""
+    return [name for name, (_, needs) in PARSERS.items() if needs is None or globals()[needs] is not None]
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_artist_html(content, html_file_path, parser=DEFAULT_PARSER):
+    """
+    Extract artist and song data from the HTML of an artist page.
+
+    Args:
+        content: Page HTML
+        html_file_path: Name of the page in messages
+        parser: Backend name, one of PARSERS
+
+    Returns:
+        Dictionary with the artist's name, ID and songs, or None when the
+        page does not look like an artist catalog
+    """
+    if parser not in available_parsers():
+        raise ValueError(f"Parser {parser!r} is not available (available: {', '.join(available_parsers())})")
+
+    extract, _ = PARSERS[parser]
+    title_text, rows = extract(content)
+
+    if title_text is None:
+        print(f"No title tag found in {html_file_path}")
+        return None
+
+    artist_match = TITLE_ARTIST_PATTERN.search(title_text)
+    if not artist_match:
+        print(f"Could not extract artist name from title: {title_text}")
+        return None
+
+    artist_name = artist_match.group(1).strip()
+
+    artist_id_match = ARTIST_ID_PATTERN.search(content)
+    if not artist_id_match:
+        print(f"Could not extract artist ID from {html_file_path}")
+        return None
+
+    artist_id = artist_id_match.group(1)
+
+    if rows is None:
+        print(f"No songs table found in {html_file_path}")
+        return None
+
+    songs_data = []
+    for track_url, track_name, total_streams, daily_streams in rows:
+        track_id_match = TRACK_ID_PATTERN.search(track_url)
+        if not track_id_match:
+            continue
+
+        songs_data.append(
+            {
+                "artist": artist_name,
+                "artistId": artist_id,
+                "trackName": track_name.strip(),
+                "trackId": track_id_match.group(1),
+                "total": _to_int(total_streams.strip().replace(",", "")),
+                "daily": _to_int(daily_streams.strip().replace(",", "")),
+            }
+        )
+
+    return {"artist": artist_name, "artistId": artist_id, "songs": songs_data}
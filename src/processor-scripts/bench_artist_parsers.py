@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Check that every artist page parser backend matches bs4, and time them.
+
+Runs on synthetic pages from kworb_fixture.py plus a set of awkward edge-case
+pages, and on real downloaded pages when --input-dir or --archive is given.
+Any page where a backend's output differs from bs4's is reported and the
+script exits with status 1.
+
+Usage:
+  python3 bench_artist_parsers.py --pages 200
+  python3 bench_artist_parsers.py --input-dir ../../git_ignore/kworb_artist_songs --limit 500
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from artist_parsers import DEFAULT_PARSER, available_parsers, parse_artist_html
+from extract_artist_songs import iter_source_pages
+from kworb_fixture import artist_songs_page
+
+NAV = '<a href="ABC123.html">Overview</a> | <a href="/spotify/artist/ABC123_songs.html">Songs</a>'
+ROW = '<tr><td class="text"><div><a href="https://open.spotify.com/track/{}">{}</a></div></td><td>{}</td><td>{}</td></tr>'
+
+
+def edge_case_page(title, body):
+    return f"<html><head><title>{title}</title></head><body>{NAV}{body}</body></html>"
+
+
+EDGE_CASES = {
+    "entities": edge_case_page(
+        "Beyonc&eacute; &amp; Friends - Spotify Top Songs",
+        '<table class="addpos sortable"><tbody>'
+        + ROW.format("t1?si=x&amp;y=1", "Caf&eacute; &lt;Live&gt; &#39;99", "1,234", "56")
+        + ROW.format("t2", "<span>Nested</span> <b>tags</b>", " 7,000 ", "")
+        + ROW.format("t3", "Dash &ndash; Title", "N/A", "-")
+        + "</tbody></table>",
+    ),
+    "short_rows_and_missing_links": edge_case_page(
+        "Someone - Spotify Top Songs",
+        '<table class="addpos sortable"><tbody>'
+        "<tr><td>only</td><td>two</td></tr>"
+        '<tr><td class="text">no link</td><td>1</td><td>2</td></tr>'
+        '<tr><td><a href="https://example.com/x">Elsewhere</a></td><td>1</td><td>2</td></tr>'
+        + ROW.format("t4", "Kept", "10", "20")
+        + "</tbody></table>",
+    ),
+    "no_tbody": edge_case_page(
+        "Someone - Spotify Top Songs", '<table class="addpos sortable">' + ROW.format("t5", "Lost", "1", "2") + "</table>"
+    ),
+    "no_tbody_then_other_table": edge_case_page(
+        "Someone - Spotify Top Songs",
+        '<table class="addpos sortable">' + ROW.format("t7", "Lost", "1", "2") + "</table>"
+        '<table class="sortable"><tbody>' + ROW.format("x", "Other", "1", "2") + "</tbody></table>",
+    ),
+    "other_tables_first": edge_case_page(
+        "Someone - Spotify Top Songs",
+        '<table class="sortable"><tbody>' + ROW.format("x", "Wrong", "1", "2") + "</tbody></table>"
+        '<table class="addpos sortable"><thead><tr><th>Song</th><th>Streams</th><th>Daily</th></tr></thead><tbody>'
+        + ROW.format("t6", "Right", "3", "4")
+        + "</tbody></table>",
+    ),
+    "no_table": edge_case_page("Someone - Spotify Top Songs", "<p>Nothing here</p>"),
+    "bad_title": edge_case_page("Someone - Spotify Chart History", ""),
+    "no_title": f"<html><body>{NAV}</body></html>",
+}
+
+
+def quiet_parse(content, name, parser):
+    # Failure messages are part of the normal output; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_artist_html(content, name, parser)
+
+
+def collect_pages(args):
+    pages = [(f"fixture_{i}", artist_songs_page(f"Fixture{i:017d}")) for i in range(args.pages)]
+    pages += list(EDGE_CASES.items())
+    if args.input_dir or args.archive:
+        for i, page in enumerate(iter_source_pages(args.input_dir, args.archive)):
+            if args.limit and i >= args.limit:
+                break
+            pages.append(page)
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare and time the artist page parser backends")
+    parser.add_argument("--pages", type=int, default=100, help="Synthetic fixture pages to include")
+    parser.add_argument("--input-dir", help="Directory of downloaded artist pages to include")
+    parser.add_argument("--archive", metavar="DIR", help="Page archive to read artist pages from")
+    parser.add_argument("--limit", type=int, help="Real pages to include at most")
+    parser.add_argument("--parsers", nargs="+", help="Backends to test (default: all installed)")
+    args = parser.parse_args()
+
+    parsers = args.parsers or available_parsers()
+    pages = collect_pages(args)
+    total_bytes = sum(len(content.encode("utf-8")) for _, content in pages)
+    print(f"Pages: {len(pages):,} ({total_bytes / len(pages) / 1024:.1f} KiB average)")
+
+    expected = {name: quiet_parse(content, name, DEFAULT_PARSER) for name, content in pages}
+
+    timings = {}
+    mismatches = 0
+    for backend in parsers:
+        started = time.perf_counter()
+        results = {name: quiet_parse(content, name, backend) for name, content in pages}
+        timings[backend] = time.perf_counter() - started
+
+        for name, _ in pages:
+            if results[name] != expected[name]:
+                mismatches += 1
+                print(f"✗ {backend}: output differs from {DEFAULT_PARSER} on {name}")
+
+    baseline = timings.get(DEFAULT_PARSER)
+    print(f"\n{'Parser':<12}{'ms/page':>10}{'speedup':>10}")
+    for backend in parsers:
+        per_page = timings[backend] / len(pages) * 1000
+        speedup = f"{baseline / timings[backend]:.1f}x" if baseline else "-"
+        print(f"{backend:<12}{per_page:>10.2f}{speedup:>10}")
+
+    if mismatches:
+        print(f"\n{mismatches} mismatches")
+        sys.exit(1)
+    print("\nAll backends match")
+
+
+if __name__ == "__main__":
+    main()
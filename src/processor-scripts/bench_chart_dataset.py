@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compare loading chart data from the country JSON files with the Parquet dataset.
+
+Builds both outputs of process_charts.py (--format both) from a synthetic
+charts.csv, or uses existing ones, then times:
+
+  full     json.load of every country file vs one scan of the dataset
+  country  json.load of one country file vs reading its partition
+  week     json.load of every file and filtering vs reading one week
+
+Row counts are checked to agree.
+
+Usage:
+  python3 bench_chart_dataset.py --rows 1000000
+  python3 bench_chart_dataset.py --json-dir ../../output/countries --dataset-dir ../../output/charts_dataset
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from chart_dataset import chart_week, load_charts, parse_chart_date
+from chart_fixture import write_charts_csv
+from process_charts import process_csv_to_json
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_all_json(json_dir):
+    return [load_json(path) for path in sorted(glob.glob(os.path.join(json_dir, "*.json")))]
+
+
+def load_country_json(json_dir, country):
+    return load_json(os.path.join(json_dir, f"{country}.json"))
+
+
+def load_week_json(json_dir, week):
+    rows = []
+    for document in load_all_json(json_dir):
+        for row in document["chart_data"]:
+            day = parse_chart_date(row["date"])
+            if day is not None and chart_week(day).isoformat() == week:
+                rows.append(row)
+    return rows
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run(json_dir, dataset_dir, country, week):
+    print(f"JSON files: {directory_size(json_dir) / 1e6:,.1f} MB, dataset: {directory_size(dataset_dir) / 1e6:,.1f} MB")
+    failed = False
+    cases = [
+        ("full", lambda: sum(len(d["chart_data"]) for d in load_all_json(json_dir)), lambda: load_charts(dataset_dir)),
+        (
+            f"country={country}",
+            lambda: len(load_country_json(json_dir, country)["chart_data"]),
+            lambda: load_charts(dataset_dir, country=country),
+        ),
+        (f"week={week}", lambda: len(load_week_json(json_dir, week)), lambda: load_charts(dataset_dir, week=week)),
+    ]
+    for name, from_json, from_dataset in cases:
+        json_rows, json_time = timed(from_json)
+        table, dataset_time = timed(from_dataset)
+        same = json_rows == table.num_rows
+        failed = failed or not same
+        print(
+            f"  {name:<20} json {json_time:7.3f}s  parquet {dataset_time:7.3f}s  "
+            f"{json_time / dataset_time:6.1f}x  {json_rows:,} rows {'ok' if same else f'MISMATCH ({table.num_rows:,})'}"
+        )
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the chart Parquet dataset against the country JSON files")
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows in the synthetic charts.csv (default: %(default)s)")
+    parser.add_argument("--json-dir", help="Existing country JSON directory")
+    parser.add_argument("--dataset-dir", help="Existing dataset directory")
+    parser.add_argument("--country", default="us", help="Country for the single-country case (default: %(default)s)")
+    parser.add_argument("--week", default="2017-01-05", help="Week for the single-week case (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.json_dir and args.dataset_dir:
+        failed = run(args.json_dir, args.dataset_dir, args.country, args.week)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "charts.csv")
+            json_dir = os.path.join(tmp, "countries")
+            dataset_dir = os.path.join(tmp, "dataset")
+            write_charts_csv(csv_path, args.rows, countries=16)
+            with contextlib.redirect_stdout(io.StringIO()):
+                process_csv_to_json(csv_path, json_dir, output_format="both", dataset_dir=dataset_dir)
+            failed = run(json_dir, dataset_dir, args.country, args.week)
+    sys.exit(1 if failed else 0)
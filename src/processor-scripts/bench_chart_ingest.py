@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Time the chart_ingest engines against the csv.DictReader row loop.
+
+Two workloads, each checked against the DictReader result (exit status 1 on
+any difference):
+
+  all     every row converted as process_charts.py does it
+  global  only global rows, converted as filter_global_charts.py does it
+
+Runs on a synthetic charts.csv from chart_fixture.py unless --input is given;
+the synthetic file for the global workload also has truncated non-global rows,
+which filter_global_charts.py skips.
+--workers times each engine again with that many parser processes reading
+byte ranges of the file, to show how the parallel read scales.
+
+Usage:
+  python3 bench_chart_ingest.py --rows 500000
+  python3 bench_chart_ingest.py --input ../../git_ignore/charts.csv --engines arrow,python
+  python3 bench_chart_ingest.py --rows 2000000 --workers 2,4,8
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from chart_fixture import write_charts_csv
+from chart_ingest import CHART_COLUMNS, available_engines, read_chunks
+from filter_global_charts import int_or_error, list_or_error
+from process_charts import flag_or_text, int_or_text, parse_list_string
+
+
+def dictreader_all(path):
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            rows.append(
+                (
+                    row["date"],
+                    row["country"],
+                    int(row["position"]) if row["position"].isdigit() else row["position"],
+                    int(row["streams"]) if row["streams"].isdigit() else row["streams"],
+                    row["track_id"],
+                    parse_list_string(row["artists"]),
+                    parse_list_string(row["artist_genres"]),
+                    int(row["duration"]) if row["duration"].isdigit() else row["duration"],
+                    (
+                        row["explicit"].lower() == "true"
+                        if row["explicit"].lower() in ["true", "false"]
+                        else row["explicit"]
+                    ),
+                    row["name"],
+                )
+            )
+    return rows
+
+
+def ingest_all(path, engine, workers=1):
+    rows = []
+    list_cache = {}
+    for chunk in read_chunks(path, CHART_COLUMNS, engine, workers=workers):
+        rows.extend(
+            zip(
+                chunk.text("date"),
+                chunk.text("country"),
+                chunk.ints("position", int_or_text),
+                chunk.ints("streams", int_or_text),
+                chunk.text("track_id"),
+                chunk.decoded("artists", parse_list_string, list_cache),
+                chunk.decoded("artist_genres", parse_list_string, list_cache),
+                chunk.ints("duration", int_or_text),
+                chunk.flags("explicit", flag_or_text),
+                chunk.text("name"),
+            )
+        )
+    return rows
+
+
+def dictreader_global(path):
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["country"] != "global":
+                continue
+            rows.append(
+                (
+                    row["date"],
+                    int_or_error(row["position"]),
+                    int_or_error(row["streams"]),
+                    list_or_error(row["artists"]),
+                    row["explicit"].lower() == "true",
+                    row["name"],
+                )
+            )
+    return rows
+
+
+def ingest_global(path, engine, workers=1):
+    rows = []
+    list_cache = {}
+    for chunk in read_chunks(path, CHART_COLUMNS, engine, workers=workers, where=("country", "global")):
+        rows.extend(
+            zip(
+                chunk.text("date"),
+                chunk.ints("position", int_or_error),
+                chunk.ints("streams", int_or_error),
+                chunk.decoded("artists", list_or_error, list_cache),
+                chunk.flags("explicit", lambda text: text.lower() == "true"),
+                chunk.text("name"),
+            )
+        )
+    return rows
+
+
+def comparable(rows):
+    # Parse errors are compared by message; exception objects never compare equal
+    return [tuple(repr(value) if isinstance(value, Exception) else value for value in row) for row in rows]
+
+
+def timed(fn, *args, repeat=1):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run(path, engines, repeat, worker_counts=(), global_path=None):
+    total_rows = sum(1 for _ in read_chunks(path, ["country"], "python") for _ in range(1))
+    failed = False
+
+    for workload, workload_path, baseline, ingest in (
+        ("all", path, dictreader_all, ingest_all),
+        ("global", global_path or path, dictreader_global, ingest_global),
+    ):
+        size_mb = os.path.getsize(workload_path) / 1e6
+        expected, base_time = timed(baseline, workload_path, repeat=repeat)
+        expected = comparable(expected)
+        print(f"\n{workload}: {len(expected):,} rows of {workload_path} ({size_mb:,.1f} MB)")
+        print(f"  {'dictreader':<11} {base_time:7.2f}s  {size_mb / base_time:7.1f} MB/s")
+        for engine in engines:
+            for workers in (1, *worker_counts):
+                rows, elapsed = timed(ingest, workload_path, engine, workers, repeat=repeat)
+                same = comparable(rows) == expected
+                failed = failed or not same
+                label = engine if workers == 1 else f"{engine} x{workers}"
+                print(
+                    f"  {label:<11} {elapsed:7.2f}s  {size_mb / elapsed:7.1f} MB/s  "
+                    f"{base_time / elapsed:5.1f}x  {'ok' if same else 'MISMATCH'}"
+                )
+    return total_rows, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chart_ingest engines against csv.DictReader")
+    parser.add_argument("--input", help="charts.csv to read (default: a synthetic file)")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the synthetic file (default: %(default)s)")
+    parser.add_argument("--engines", default=",".join(available_engines()), help="Comma separated (default: all available)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement; the best is shown")
+    parser.add_argument("--workers", default="", help="Comma separated parser process counts to time as well, e.g. 2,4,8")
+    args = parser.parse_args()
+    worker_counts = [int(count) for count in args.workers.split(",") if count and int(count) > 1]
+
+    engines = [engine for engine in args.engines.split(",") if engine]
+    unknown = [engine for engine in engines if engine not in available_engines()]
+    if unknown:
+        parser.error(f"unavailable engines: {', '.join(unknown)} (available: {', '.join(available_engines())})")
+
+    if args.input:
+        _, failed = run(args.input, engines, args.repeat, worker_counts)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "charts.csv")
+            global_path = os.path.join(tmp, "charts_truncated.csv")
+            write_charts_csv(path, args.rows, countries=16, awkward=0.01)
+            write_charts_csv(global_path, args.rows, countries=16, awkward=0.01, truncate=True)
+            _, failed = run(path, engines, args.repeat, worker_counts, global_path)
+    sys.exit(1 if failed else 0)
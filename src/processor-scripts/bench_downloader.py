@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark the download engine against the local kworb fixture.
+
+Starts kworb_fixture.py in a separate process, then runs the same
+download_tracking_files() call the entry points make (scrape_data.py for
+artist pages, download_songs_urls.py for track pages) on a temporary copy of
+the tracking files. Reports pages/sec, p50/p99 request latency, retries and
+the statuses the fixture served. Nothing touches kworb.net.
+
+Usage:
+  python3 bench_downloader.py --pages 2000 --latency 0.05 --concurrency 16
+  python3 bench_downloader.py --target tracks --rate-limit 0.02 --max-rps 40
+  python3 bench_downloader.py --stream --pages 500
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from download_engine import download_tracking_files
+from kworb_fixture import ID_ALPHABET, FixtureConfig, make_server
+from stream_pipeline import RecordWriter, StreamingParser
+
+TARGET_PATHS = {
+    "artists": "/spotify/artist/{}_songs.html",
+    "tracks": "/spotify/track/{}.html",
+}
+
+
+def serve_fixture(config_kwargs, port_queue, stop_event, stats_queue):
+    """Run the fixture until `stop_event` is set, then report what it served."""
+    config = FixtureConfig(**config_kwargs)
+    server = make_server(config=config)
+    port_queue.put(server.server_port)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        import threading
+
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        stop_event.wait()
+        server.shutdown()
+    stats_queue.put({"requests": config.requests, "statuses": config.statuses})
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_urls(base_url, target, pages, seed=0):
+    rng = random.Random(seed)
+    path = TARGET_PATHS[target]
+    return [base_url + path.format("".join(rng.choice(ID_ALPHABET) for _ in range(22))) for _ in range(pages)]
+
+
+def run_benchmark(args):
+    config_kwargs = {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit,
+        "max_rps": args.max_rps,
+        "retry_after": args.retry_after,
+    }
+    port_queue = multiprocessing.Queue()
+    stats_queue = multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=serve_fixture, args=(config_kwargs, port_queue, stop_event, stats_queue), daemon=True
+    )
+    server.start()
+    port = port_queue.get(timeout=10)
+
+    urls = make_urls(f"http://127.0.0.1:{port}", args.target, args.pages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        to_download = os.path.join(tmp, "x_to_download.txt")
+        with open(to_download, "w") as f:
+            f.write("\n".join(urls) + "\n")
+
+        page_sink = None
+        if args.stream:
+            writer = RecordWriter(
+                artists_dir=os.path.join(tmp, "artists-songs"),
+                track_urls_file=os.path.join(tmp, "track_urls.txt"),
+            )
+            page_sink = StreamingParser(writer, workers=args.parser_workers)
+
+        # The engine prints a line per URL; keep it out of the report
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            engine = download_tracking_files(
+                to_download,
+                os.path.join(tmp, "y_downloaded.txt"),
+                os.path.join(tmp, "z_error.txt"),
+                os.path.join(tmp, "html"),
+                os.path.join(tmp, "queue.sqlite3"),
+                archive_dir=os.path.join(tmp, "archive") if args.archive else None,
+                page_sink=page_sink,
+                save_pages=not args.stream,
+                concurrency=args.concurrency,
+                rate_per_host=args.rate,
+                max_rate=args.max_rate,
+                max_attempts=args.max_attempts,
+            )
+        elapsed = time.perf_counter() - started
+
+    stop_event.set()
+    fixture_stats = stats_queue.get(timeout=10)
+    server.join(timeout=10)
+
+    completed = engine.downloaded + engine.not_modified
+    print(f"Target: {args.target} ({args.pages} pages{', streaming' if args.stream else ''})")
+    print(f"Elapsed: {elapsed:.2f}s")
+    print(f"Pages/sec: {completed / elapsed:.1f}")
+    print(f"Latency p50: {percentile(engine.latencies, 50) * 1000:.1f} ms")
+    print(f"Latency p99: {percentile(engine.latencies, 99) * 1000:.1f} ms")
+    print(f"Retries: {engine.retries}")
+    print(f"Errors: {engine.errors}")
+    if args.stream:
+        print(f"Parsed: {writer.artists_written} artists, {writer.failed} failed, {writer.track_urls_added} track URLs")
+    print(f"Fixture: {fixture_stats['requests']} requests, statuses {dict(sorted(fixture_stats['statuses'].items()))}")
+    engine.print_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the downloader against a local kworb fixture")
+    parser.add_argument("--target", choices=sorted(TARGET_PATHS), default="artists")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--stream", action="store_true", help="Parse pages as they arrive (artist pages)")
+    parser.add_argument("--archive", action="store_true", help="Store pages in a page archive")
+    parser.add_argument("--parser-workers", type=int)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0)
+    parser.add_argument("--max-rate", type=float, default=20.0)
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fixture mean response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fixture probability of a 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fixture probability of a 429")
+    parser.add_argument("--max-rps", type=float, help="Fixture returns 429 above this many requests per second")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
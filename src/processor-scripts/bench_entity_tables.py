@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compare the country JSON files with the entity-encoded ones (entity_tables.py).
+
+Builds both outputs of process_charts.py (--entities) from a synthetic
+charts.csv, or uses existing ones, then:
+
+  - checks every encoded entry expands back to its country JSON entry
+  - measures the memory held by json.load of all country files against the
+    encoded loaders (tracemalloc), and the load times
+
+Exit status is 1 if any entry differs.
+
+Usage:
+  python3 bench_entity_tables.py --rows 500000
+  python3 bench_entity_tables.py --json-dir ../../output/countries --entities-dir ../../output/countries_entities
+"""
+import argparse
+import contextlib
+import gc
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from chart_fixture import write_charts_csv
+from entity_tables import load_entity_entries, load_entity_tables
+from process_charts import process_csv_to_json
+
+
+def country_names(json_dir):
+    return sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(json_dir, "*.json")))
+
+
+def load_json(json_dir, countries):
+    documents = {}
+    for country in countries:
+        with open(os.path.join(json_dir, f"{country}.json"), encoding="utf-8") as f:
+            documents[country] = json.load(f)
+    return documents
+
+
+def load_encoded(entities_dir, countries):
+    tables = load_entity_tables(os.path.join(entities_dir, "entities.json"))
+    columns = {country: load_entity_entries(os.path.join(entities_dir, f"{country}.json"), "chart_data")[1] for country in countries}
+    return tables, columns
+
+
+def measured(fn, *args):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, held
+
+
+def expand(tables, columns, index):
+    track = tables.track(columns["track"][index])
+    return {
+        "date": columns["date"][index],
+        "position": columns["position"][index],
+        "streams": columns["streams"][index],
+        "track_id": track["track_id"],
+        "artists": track["artists"],
+        "artist_genres": track["genres"],
+        "duration": track["duration_ms"],
+        "explicit": track["explicit"],
+        "name": track["track_name"],
+    }
+
+
+def run(json_dir, entities_dir):
+    countries = country_names(json_dir)
+    documents, json_time, json_memory = measured(load_json, json_dir, countries)
+    (tables, columns), encoded_time, encoded_memory = measured(load_encoded, entities_dir, countries)
+
+    mismatches = 0
+    rows = 0
+    for country in countries:
+        chart_data = documents[country]["chart_data"]
+        rows += len(chart_data)
+        if len(chart_data) != len(columns[country]):
+            mismatches += 1
+            continue
+        for index, entry in enumerate(chart_data):
+            if expand(tables, columns[country], index) != entry:
+                mismatches += 1
+
+    size = sum(os.path.getsize(os.path.join(json_dir, f"{country}.json")) for country in countries)
+    encoded_size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(entities_dir, "*.json")))
+    print(f"{len(countries)} countries, {rows:,} entries, {len(tables):,} tracks")
+    print(f"  {'':<8} {'on disk':>10} {'in memory':>10} {'load':>8}")
+    print(f"  {'json':<8} {size / 1e6:8.1f}MB {json_memory / 1e6:8.1f}MB {json_time:7.2f}s")
+    print(f"  {'encoded':<8} {encoded_size / 1e6:8.1f}MB {encoded_memory / 1e6:8.1f}MB {encoded_time:7.2f}s")
+    print(f"  {size / encoded_size:.1f}x smaller on disk, {json_memory / encoded_memory:.1f}x less memory")
+    print("  entries: " + (f"{mismatches} MISMATCHES" if mismatches else "identical"))
+    return bool(mismatches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare country JSON files with their entity-encoded form")
+    parser.add_argument("--rows", type=int, default=300_000, help="Rows in the synthetic charts.csv (default: %(default)s)")
+    parser.add_argument("--json-dir", help="Existing country JSON directory")
+    parser.add_argument("--entities-dir", help="Existing entity-encoded directory")
+    args = parser.parse_args()
+
+    if args.json_dir and args.entities_dir:
+        failed = run(args.json_dir, args.entities_dir)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "charts.csv")
+            json_dir = os.path.join(tmp, "countries")
+            entities_dir = os.path.join(tmp, "entities")
+            write_charts_csv(csv_path, args.rows, countries=16, awkward=0.01)
+            with contextlib.redirect_stdout(io.StringIO()):
+                process_csv_to_json(csv_path, json_dir, entities_dir=entities_dir)
+            failed = run(json_dir, entities_dir)
+    sys.exit(1 if failed else 0)
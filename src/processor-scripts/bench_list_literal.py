@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Check list_literal.parse_list_literal against ast.literal_eval and time both.
+
+Every artists and artist_genres cell of the input (a synthetic charts.csv
+unless --input is given), plus a set of hand-written edge cases, must give
+the same value as ast.literal_eval (lists compared as tuples), or the same
+exception type and message. Exit status is 1 on any difference.
+
+Usage:
+  python3 bench_list_literal.py --rows 500000
+  python3 bench_list_literal.py --input ../../git_ignore/charts.csv
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+import tempfile
+import time
+
+from chart_fixture import write_charts_csv
+from chart_ingest import read_chunks
+from list_literal import parse_list_literal
+
+EDGE_CASES = [
+    "[]",
+    "[ ]",
+    "['a']",
+    "['a',]",
+    "[ 'a' , \"b\" ]",
+    "['it''s']",
+    "['a' 'b']",
+    "[\"it's\", 'say \"hi\"']",
+    "['', \"\"]",
+    "['''triple''']",
+    "['tab\\there']",
+    "['\\u00e9']",
+    "[u'prefixed']",
+    "[r'raw\\n']",
+    "[1, 2.5, None, True]",
+    "[['nested']]",
+    "['a',\n'b']",
+    "['a'] # comment",
+    "\t['lead']",
+    "['trail'] ",
+    "['unterminated",
+    "[,]",
+    "['a',,]",
+    "[name]",
+    "['a'\x00]",
+    "['Zé, Jr', 'The \"Quoted\" Band']",
+]
+
+
+def literal_eval_tuple(text):
+    value = ast.literal_eval(text)
+    return tuple(value) if isinstance(value, list) else value
+
+
+def outcome(parse, text):
+    try:
+        return parse(text)
+    except (ValueError, SyntaxError) as e:
+        # literal_eval names the source "<unknown>", parse_list_literal "<string>"
+        message = str(e).replace("<unknown>", "<string>")
+        return (type(e).__name__, re.sub(r" at 0x[0-9a-f]+", "", message))
+
+
+def read_cells(path):
+    cells = []
+    for chunk in read_chunks(path, ["artists", "artist_genres"], "python"):
+        cells.extend(chunk.text("artists"))
+        cells.extend(chunk.text("artist_genres"))
+    return cells
+
+
+def timed(fn, cells):
+    started = time.perf_counter()
+    for text in cells:
+        try:
+            fn(text)
+        except (ValueError, SyntaxError):
+            pass
+    return time.perf_counter() - started
+
+
+def run(path):
+    cells = read_cells(path)
+    print(f"{path}: {len(cells):,} list cells, {len(set(cells)):,} distinct")
+
+    mismatches = [
+        text for text in EDGE_CASES + sorted(set(cells)) if outcome(parse_list_literal, text) != outcome(literal_eval_tuple, text)
+    ]
+    for text in mismatches[:20]:
+        print(f"  MISMATCH {text!r}: {outcome(parse_list_literal, text)!r} != {outcome(literal_eval_tuple, text)!r}")
+
+    parse_list_literal.cache_clear()
+    base = timed(ast.literal_eval, cells)
+    fast = timed(parse_list_literal, cells)
+    print(f"  literal_eval        {base:7.2f}s")
+    print(f"  parse_list_literal  {fast:7.2f}s  {base / fast:6.1f}x  {parse_list_literal.cache_info()}")
+    print("  results: " + (f"{len(mismatches)} MISMATCHES" if mismatches else "identical"))
+    return bool(mismatches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parse_list_literal against ast.literal_eval")
+    parser.add_argument("--input", help="charts.csv to read (default: a synthetic file)")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the synthetic file (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.input:
+        failed = run(args.input)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "charts.csv")
+            write_charts_csv(path, args.rows, countries=16, awkward=0.01)
+            failed = run(path)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Chart data as a Parquet dataset partitioned by country and chart week.
+
+The chart scripts can write this (--format parquet or both) alongside, or
+instead of, their indent=2 JSON. The layout is hive style:
+
+  <root>/country=us/week=2017-01-05/part-<n>-<i>.parquet
+
+Weeks are Spotify chart weeks, Friday to Thursday, named by their Thursday
+as in track_history.py. Rows whose date does not parse go to week=unknown.
+track_id, artists and genres are dictionary encoded, and files are zstd
+compressed. Reading one country or one week only opens that partition's
+files. A full scan is one multithreaded Parquet read, with no JSON to parse.
+
+Columns: date (date32), position, streams, track_id, artists (list),
+genres (list), duration_ms, explicit, track_name, plus the country and week
+partition keys. Values that are not integers (or true/false) are null.
+
+Needs pyarrow.
+
+Usage:
+  python3 chart_dataset.py ../../output/charts_dataset --country us --week 2021-07-01
+  python3 chart_dataset.py ../../output/charts_dataset --summary
+"""
+import argparse
+import os
+import shutil
+from datetime import date, datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+BATCH_ROWS = 200_000
+UNKNOWN_WEEK = "unknown"
+EPOCH = date(1970, 1, 1)
+
+COLUMNS = ["date", "position", "streams", "track_id", "artists", "genres", "duration_ms", "explicit", "track_name"]
+# Parquet column paths; list values are dictionary encoded at their leaf
+DICTIONARY_COLUMNS = ["track_id", "artists.list.element", "genres.list.element"]
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("The parquet format needs pyarrow (pip install pyarrow)")
+
+
+def schema():
+    require_pyarrow()
+    return pa.schema(
+        [
+            ("date", pa.date32()),
+            ("position", pa.int64()),
+            ("streams", pa.int64()),
+            ("track_id", pa.string()),
+            ("artists", pa.list_(pa.string())),
+            ("genres", pa.list_(pa.string())),
+            ("duration_ms", pa.int64()),
+            ("explicit", pa.bool_()),
+            ("track_name", pa.string()),
+            ("country", pa.string()),
+            ("week", pa.string()),
+        ]
+    )
+
+
+def partitioning():
+    require_pyarrow()
+    return ds.partitioning(pa.schema([("country", pa.string()), ("week", pa.string())]), flavor="hive")
+
+
+def parse_chart_date(text):
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+def chart_week(day):
+    """Thursday ending the Friday-Thursday chart week of `day`."""
+    days = (day - EPOCH).days
+    # 1970-01-01 was a Thursday, so (days - 1) // 7 groups Friday..Thursday
+    return EPOCH + timedelta(days=(days - 1) // 7 * 7 + 7)
+
+
+def _int_or_none(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def _flag_or_none(value):
+    return value if isinstance(value, bool) else None
+
+
+def _string_list(value):
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
+class ChartDatasetWriter:
+    """
+    Append chart rows and write them out as a partitioned Parquet dataset.
+
+    Rows are buffered `batch_rows` at a time and each batch is written into
+    its partitions. Everything goes to `<root>.tmp` first and replaces
+    `root` on close, so readers never see a half-written dataset.
+
+    Args:
+        root: Dataset directory
+        batch_rows: Rows buffered before a batch is written
+    """
+
+    def __init__(self, root, batch_rows=BATCH_ROWS):
+        require_pyarrow()
+        self.root = root
+        self.tmp_root = root.rstrip("/\\") + ".tmp"
+        self.batch_rows = batch_rows
+        self.schema = schema()
+        self.file_options = ds.ParquetFileFormat().make_write_options(
+            use_dictionary=DICTIONARY_COLUMNS, compression="zstd"
+        )
+        self.columns = {name: [] for name in self.schema.names}
+        self.days = {}
+        self.batches = 0
+        self.counts = {}
+        self.closed = False
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+
+    def _day(self, text):
+        day = self.days.get(text, self.days)
+        if day is self.days:
+            parsed = parse_chart_date(text)
+            day = self.days[text] = (parsed, chart_week(parsed).isoformat() if parsed else UNKNOWN_WEEK)
+        return day
+
+    def add(self, country, date_text, position, streams, track_id, artists, genres, duration_ms, explicit, track_name):
+        """Add one chart row; values are as the chart scripts hold them."""
+        day, week = self._day(date_text)
+        columns = self.columns
+        columns["date"].append(day)
+        columns["position"].append(_int_or_none(position))
+        columns["streams"].append(_int_or_none(streams))
+        columns["track_id"].append(track_id)
+        columns["artists"].append(_string_list(artists))
+        columns["genres"].append(_string_list(genres))
+        columns["duration_ms"].append(_int_or_none(duration_ms))
+        columns["explicit"].append(_flag_or_none(explicit))
+        columns["track_name"].append(track_name)
+        columns["country"].append(country)
+        columns["week"].append(week)
+        self.counts[country] = self.counts.get(country, 0) + 1
+        if len(columns["country"]) >= self.batch_rows:
+            self.flush()
+
+    def add_entry(self, country, date_text, entry):
+        """Add a chart entry dict as global_charts.json holds them (position, streams, ...)."""
+        self.add(
+            country,
+            date_text,
+            entry["position"],
+            entry["streams"],
+            entry["track_id"],
+            entry["artists"],
+            entry["genres"],
+            entry["duration_ms"],
+            entry["explicit"],
+            entry["track_name"],
+        )
+
+    def flush(self):
+        if not self.columns["country"]:
+            return
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        ds.write_dataset(
+            table,
+            self.tmp_root,
+            format="parquet",
+            partitioning=partitioning(),
+            file_options=self.file_options,
+            basename_template=f"part-{self.batches}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        self.batches += 1
+        self.columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        """Write what is buffered and move the dataset into place."""
+        if self.closed:
+            return
+        self.flush()
+        os.makedirs(self.tmp_root, exist_ok=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.replace(self.tmp_root, self.root)
+        self.closed = True
+
+    def abort(self):
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_dataset(root):
+    require_pyarrow()
+    return ds.dataset(
+        root,
+        format=ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=["track_id"])),
+        partitioning=partitioning(),
+    )
+
+
+def load_charts(root, country=None, week=None, columns=None):
+    """
+    Read chart rows as a pyarrow Table.
+
+    Args:
+        root: Dataset directory
+        country: Only this country (its partition alone is read)
+        week: Only this chart week, as the Thursday's date "YYYY-MM-DD"
+        columns: Columns to read (default: all)
+
+    Returns:
+        pyarrow.Table
+    """
+    expression = None
+    if country is not None:
+        expression = ds.field("country") == country
+    if week is not None:
+        week_expression = ds.field("week") == week
+        expression = week_expression if expression is None else expression & week_expression
+    return open_dataset(root).to_table(columns=columns, filter=expression)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a chart dataset written with --format parquet")
+    parser.add_argument("root", help="Dataset directory")
+    parser.add_argument("--country", help="Only this country")
+    parser.add_argument("--week", help="Only the chart week ending on this Thursday (YYYY-MM-DD)")
+    parser.add_argument("--summary", action="store_true", help="Print rows per country instead of rows")
+    parser.add_argument("--limit", type=int, default=20, help="Rows to print (default: %(default)s)")
+    args = parser.parse_args()
+
+    table = load_charts(args.root, args.country, args.week)
+    print(f"{table.num_rows:,} rows")
+    if args.summary:
+        counts = pc.value_counts(table["country"]).to_pylist()
+        for item in sorted(counts, key=lambda item: -item["counts"]):
+            print(f"  {item['values']}: {item['counts']:,}")
+    else:
+        for row in table.slice(0, args.limit).to_pylist():
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Synthetic charts.csv for testing and benchmarking the chart scripts offline.
+
+Rows follow the layout of the Kaggle Spotify charts dump the scripts read:
+one chart per country and day, positions 1..N, artists and genres as Python
+list literals. Output is deterministic for a given seed. With --awkward a
+small share of rows carry the oddities the scripts have to survive: quoted
+newlines and commas in names, quotes and non-ASCII in artist names, bare
+(non-list) artist fields, non-numeric positions, malformed lists, slash dates.
+With --truncated some non-global rows also end after the streams column, as
+a partly written line would; only the scripts that read global rows alone are
+expected to get past those.
+
+Usage:
+  python3 chart_fixture.py --rows 1000000 --output /tmp/charts.csv
+  python3 chart_fixture.py --rows 50000 --countries 12 --awkward --output /tmp/charts_awkward.csv
+  python3 chart_fixture.py --rows 50000 --awkward --truncated --output /tmp/charts_truncated.csv
+"""
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+COLUMNS = ["date", "country", "position", "streams", "track_id", "artists", "artist_genres", "duration", "explicit", "name"]
+COUNTRIES = ["global", "us", "gb", "de", "br", "mx", "jp", "fr", "es", "it", "ca", "au", "se", "nl", "kr", "in"]
+ARTISTS = [
+    "Ed Sheeran", "Beyoncé", "Bad Bunny", "J. Cole", "A$AP Rocky", "Guns N' Roses", "Tyler, The Creator",
+    "Sigur Rós", "BTS", "Dua Lipa", "Karol G", "The Weeknd", "Måneskin", "Rosalía", "Drake", "Taylor Swift",
+]
+GENRES = ["pop", "rap", "reggaeton", "k-pop", "latin", "rock", "uk pop", "trap", "r&b", "indie"]
+WORDS = ["Love", "Night", "Blue", "Fire", "Dance", "Heart", "City", "Dream", "Gold", "Rain", "Wild", "Über", "Café"]
+AWKWARD_NAMES = ['Say "Hello"', "Line one\nline two", "Comma, Song", "Tab\tSong", ""]
+
+
+def _track(rng, track_index):
+    """Attributes of one track, derived from its index so they repeat across charts."""
+    track_rng = random.Random(track_index)
+    artists = track_rng.sample(ARTISTS, track_rng.choice([1, 1, 1, 2, 3]))
+    genres = track_rng.sample(GENRES, track_rng.randint(0, 3))
+    name = " ".join(track_rng.choice(WORDS) for _ in range(track_rng.randint(1, 4)))
+    return {
+        "track_id": "".join(track_rng.choice("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz") for _ in range(22)),
+        "artists": repr(artists),
+        "artist_genres": repr(genres),
+        "duration": str(track_rng.randint(90_000, 420_000)),
+        "explicit": track_rng.choice(["True", "False"]),
+        "name": name,
+    }
+
+
+def _awkward(rng, row, truncate=False):
+    kind = rng.randrange(8 if truncate and row["country"] != "global" else 7)
+    if kind == 0:
+        row["name"] = rng.choice(AWKWARD_NAMES)
+    elif kind == 1:
+        row["artists"] = repr(['The "Quoted" Band', "Zé, Jr"])
+    elif kind == 2:
+        row["artists"] = "Bare Artist"
+    elif kind == 3:
+        row["position"] = rng.choice(["", "n/a", " 7", "+3", "7\n"])
+    elif kind == 4:
+        row["artist_genres"] = "['unterminated"
+    elif kind == 5:
+        row["date"] = row["date"].replace("-", "/")
+    elif kind == 6:
+        row["explicit"] = rng.choice(["TRUE", "false", "", "yes"])
+    else:
+        for name in COLUMNS[COLUMNS.index("streams") + 1 :]:
+            del row[name]
+    return row
+
+
+def iter_rows(rows, countries=8, chart_size=200, tracks=5000, awkward=0.0, seed=1, truncate=False):
+    """Yield `rows` chart rows as dicts of column text; a truncated row lacks the later columns."""
+    rng = random.Random(seed)
+    track_cache = {}
+    day = date(2017, 1, 1)
+    produced = 0
+    while produced < rows:
+        for country in COUNTRIES[:countries]:
+            for position in range(1, chart_size + 1):
+                if produced >= rows:
+                    return
+                track_index = int(rng.paretovariate(1.2) * 10) % tracks
+                track = track_cache.get(track_index)
+                if track is None:
+                    track = track_cache[track_index] = _track(rng, track_index)
+                row = {
+                    "date": day.isoformat(),
+                    "country": country,
+                    "position": str(position),
+                    "streams": str(rng.randint(1_000, 5_000_000) // position),
+                    **track,
+                }
+                if awkward and rng.random() < awkward:
+                    row = _awkward(rng, dict(row), truncate)
+                yield row
+                produced += 1
+        day += timedelta(days=1)
+
+
+def write_charts_csv(path, rows, countries=8, awkward=0.0, seed=1, truncate=False):
+    """Write a synthetic charts.csv to `path`."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in iter_rows(rows, countries, awkward=awkward, seed=seed, truncate=truncate):
+            writer.writerow([row[name] for name in COLUMNS if name in row])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic charts.csv")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows to write (default: %(default)s)")
+    parser.add_argument("--countries", type=int, default=8, help=f"Countries per day, up to {len(COUNTRIES)} (default: %(default)s)")
+    parser.add_argument("--awkward", action="store_true", help="Mix in about 2%% awkward rows")
+    parser.add_argument("--truncated", action="store_true", help="With --awkward, also cut some non-global rows short")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    write_charts_csv(args.output, args.rows, args.countries, 0.02 if args.awkward else 0.0, args.seed, args.truncated)
+    print(f"Wrote {args.rows:,} rows to {args.output}")
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Chunked, column-oriented reader for charts.csv.
+
+Instead of one dict per row with every field converted in a Python loop,
+rows are read a block at a time into columns:
+
+  arrow   pyarrow's CSV reader; filters, digit checks, integer casts and
+          dictionary encoding run as Arrow compute kernels
+  python  csv.reader and plain Python; always available
+  numpy   csv.reader for the text; integer and flag columns converted with
+          NumPy string operations, list columns deduplicated with np.unique.
+          Building the NumPy string arrays costs about what it saves, so it
+          is no faster than python; it is kept for comparison
+
+Each engine yields ChartChunk objects with the same interface, so a script
+picks rows with `where()` before anything is turned into Python objects, and
+converts only the columns it needs. Values the fast path cannot convert
+exactly (anything but plain ASCII digits, flags other than true/false in any
+case) are handed to a caller-supplied fallback, so scripts keep their own
+edge-case behaviour. List columns are decoded once per distinct string.
+
+With workers > 1 the file is split into byte ranges that end on row
+boundaries and each range is parsed in its own process, with the same
+engine. A newline only ends a row when the quotes before it are balanced,
+so quoted newlines in track names or list columns never split a row; this
+holds for any file quoted the way csv.writer and pandas quote. Workers
+apply `where` and convert the integer and flag columns of charts.csv
+before sending their chunks back, and chunks come out in file order.
+
+Compare the engines with bench_chart_ingest.py.
+"""
+import csv
+import functools
+import io
+import itertools
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from ordered_pool import map_chunks_in_order
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+CHART_COLUMNS = ["date", "country", "position", "streams", "track_id", "artists", "artist_genres", "duration", "explicit", "name"]
+
+CHUNK_BYTES = 16 * 1024 * 1024
+CHUNK_ROWS = 100_000
+# Rows taken from csv.reader at a time. Fewer than the garbage collector's
+# first threshold (700 allocations), so row lists are freed before a
+# collection can promote them; bigger blocks set off full collections
+READ_ROWS = 512
+
+# charts.csv columns the workers of a parallel read convert ahead of ints()/flags()
+INT_COLUMNS = ("position", "streams", "duration")
+FLAG_COLUMNS = ("explicit",)
+
+# Longest digit string that always fits in an int64. PLAIN_INT is for
+# pyarrow (RE2, where $ is only the end of the text); Python's $ also matches
+# before a trailing newline, so the Python side uses fullmatch instead
+PLAIN_INT = "^[0-9]{1,18}$"
+PLAIN_INT_PATTERN = re.compile("[0-9]{1,18}")
+
+
+def available_engines():
+    """Usable engine names, fastest first."""
+    engines = []
+    if pa is not None:
+        engines.append("arrow")
+    engines.append("python")
+    if np is not None:
+        engines.append("numpy")
+    return engines
+
+
+DEFAULT_ENGINE = available_engines()[0]
+
+
+def read_header(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def read_chunks(
+    path, columns=None, engine=DEFAULT_ENGINE, chunk_bytes=CHUNK_BYTES, chunk_rows=CHUNK_ROWS, workers=1, where=None
+):
+    """
+    Yield blocks of a charts CSV as ChartChunk objects, in file order.
+
+    Args:
+        path: CSV file with a header row
+        columns: Columns to load (default: all)
+        engine: One of available_engines()
+        chunk_bytes: Block size for the arrow engine, and byte range size
+            of a parallel read
+        chunk_rows: Rows per chunk for the other engines
+        workers: Processes parsing byte ranges; 1 reads in this process
+        where: Optional (column, value); only rows where the column equals
+            the value are yielded, and chunks left empty are skipped. The
+            python and numpy engines drop the other rows as they read them
+    """
+    if engine not in available_engines():
+        raise ValueError(f"Engine {engine!r} is not available (available: {', '.join(available_engines())})")
+
+    header = read_header(path)
+    columns = list(columns) if columns is not None else header
+    if where is not None and where[0] not in columns:
+        columns.append(where[0])
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise KeyError(f"{path} has no column {', '.join(missing)}")
+
+    if workers > 1:
+        chunks = _read_parallel(path, header, columns, engine, chunk_bytes, chunk_rows, workers, where)
+    elif engine == "arrow":
+        chunks = _read_arrow(path, header, columns, chunk_bytes, where)
+        if where is not None:
+            chunks = (chunk.where(*where) for chunk in chunks)
+    else:
+        chunks = _read_python(path, columns, chunk_rows, engine == "numpy", where)
+
+    for chunk in chunks:
+        if len(chunk):
+            yield chunk
+
+
+def _arrow_parse_options(header, where):
+    """
+    Arrow CSV parse options; with `where`, malformed rows it would drop are
+    skipped instead of failing the read, as _column_chunks skips them.
+    """
+    if where is None:
+        return pa_csv.ParseOptions(newlines_in_values=True)
+    where_index = header.index(where[0])
+
+    def invalid_row(row):
+        fields = next(csv.reader(io.StringIO(row.text)), [])
+        return "skip" if where_index >= len(fields) or fields[where_index] != where[1] else "error"
+
+    return pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=invalid_row)
+
+
+def _read_arrow(path, header, columns, chunk_bytes, where=None):
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=chunk_bytes),
+        parse_options=_arrow_parse_options(header, where),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header}, include_columns=columns
+        ),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield ArrowChunk(pa.Table.from_batches([batch]))
+
+
+def _read_python(path, columns, chunk_rows, use_numpy, where=None):
+    # Universal newlines, as csv.DictReader in the scripts sees the file
+    with open(path, "r", encoding="utf-8") as f:
+        yield from _column_chunks(csv.reader(f), columns, chunk_rows, use_numpy, where=where)
+
+
+def _column_chunks(reader, columns, chunk_rows, use_numpy, header=None, where=None, convert=False):
+    """
+    ColumnChunks of the rows of a csv.reader; the header is its first row unless given.
+
+    Rows are taken READ_ROWS at a time and checked, filtered and split into
+    columns a block at a time, so the per-row work stays in C.
+    """
+    header = header or next(reader)
+    width = len(header)
+    indexes = [header.index(name) for name in columns]
+    where_index, where_value = (header.index(where[0]), where[1]) if where is not None else (None, None)
+    pending = {name: [] for name in columns}
+    count = 0
+    while True:
+        start = reader.line_num
+        block = list(itertools.islice(reader, READ_ROWS))
+        rows = block
+        if where_index is not None:
+            # Rows `where` drops are dropped unchecked, as DictReader loops skip them
+            rows = [row for row in block if len(row) > where_index and row[where_index] == where_value]
+        if set(map(len, rows)) - {width}:
+            bad = next((row for row in rows if row and len(row) != width), None)
+            if bad is not None:
+                raise ValueError(f"Row {start + 1 + block.index(bad)} has {len(bad)} fields, expected {width}")
+            rows = [row for row in rows if row]
+        if rows:
+            fields = list(zip(*rows))
+            for name, index in zip(columns, indexes):
+                pending[name].extend(fields[index])
+            count += len(rows)
+
+        if count >= chunk_rows or not block:
+            if count:
+                chunk = ColumnChunk(pending, use_numpy)
+                if convert:
+                    chunk.convert()
+                yield chunk
+            if not block:
+                return
+            pending = {name: [] for name in columns}
+            count = 0
+
+
+def byte_ranges(path, range_bytes=CHUNK_BYTES):
+    """
+    Yield (start, end) byte ranges covering the rows of a CSV after its
+    header, each about `range_bytes` long and ending just after a row.
+
+    A newline ends a row only where the quotes since the last row start are
+    balanced ("" escapes count twice), so the file is only scanned for
+    quote and newline bytes, never parsed.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = _next_row_start(data, 0, 0, size)
+            while start < size:
+                target = start + range_bytes
+                if target >= size:
+                    end = size
+                else:
+                    end = _next_row_start(data, target, data[start:target].count(b'"') & 1, size)
+                yield start, end
+                start = end
+
+
+def _next_row_start(data, position, in_quotes, size):
+    """Offset just after the first newline at or after `position` that is outside quotes."""
+    while True:
+        newline = data.find(b"\n", position)
+        if newline < 0:
+            return size
+        in_quotes ^= data[position:newline].count(b'"') & 1
+        if not in_quotes:
+            return newline + 1
+        position = newline + 1
+
+
+def _read_parallel(path, header, columns, engine, chunk_bytes, chunk_rows, workers, where):
+    parse = functools.partial(_parse_range, path, header, columns, engine, chunk_rows, where)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Two ranges queued per worker keeps every core busy with bounded memory
+        yield from map_chunks_in_order(executor, parse, byte_ranges(path, chunk_bytes), workers * 2)
+
+
+def _parse_range(path, header, columns, engine, chunk_rows, where, byte_range):
+    """Parse one byte range of the file in a worker; returns its chunks."""
+    start, end = byte_range
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if not data:
+        return []
+
+    if engine == "arrow":
+        table = pa_csv.read_csv(
+            pa.BufferReader(data),
+            read_options=pa_csv.ReadOptions(column_names=header, use_threads=False),
+            parse_options=_arrow_parse_options(header, where),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header}, include_columns=columns
+            ),
+        )
+        chunk = ArrowChunk(table)
+        if where is not None:
+            chunk = chunk.where(*where)
+        return [chunk] if len(chunk) else []
+
+    # Universal newlines, as _read_python reads the file
+    reader = csv.reader(io.StringIO(data.decode("utf-8"), newline=None))
+    try:
+        return list(_column_chunks(reader, columns, chunk_rows, engine == "numpy", header, where, convert=True))
+    except ValueError as e:
+        raise ValueError(f"{e} (in the byte range starting at {start})") from None
+
+
+def _flag_value(lowered):
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    return None
+
+
+def _int_values(texts):
+    """int() of the texts that are plain ASCII digits (at most 18), None for the others."""
+    joined = "".join(texts)
+    if joined.isdigit() and joined.isascii() and min(map(len, texts)) > 0 and max(map(len, texts)) <= 18:
+        return list(map(int, texts))
+    fullmatch = PLAIN_INT_PATTERN.fullmatch
+    known = {text: int(text) if fullmatch(text) else None for text in dict.fromkeys(texts)}
+    return list(map(known.__getitem__, texts))
+
+
+def _flag_values(texts):
+    """True/False of the ASCII true/false texts in any case, None for the others."""
+    known = {text: _flag_value(text.lower()) if text.isascii() else None for text in dict.fromkeys(texts)}
+    return list(map(known.__getitem__, texts))
+
+
+def _apply_fallback(values, texts, fallback):
+    """Replace the None entries of `values` with fallback(text) of the same row."""
+    start = 0
+    while True:
+        try:
+            index = values.index(None, start)
+        except ValueError:
+            return values
+        values[index] = fallback(texts[index])
+        start = index + 1
+
+
+def _decode(uniques, parse, cache):
+    """parse(text) of each distinct text, from and into `cache` when given."""
+    if cache is None:
+        cache = {}
+    decoded = []
+    for text in uniques:
+        value = cache.get(text, cache)
+        if value is cache:
+            value = cache[text] = parse(text)
+        decoded.append(value)
+    return decoded
+
+
+class ArrowChunk:
+    """A block of rows held as an Arrow table of string columns."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def where(self, name, value):
+        """The rows whose `name` column equals `value`."""
+        return ArrowChunk(self.table.filter(pc.equal(self.table[name], value)))
+
+    def text(self, name):
+        column = self.table[name]
+        # Match Python's universal newlines inside quoted values
+        if pc.any(pc.match_substring(column, "\r")).as_py():
+            column = pc.replace_substring(pc.replace_substring(column, "\r\n", "\n"), "\r", "\n")
+        return column.to_pylist()
+
+    def ints(self, name, fallback):
+        """
+        Integer values of a column; text that is not plain ASCII digits is
+        converted with fallback(text) instead.
+        """
+        column = self.table[name]
+        plain = pc.match_substring_regex(column, PLAIN_INT)
+        values = pc.if_else(plain, pc.cast(pc.if_else(plain, column, "0"), pa.int64()), None).to_pylist()
+        if pc.all(plain).as_py():
+            return values
+        return self._fill(values, plain, name, fallback)
+
+    def flags(self, name, fallback):
+        """Booleans of a true/false column; other text goes through fallback(text)."""
+        lowered = pc.ascii_lower(self.table[name])
+        is_true = pc.equal(lowered, "true")
+        known = pc.or_(is_true, pc.equal(lowered, "false"))
+        values = pc.if_else(known, is_true, None).to_pylist()
+        if pc.all(known).as_py():
+            return values
+        return self._fill(values, known, name, fallback)
+
+    def _fill(self, values, converted, name, fallback):
+        positions = pc.indices_nonzero(pc.invert(converted.combine_chunks()))
+        texts = ArrowChunk(self.table.take(positions)).text(name)
+        for position, text in zip(positions.to_pylist(), texts):
+            values[position] = fallback(text)
+        return values
+
+    def decoded(self, name, parse, cache=None):
+        """
+        parse(text) of every row, calling `parse` once per distinct text.
+
+        `cache` may be a dict shared across chunks to remember decoded texts.
+        """
+        encoded = pc.dictionary_encode(self.table[name].combine_chunks())
+        decoded = _decode(encoded.dictionary.to_pylist(), parse, cache)
+        return list(map(decoded.__getitem__, encoded.indices.to_pylist()))
+
+
+class ColumnChunk:
+    """
+    A block of rows held as Python lists of column text.
+
+    `converted` maps a column name to its values converted ahead of time
+    (see convert()), with None where the caller's fallback has to decide.
+    """
+
+    def __init__(self, columns, use_numpy=False, converted=None):
+        self.columns = columns
+        self.use_numpy = use_numpy
+        self.converted = converted or {}
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def where(self, name, value):
+        """The rows whose `name` column equals `value`."""
+        keep = [index for index, text in enumerate(self.columns[name]) if text == value]
+        return ColumnChunk(
+            {key: [column[i] for i in keep] for key, column in self.columns.items()},
+            self.use_numpy,
+            {key: [column[i] for i in keep] for key, column in self.converted.items()},
+        )
+
+    def convert(self):
+        """Convert the plain integers and flags of the INT_COLUMNS and FLAG_COLUMNS now, without fallbacks."""
+        for name in INT_COLUMNS:
+            if name in self.columns:
+                self.converted[name] = _int_values(self.columns[name])
+        for name in FLAG_COLUMNS:
+            if name in self.columns:
+                self.converted[name] = _flag_values(self.columns[name])
+
+    def text(self, name):
+        return list(self.columns[name])
+
+    def ints(self, name, fallback):
+        """
+        Integer values of a column; text that is not plain ASCII digits is
+        converted with fallback(text) instead.
+        """
+        texts = self.columns[name]
+        if name in self.converted:
+            return _apply_fallback(list(self.converted[name]), texts, fallback)
+        if self.use_numpy and texts:
+            array = np.array(texts)
+            lengths = np.char.str_len(array)
+            plain = (np.char.strip(array, "0123456789") == "") & (lengths > 0) & (lengths <= 18)
+            values = np.where(plain, array, "0").astype(np.int64).tolist()
+            for index in np.flatnonzero(~plain).tolist():
+                values[index] = fallback(texts[index])
+            return values
+        return _apply_fallback(_int_values(texts), texts, fallback)
+
+    def flags(self, name, fallback):
+        """Booleans of a true/false column; other text goes through fallback(text)."""
+        texts = self.columns[name]
+        if name in self.converted:
+            return _apply_fallback(list(self.converted[name]), texts, fallback)
+        if self.use_numpy and texts:
+            lowered = np.char.lower(np.array(texts))
+            is_true = lowered == "true"
+            known = is_true | (lowered == "false")
+            values = is_true.tolist()
+            for index in np.flatnonzero(~known).tolist():
+                values[index] = fallback(texts[index])
+            return values
+        return _apply_fallback(_flag_values(texts), texts, fallback)
+
+    def decoded(self, name, parse, cache=None):
+        """
+        parse(text) of every row, calling `parse` once per distinct text.
+
+        `cache` may be a dict shared across chunks to remember decoded texts.
+        """
+        texts = self.columns[name]
+        if self.use_numpy and texts:
+            uniques, codes = np.unique(np.array(texts, dtype=object), return_inverse=True)
+            decoded = _decode(uniques.tolist(), parse, cache)
+            return list(map(decoded.__getitem__, codes.tolist()))
+        uniques = list(dict.fromkeys(texts))
+        decoded = dict(zip(uniques, _decode(uniques, parse, cache)))
+        return list(map(decoded.__getitem__, texts))
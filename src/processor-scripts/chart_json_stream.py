@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Streaming writer for chart entries grouped by date, with a per-date index.
+
+csv_to_json.py used to build every date's entries in one dict and
+json.dump it at the end. ChartJsonWriter takes entries in date order and
+encodes each date's block as soon as the next date starts, so only one
+date is held in memory. Layouts:
+
+  json          {"metadata": {...}, "charts": {"<date>": [...], ...}}
+                indent=2 by default (the same text as json.dump), or
+                compact with compact=True
+  ndjson date   a {"metadata": {...}} line, then one
+                {"date": "<date>", "entries": [...]} line per date
+  ndjson entry  a {"metadata": {...}} line, then one
+                {"date": "<date>", "position": ..., ...} line per entry
+
+The metadata (entry counts, date range) is only known at the end, so the
+date blocks go to a temporary file and are copied in behind it on finish.
+With gzip=True the header and every date block are separate gzip members;
+the file still reads as one stream with gzip.open.
+
+Next to the output, `<output>.index.json` records each date's byte offset
+and length in the file (compressed bytes when gzipped). read_date() uses it
+to seek to one date and parse only that block.
+
+Usage:
+  python3 chart_json_stream.py ../../global_charts_by_date.json 2021-07-01
+  python3 chart_json_stream.py ../../global_charts_by_date.ndjson.gz --dates
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from json_stream import ByteOffsetWriter, JsonObjectWriter
+
+LAYOUTS = ("json", "ndjson")
+NDJSON_UNITS = ("date", "entry")
+COMPACT_SEPARATORS = (",", ":")
+GZIP_LEVEL = 6
+
+
+def index_path(path):
+    return path + ".index.json"
+
+
+class ChartJsonWriter:
+    """
+    Write chart entries grouped by date as they arrive.
+
+    Entries must come grouped by date, as in global_charts_by_date.csv; a
+    date that returns after another date has started raises ValueError.
+    The output is written to `<path>.tmp` and moved into place by finish(),
+    so readers never see a half-written file. The text comes from the
+    json_stream.py writers; a ByteOffsetWriter gives the index offsets.
+
+    Args:
+        path: Output file
+        layout: "json" or "ndjson"
+        unit: For ndjson, one line per "date" or per "entry"
+        indent: Indent of the json layout; ignored when compact
+        compact: Write the json layout without whitespace
+        use_gzip: Compress the header and each date block as gzip members
+        ensure_ascii: As for json.dump
+    """
+
+    def __init__(self, path, layout="json", unit="date", indent=2, compact=False, use_gzip=False, ensure_ascii=False):
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+        if unit not in NDJSON_UNITS:
+            raise ValueError(f"unit must be one of {', '.join(NDJSON_UNITS)}")
+        self.path = path
+        self.layout = layout
+        self.unit = unit
+        self.use_gzip = use_gzip
+        self.ensure_ascii = ensure_ascii
+        if layout == "ndjson" or compact:
+            self.indent, self.separators = None, COMPACT_SEPARATORS
+        else:
+            self.indent, self.separators = indent, None
+        self.line_encoder = json.JSONEncoder(ensure_ascii=ensure_ascii, separators=COMPACT_SEPARATORS)
+
+        self.body = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+        self.sink = ByteOffsetWriter(self.body, GZIP_LEVEL if use_gzip else None)
+        # The "charts" object of the json layout; its members go to the body as dates complete
+        self.charts = None
+        if layout == "json":
+            self.charts = JsonObjectWriter(self.sink, self.indent, ensure_ascii, level=1, separators=self.separators)
+        self.index = {}
+        self.current = None
+        self.writers = ()
+        self.start = 0
+        self.count = 0
+        self.total_entries = 0
+        self.finished = False
+
+    def add(self, date, entry):
+        """Add one entry (a dict without its date) to `date`."""
+        if date != self.current:
+            if date in self.index:
+                raise ValueError(f"Entries for {date} are not grouped together; sort the input by date first")
+            self._end_date()
+            self._start_date(date)
+        if self.layout == "ndjson" and self.unit == "entry":
+            self.sink.write(self.line_encoder.encode({"date": date, **entry}) + "\n")
+        else:
+            self.writers[-1].write(entry)
+        self.count += 1
+        self.total_entries += 1
+
+    def _start_date(self, date):
+        if self.layout == "json":
+            # The separator and key belong to the member before the indexed block
+            entries = self.charts.array(date)
+            self.sink.boundary()
+            self.writers = (entries,)
+        self.start = self.sink.offset
+        if self.layout == "ndjson" and self.unit == "date":
+            line = JsonObjectWriter(self.sink, None, self.ensure_ascii, separators=COMPACT_SEPARATORS)
+            line.member("date", date)
+            self.writers = (line, line.array("entries"))
+        self.current = date
+        self.count = 0
+
+    def _end_date(self):
+        """Close the current date's block and index it."""
+        if self.current is None:
+            return
+        for writer in reversed(self.writers):
+            writer.close()
+        if self.layout == "ndjson" and self.unit == "date":
+            self.sink.write("\n")
+        self.sink.boundary()
+        self.index[self.current] = [self.start, self.sink.offset - self.start, self.count]
+        self.writers = ()
+        self.current = None
+
+    def finish(self, metadata):
+        """Write the header with `metadata`, the date blocks and the index, and move the file into place."""
+        self._end_date()
+        if self.charts is not None:
+            self.charts.close()
+        self.sink.boundary()
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as output:
+            header = ByteOffsetWriter(output, GZIP_LEVEL if self.use_gzip else None)
+            if self.layout == "json":
+                document = JsonObjectWriter(header, self.indent, self.ensure_ascii, separators=self.separators)
+                document.member("metadata", metadata)
+                document.key("charts")
+            else:
+                document = None
+                header.write(self.line_encoder.encode({"metadata": metadata}) + "\n")
+            header.boundary()
+            header_bytes = header.offset
+            self.body.seek(0)
+            shutil.copyfileobj(self.body, output, 1 << 20)
+            if document is not None:
+                document.close()
+                header.boundary()
+        self.body.close()
+        os.replace(tmp_path, self.path)
+
+        for location in self.index.values():
+            location[0] += header_bytes
+
+        with open(index_path(self.path), "w", encoding="utf-8") as index_file:
+            json.dump(
+                {
+                    "file": os.path.basename(self.path),
+                    "layout": self.layout,
+                    "unit": self.unit if self.layout == "ndjson" else None,
+                    "gzip": self.use_gzip,
+                    "fields": ["offset", "length", "entries"],
+                    "dates": self.index,
+                },
+                index_file,
+                ensure_ascii=False,
+                separators=COMPACT_SEPARATORS,
+            )
+        self.finished = True
+
+    def abort(self):
+        self.body.close()
+        if os.path.exists(self.path + ".tmp"):
+            os.remove(self.path + ".tmp")
+        self.finished = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if not self.finished:
+            self.abort()
+
+
+def load_index(path):
+    with open(index_path(path), "r", encoding="utf-8") as index_file:
+        return json.load(index_file)
+
+
+def read_date(path, date, index=None):
+    """
+    Read one date's entries from a file written by ChartJsonWriter, without
+    parsing the rest.
+
+    Args:
+        path: The output file
+        date: Date key as written
+        index: The loaded index, to reuse across calls (default: load it)
+
+    Returns:
+        List of entry dicts, or None when the date is not in the file
+    """
+    index = index or load_index(path)
+    location = index["dates"].get(date)
+    if location is None:
+        return None
+    offset, length = location[0], location[1]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    if index["gzip"]:
+        data = gzip.decompress(data)
+    text = data.decode("utf-8")
+
+    if index["layout"] == "json":
+        return json.loads(text)
+    if index["unit"] == "date":
+        return json.loads(text)["entries"]
+    entries = []
+    for line in text.splitlines():
+        entry = json.loads(line)
+        del entry["date"]
+        entries.append(entry)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read one date from a chart file written by ChartJsonWriter")
+    parser.add_argument("path", help="global_charts_by_date.json / .ndjson (optionally .gz)")
+    parser.add_argument("date", nargs="?", help="Date to print")
+    parser.add_argument("--dates", action="store_true", help="List the dates in the index")
+    args = parser.parse_args()
+
+    index = load_index(args.path)
+    if args.dates or args.date is None:
+        for date, (offset, length, count) in index["dates"].items():
+            print(f"{date}: {count} entries at byte {offset:,} ({length:,} bytes)")
+        return
+
+    entries = read_date(args.path, args.date, index)
+    if entries is None:
+        print(f"{args.date} is not in {args.path}")
+        return
+    for entry in entries:
+        print(json.dumps(entry, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+One streaming pass over charts.csv producing every global chart output.
+
+Replaces running filter_global_charts.py, reorganize_charts.py,
+csv_to_json.py and reorganize_by_artist.py one after another, each of which
+reads the previous script's output whole. Here charts.csv is read once, in
+column chunks (chart_ingest.py, --engine) by --workers parser processes,
+which drop non-global rows before their fields are converted or sent back.
+The filtered CSV is written as rows arrive, and the orderings the other
+outputs need come from external sorts (external_sort.py), so memory stays
+bounded by --run-size rows per sort. Outputs match what the four scripts
+produce (global_charts_by_date.json carries a new created_date).
+
+Stages (--stages, comma separated, default all):
+  filter     git_ignore/global_charts.csv and git_ignore/global_charts.json
+  by-date    git_ignore/global_charts_by_date.csv and charts_organization_summary.txt
+  json       global_charts_by_date.json and global_charts_sample.json
+  by-artist  git_ignore/global_charts_by_artist.csv
+
+Usage:
+  python3 charts_pipeline.py
+  python3 charts_pipeline.py --stages by-date,json
+  python3 charts_pipeline.py --input ../../git_ignore/charts.csv --run-size 500000 --tmp-dir /mnt/scratch
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from chart_ingest import CHART_COLUMNS, DEFAULT_ENGINE, available_engines, read_chunks
+from external_sort import RUN_SIZE, ExternalSorter
+from json_stream import JsonObjectWriter
+from list_literal import parse_list_literal
+from reorganize_by_artist import parse_artists_field
+from reorganize_charts import DateStats, parse_date
+
+INPUT_FILE = "../../git_ignore/charts.csv"
+GLOBAL_CSV = "../../git_ignore/global_charts.csv"
+GLOBAL_JSON = "../../git_ignore/global_charts.json"
+BY_DATE_CSV = "../../git_ignore/global_charts_by_date.csv"
+SUMMARY_FILE = "charts_organization_summary.txt"
+BY_DATE_JSON = "../../global_charts_by_date.json"
+SAMPLE_JSON = "../../global_charts_sample.json"
+BY_ARTIST_CSV = "../../git_ignore/global_charts_by_artist.csv"
+
+STAGES = ("filter", "by-date", "json", "by-artist")
+
+FIELDNAMES = [
+    "date",
+    "position",
+    "streams",
+    "track_id",
+    "artists",
+    "genres",
+    "duration_ms",
+    "explicit",
+    "track_name",
+]
+
+ENTRY_FIELDS = [
+    "position (integer)",
+    "streams (integer)",
+    "track_id (string)",
+    "artists (array of strings)",
+    "genres (array of strings)",
+    "duration_ms (integer)",
+    "explicit (boolean)",
+    "track_name (string)",
+]
+
+
+def list_json_or_error(text):
+    """The list a charts.csv list field holds, as global_charts.csv stores it (JSON)."""
+    try:
+        return json.dumps(parse_list_literal(text) if text.startswith("[") else [text])
+    except (ValueError, SyntaxError) as e:
+        return e
+
+
+def int_text_or_error(text):
+    try:
+        return str(int(text))
+    except ValueError as e:
+        return e
+
+
+def iter_clean_rows(chunk, list_cache):
+    """
+    Yield a global_charts.csv row (all strings) for each row of a chunk of
+    global entries, or the error for rows filter_global_charts.py skips.
+    """
+    columns = zip(
+        chunk.text("date"),
+        chunk.ints("position", int_text_or_error),
+        chunk.ints("streams", int_text_or_error),
+        chunk.text("track_id"),
+        chunk.decoded("artists", list_json_or_error, list_cache),
+        chunk.decoded("artist_genres", list_json_or_error, list_cache),
+        chunk.ints("duration", int_text_or_error),
+        chunk.flags("explicit", lambda text: text.lower() == "true"),
+        chunk.text("name"),
+    )
+    for date, position, streams, track_id, artists, genres, duration, explicit, name in columns:
+        for value in (artists, genres, position, streams, duration):
+            if isinstance(value, Exception):
+                yield value
+                break
+        else:
+            yield (date, str(position), str(streams), track_id, artists, genres, str(duration), str(explicit), name)
+
+
+def to_entry(row):
+    """Chart entry of a cleaned row, without its date."""
+    return {
+        "position": int(row[1]),
+        "streams": int(row[2]),
+        "track_id": row[3],
+        "artists": json.loads(row[4]),
+        "genres": json.loads(row[5]),
+        "duration_ms": int(row[6]),
+        "explicit": row[7] == "True",
+        "track_name": row[8],
+    }
+
+
+def read_charts(input_file, stages, sorters, dates, progress_every, engine=DEFAULT_ENGINE, workers=1):
+    """
+    Read charts.csv once: write the filtered CSV and feed the sorters.
+
+    Returns:
+        Number of global entries
+    """
+    global_csv = open(GLOBAL_CSV, "w", newline="", encoding="utf-8") if "filter" in stages else None
+    total = 0
+    global_rows = 0
+    list_cache = {}
+    started = time.monotonic()
+    try:
+        if global_csv:
+            csv_writer = csv.writer(global_csv)
+            csv_writer.writerow(FIELDNAMES)
+
+        # Filtered inside the parser processes, so only global rows come back
+        for chunk in read_chunks(input_file, CHART_COLUMNS, engine, workers=workers, where=("country", "global")):
+            for clean in iter_clean_rows(chunk, list_cache):
+                if isinstance(clean, Exception):
+                    print(f"Skipping problematic row: {clean}")
+                    continue
+
+                total += 1
+                date = clean[0]
+                if global_csv:
+                    csv_writer.writerow(clean)
+                    sorters["filter"].add(date, clean)
+
+                stats = dates.get(date)
+                if stats is None:
+                    stats = dates[date] = DateStats(len(dates), parse_date(date).toordinal())
+                position = int(clean[1])
+                stats.add(position)
+                if "by-date" in sorters:
+                    sorters["by-date"].add((stats.sort_value, stats.order, position), clean)
+
+                if "by-artist" in sorters:
+                    for artist in parse_artists_field(clean[4]):
+                        artist_row = clean[:4] + (f'["{artist}"]',) + clean[5:]
+                        sorters["by-artist"].add(parse_artists_field(artist_row[4])[0], artist_row)
+
+            if global_rows // progress_every != (global_rows + len(chunk)) // progress_every:
+                rate = (global_rows + len(chunk)) / max(time.monotonic() - started, 1e-9)
+                print(f"  {global_rows + len(chunk):,} global rows read ({rate:,.0f}/s), {total:,} entries kept")
+            global_rows += len(chunk)
+    finally:
+        if global_csv:
+            global_csv.close()
+
+    print(f"Read {global_rows:,} global rows, found {total} global entries")
+    return total
+
+
+def write_global_json(sorter, total, dates):
+    """global_charts.json: entries grouped by date string, in input order within a date."""
+    print(f"Saving to {GLOBAL_JSON}...")
+    metadata = {
+        "total_entries": total,
+        "date_range": {"start": min(dates, default=None), "end": max(dates, default=None)},
+        "description": "Global Spotify charts data filtered from original charts.csv",
+    }
+    with open(GLOBAL_JSON, "w", encoding="utf-8") as jsonfile, JsonObjectWriter(jsonfile) as document:
+        document.member("metadata", metadata)
+        with document.object("charts") as charts:
+            entries = None
+            current = None
+            for date, row in sorter.items():
+                if date != current:
+                    if entries:
+                        entries.close()
+                    entries = charts.array(date)
+                    current = date
+                entries.write({"date": date, **to_entry(row)})
+            if entries:
+                entries.close()
+
+
+def write_by_date(sorter, stages, total, dates, input_file):
+    """
+    global_charts_by_date.csv/.json: dates in chronological order, positions
+    ascending within a date. Both are written from one merge of the sort.
+    """
+    sorted_dates = sorted(dates, key=lambda date: (dates[date].sort_value, dates[date].order))
+    if sorted_dates:
+        print(f"Found {len(dates)} unique dates")
+        print(f"Date range: {sorted_dates[0]} to {sorted_dates[-1]}")
+
+    by_date_csv = open(BY_DATE_CSV, "w", newline="", encoding="utf-8") if "by-date" in stages else None
+    by_date_json = open(BY_DATE_JSON, "w", encoding="utf-8") if "json" in stages else None
+    sample_dates = set(sorted(dates)[:3])
+    sample_charts = {}
+    metadata = {
+        "title": "Global Spotify Charts Data",
+        "description": "Global Spotify charts organized by date with positions sorted from 1 to highest",
+        "source": "Converted from global_charts_by_date.csv",
+        "total_entries": total,
+        "unique_dates": len(dates),
+        "date_range": {"start": min(dates, default=None), "end": max(dates, default=None)},
+        "created_date": datetime.now().isoformat(),
+        "data_structure": {
+            "charts": "Object with date keys, each containing array of chart entries",
+            "entry_fields": ENTRY_FIELDS,
+        },
+    }
+
+    try:
+        if by_date_csv:
+            print(f"Creating reorganized file: {BY_DATE_CSV}")
+            csv_writer = csv.writer(by_date_csv)
+            csv_writer.writerow(FIELDNAMES)
+        if by_date_json:
+            print(f"Writing JSON file: {BY_DATE_JSON}")
+            document = JsonObjectWriter(by_date_json)
+            document.member("metadata", metadata)
+            charts = document.object("charts")
+
+        entries = None
+        current = None
+        for row in sorter.values():
+            date = row[0]
+            if date != current:
+                current = date
+                if by_date_csv:
+                    stats = dates[date]
+                    print(f"Processing {date}: {stats.count} entries (positions {stats.low} to {stats.high})")
+                if by_date_json:
+                    if entries:
+                        entries.close()
+                    entries = charts.array(date)
+
+            if by_date_csv:
+                csv_writer.writerow(row)
+            if by_date_json:
+                entry = to_entry(row)
+                entries.write(entry)
+                if date in sample_dates:
+                    sample_charts.setdefault(date, []).append(entry)
+
+        if by_date_json:
+            if entries:
+                entries.close()
+            charts.close()
+            document.close()
+    finally:
+        if by_date_csv:
+            by_date_csv.close()
+        if by_date_json:
+            by_date_json.close()
+
+    if by_date_csv:
+        print(f"Successfully reorganized {total} entries")
+        print(f"Output saved to: {BY_DATE_CSV}")
+        write_summary(input_file, total, dates, sorted_dates)
+
+    if by_date_json:
+        print(f"Successfully created {BY_DATE_JSON}")
+        print(f"File contains {total} chart entries across {len(dates)} dates")
+        print(f"Creating sample file: {SAMPLE_JSON}")
+        sample_data = {
+            "metadata": metadata,
+            "charts": {date: sample_charts[date] for date in sorted(sample_charts)},
+            "note": f"This is a sample containing only the first 3 dates. Full data is in {BY_DATE_JSON}",
+        }
+        with open(SAMPLE_JSON, "w", encoding="utf-8") as sample_jsonfile:
+            json.dump(sample_data, sample_jsonfile, indent=2, ensure_ascii=False)
+        print(f"Sample file created: {SAMPLE_JSON}")
+
+
+def write_summary(input_file, total, dates, sorted_dates):
+    with open(SUMMARY_FILE, "w", encoding="utf-8") as summary:
+        summary.write("Global Charts Organization Summary\n")
+        summary.write("================================\n\n")
+        summary.write(f"Input file: {input_file}\n")
+        summary.write(f"Output file: {BY_DATE_CSV}\n")
+        summary.write(f"Total entries: {total}\n")
+        summary.write(f"Unique dates: {len(dates)}\n")
+        if sorted_dates:
+            summary.write(f"Date range: {sorted_dates[0]} to {sorted_dates[-1]}\n\n")
+
+        summary.write("Organization structure:\n")
+        summary.write("- Data grouped by date (chronologically sorted)\n")
+        summary.write("- Within each date, entries sorted by position (1 to highest)\n")
+        summary.write("- All entries for one date appear together before moving to next date\n\n")
+
+        summary.write("Sample entries per date:\n")
+        for date in sorted_dates[:5]:
+            stats = dates[date]
+            summary.write(f"{date}: {stats.count} entries, positions {stats.low}-{stats.high}\n")
+
+        if len(sorted_dates) > 5:
+            summary.write("...\n")
+            for date in sorted_dates[-2:]:
+                stats = dates[date]
+                summary.write(f"{date}: {stats.count} entries, positions {stats.low}-{stats.high}\n")
+
+    print(f"Summary report saved to: {SUMMARY_FILE}")
+
+
+def write_by_artist(sorter):
+    """global_charts_by_artist.csv: one row per artist of each entry, sorted by artist."""
+    rows = 0
+    with open(BY_ARTIST_CSV, "w", encoding="utf-8", newline="") as outfile:
+        csv_writer = csv.writer(outfile)
+        csv_writer.writerow(FIELDNAMES)
+        for row in sorter.values():
+            csv_writer.writerow(row)
+            rows += 1
+
+    print(f"Successfully reorganized {rows} rows by artist.")
+    print(f"Output saved to: {BY_ARTIST_CSV}")
+
+
+def run_pipeline(
+    input_file=INPUT_FILE,
+    stages=STAGES,
+    run_size=RUN_SIZE,
+    tmp_dir=None,
+    progress_every=100_000,
+    engine=DEFAULT_ENGINE,
+    workers=1,
+):
+    """
+    Produce the outputs of the selected stages from one read of `input_file`.
+
+    Args:
+        input_file: charts.csv with rows for every country
+        stages: Names from STAGES
+        run_size: Rows each external sort holds in memory before spilling a run
+        tmp_dir: Directory for the sort runs
+        progress_every: Global rows between progress lines
+        engine: chart_ingest engine used to read the CSV
+        workers: Processes parsing the CSV; 1 reads it in this process
+    """
+    stages = set(stages)
+    started = time.monotonic()
+    print(f"Reading {input_file} (stages: {', '.join(s for s in STAGES if s in stages)})...")
+
+    sorters = {}
+    if "filter" in stages:
+        sorters["filter"] = ExternalSorter(run_size, tmp_dir)
+    if "by-date" in stages or "json" in stages:
+        sorters["by-date"] = ExternalSorter(run_size, tmp_dir)
+    if "by-artist" in stages:
+        sorters["by-artist"] = ExternalSorter(run_size, tmp_dir)
+
+    dates = {}
+    try:
+        total = read_charts(input_file, stages, sorters, dates, progress_every, engine, workers)
+        if "filter" in sorters:
+            write_global_json(sorters["filter"], total, dates)
+        if "by-date" in sorters:
+            write_by_date(sorters["by-date"], stages, total, dates, input_file)
+        if "by-artist" in sorters:
+            write_by_artist(sorters["by-artist"])
+    finally:
+        for sorter in sorters.values():
+            sorter.close()
+
+    print(f"Processing complete in {time.monotonic() - started:.1f}s")
+
+
+def parse_stages(value):
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown or not stages:
+        raise argparse.ArgumentTypeError(f"stages must be from {', '.join(STAGES)}")
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Produce all global chart outputs from one pass over charts.csv")
+    parser.add_argument("--input", default=INPUT_FILE, help=f"charts.csv to read (default: {INPUT_FILE})")
+    parser.add_argument(
+        "--stages", type=parse_stages, default=list(STAGES), help=f"Comma separated, from {','.join(STAGES)} (default: all)"
+    )
+    parser.add_argument(
+        "--run-size", type=int, default=RUN_SIZE, help=f"Rows per sort run held in memory (default: {RUN_SIZE})"
+    )
+    parser.add_argument("--tmp-dir", help="Directory for sort runs (default: system temp dir)")
+    parser.add_argument(
+        "--engine", choices=available_engines(), default=DEFAULT_ENGINE, help="CSV reader (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="CSV parser processes (default: CPU count; 1 = inline)"
+    )
+    args = parser.parse_args()
+
+    run_pipeline(args.input, args.stages, args.run_size, args.tmp_dir, engine=args.engine, workers=args.workers)
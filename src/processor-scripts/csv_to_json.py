@@ -1,24 +1,82 @@
 #!/usr/bin/env python3
 """
 Script to convert global_charts_by_date.csv to JSON format
+
+Each date's entries are written as soon as the next date starts
+(chart_json_stream.py), so only one date is held in memory. The input must
+be grouped by date, as reorganize_charts.py writes it. By default the file
+is the same indent=2 JSON as before; --compact drops the whitespace,
+--ndjson date|entry writes one date or one entry per line instead, and
+--gzip compresses the output. A byte-offset index per date is written next
+to it (<output>.index.json), so one date can be read without parsing the rest.
+
+With --format parquet (or both) the entries are also written as a Parquet
+dataset partitioned by chart week (chart_dataset.py). With --entities they
+are also written to global_charts_entities.json, with artists, genres and
+tracks in shared tables and each entry as [position, streams, track]
+(entity_tables.py). The encoded entries are held per date in a
+ShardedArrayWriter (sharded_writer.py), which spills them to disk past its
+memory ceiling, as process_charts.py does.
+
+Usage:
+  python3 csv_to_json.py
+  python3 csv_to_json.py --compact --gzip
+  python3 csv_to_json.py --ndjson entry
+  python3 csv_to_json.py --format both
+  python3 csv_to_json.py --entities
 """
+import argparse
+import contextlib
 import csv
 import json
-from collections import defaultdict
 from datetime import datetime
 
+from chart_dataset import ChartDatasetWriter
+from chart_json_stream import ChartJsonWriter
+from entity_tables import ENCODED_SEPARATORS, EntityEncoder
+from json_stream import JsonObjectWriter
+from sharded_writer import ShardedArrayWriter
+
+SAMPLE_DATES = 3
+# Rough in-memory size of an encoded entry: [position, streams, track]
+ENCODED_ROW_SIZE = 120
+
+
+def output_path(ndjson=None, use_gzip=False):
+    path = "../../global_charts_by_date." + ("ndjson" if ndjson else "json")
+    return path + ".gz" if use_gzip else path
 
-def csv_to_json():
+
+def csv_to_json(output_format="json", write_entities=False, compact=False, ndjson=None, use_gzip=False):
     input_file = "../../git_ignore/global_charts_by_date.csv"
-    output_file = "../../global_charts_by_date.json"
+    output_file = output_path(ndjson, use_gzip)
+    output_dataset = "../../global_charts_dataset"
+    output_entities = "../../global_charts_entities.json"
 
     print(f"Reading CSV file: {input_file}")
 
-    # Dictionary to store charts organized by date
-    charts_data = defaultdict(list)
+    writes_json = output_format != "parquet"
+    writes_dataset = output_format != "json"
+    entities = EntityEncoder() if write_entities else None
+    # The first dates in sorted order and their entries, for the sample file
+    sample_charts = {}
+    dates_seen = set()
     total_entries = 0
 
-    with open(input_file, "r", encoding="utf-8") as csvfile:
+    with contextlib.ExitStack() as stack:
+        # Date blocks are written as they complete; the header follows in finish()
+        charts = None
+        if writes_json:
+            charts = stack.enter_context(
+                ChartJsonWriter(
+                    output_file, "ndjson" if ndjson else "json", ndjson or "date", compact=compact, use_gzip=use_gzip
+                )
+            )
+        csvfile = stack.enter_context(open(input_file, "r", encoding="utf-8"))
+        dataset = stack.enter_context(ChartDatasetWriter(output_dataset)) if writes_dataset else None
+        encoded_data = None
+        if entities is not None:
+            encoded_data = stack.enter_context(ShardedArrayWriter(indent=None, separators=ENCODED_SEPARATORS))
         reader = csv.DictReader(csvfile)
 
         for row in reader:
@@ -36,62 +94,51 @@ def csv_to_json():
                 "track_name": row["track_name"],
             }
 
-            charts_data[date].append(entry)
+            if dataset is not None:
+                dataset.add_entry("global", date, entry)
+            if charts is not None:
+                charts.add(date, entry)
+                if date not in dates_seen:
+                    dates_seen.add(date)
+                    if len(sample_charts) < SAMPLE_DATES or date < max(sample_charts):
+                        sample_charts[date] = []
+                        if len(sample_charts) > SAMPLE_DATES:
+                            del sample_charts[max(sample_charts)]
+                if date in sample_charts:
+                    sample_charts[date].append(entry)
+            if entities is not None:
+                encoded_entry = [entry["position"], entry["streams"], entities.track_entry(entry)]
+                encoded_data.write(date, encoded_entry, ENCODED_ROW_SIZE)
             total_entries += 1
 
             if total_entries % 10000 == 0:
                 print(f"Processed {total_entries} entries...")
 
-    print(f"Total entries processed: {total_entries}")
-    print(f"Unique dates: {len(charts_data)}")
-
-    # Create the final JSON structure
-    dates = list(charts_data.keys())
-    date_range = {"start": min(dates), "end": max(dates)}
-
-    json_data = {
-        "metadata": {
-            "title": "Global Spotify Charts Data",
-            "description": "Global Spotify charts organized by date with positions sorted from 1 to highest",
-            "source": "Converted from global_charts_by_date.csv",
-            "total_entries": total_entries,
-            "unique_dates": len(charts_data),
-            "date_range": date_range,
-            "created_date": datetime.now().isoformat(),
-            "data_structure": {
-                "charts": "Object with date keys, each containing array of chart entries",
-                "entry_fields": [
-                    "position (integer)",
-                    "streams (integer)",
-                    "track_id (string)",
-                    "artists (array of strings)",
-                    "genres (array of strings)",
-                    "duration_ms (integer)",
-                    "explicit (boolean)",
-                    "track_name (string)",
-                ],
-            },
-        },
-        "charts": dict(charts_data),  # Convert defaultdict to regular dict
-    }
-
-    print(f"Writing JSON file: {output_file}")
+        print(f"Total entries processed: {total_entries}")
+        if entities is not None:
+            write_entities_json(output_entities, encoded_data, entities, total_entries)
+        if charts is not None:
+            metadata = chart_metadata(total_entries, dates_seen)
+            print(f"Writing JSON file: {output_file}")
+            charts.finish(metadata)
 
-    with open(output_file, "w", encoding="utf-8") as jsonfile:
-        json.dump(json_data, jsonfile, indent=2, ensure_ascii=False)
+    if writes_dataset:
+        print(f"Parquet dataset written to {output_dataset}")
+    if not writes_json:
+        return
+    print(f"Unique dates: {len(dates_seen)}")
 
     print(f"Successfully created {output_file}")
-    print(f"File contains {total_entries} chart entries across {len(charts_data)} dates")
+    print(f"File contains {total_entries} chart entries across {len(dates_seen)} dates")
 
     # Create a sample to show the structure
     sample_file = "../../global_charts_sample.json"
     print(f"Creating sample file: {sample_file}")
 
-    # Get first 3 dates for sample
-    sample_dates = sorted(charts_data.keys())[:3]
+    # First 3 dates for sample
     sample_data = {
-        "metadata": json_data["metadata"],
-        "charts": {date: charts_data[date] for date in sample_dates},
+        "metadata": metadata,
+        "charts": {date: sample_charts[date] for date in sorted(sample_charts)},
         "note": f"This is a sample containing only the first 3 dates. Full data is in {output_file}",
     }
 
@@ -101,5 +148,85 @@ def csv_to_json():
     print(f"Sample file created: {sample_file}")
 
 
+def chart_metadata(total_entries, dates_seen):
+    """Metadata for the header of global_charts.json."""
+    date_range = {"start": min(dates_seen), "end": max(dates_seen)}
+
+    return {
+        "title": "Global Spotify Charts Data",
+        "description": "Global Spotify charts organized by date with positions sorted from 1 to highest",
+        "source": "Converted from global_charts_by_date.csv",
+        "total_entries": total_entries,
+        "unique_dates": len(dates_seen),
+        "date_range": date_range,
+        "created_date": datetime.now().isoformat(),
+        "data_structure": {
+            "charts": "Object with date keys, each containing array of chart entries",
+            "entry_fields": [
+                "position (integer)",
+                "streams (integer)",
+                "track_id (string)",
+                "artists (array of strings)",
+                "genres (array of strings)",
+                "duration_ms (integer)",
+                "explicit (boolean)",
+                "track_name (string)",
+            ],
+        },
+    }
+
+
+def write_entities_json(output_file, encoded_data, entities, total_entries):
+    """Write the entries by date as [position, streams, track] with the entity tables."""
+    dates = list(encoded_data.counts)
+    metadata = {
+        "title": "Global Spotify Charts Data (entity encoded)",
+        "description": "global_charts_by_date.json with artists, genres and tracks stored once (entity_tables.py)",
+        "source": "Converted from global_charts_by_date.csv",
+        "total_entries": total_entries,
+        "unique_dates": len(dates),
+        "unique_tracks": len(entities.tracks),
+        "date_range": {"start": min(dates), "end": max(dates)} if dates else None,
+        "created_date": datetime.now().isoformat(),
+    }
+
+    print(f"Writing entity encoded JSON file: {output_file}")
+    with open(output_file, "w", encoding="utf-8") as jsonfile, JsonObjectWriter(
+        jsonfile, indent=None, separators=ENCODED_SEPARATORS
+    ) as document:
+        document.member("metadata", metadata)
+        document.member("entry_fields", ["position", "streams", "track"])
+        document.member("entities", entities.tables())
+        with document.object("charts") as charts:
+            for date in dates:
+                charts.key(date)
+                encoded_data.write_array(date, jsonfile)
+    print(
+        f"{len(entities.tracks)} tracks, {len(entities.artists)} artists and {len(entities.genres)} genres "
+        f"referenced by {total_entries} entries"
+    )
+
+
 if __name__ == "__main__":
-    csv_to_json()
+    parser = argparse.ArgumentParser(description="Convert global_charts_by_date.csv to JSON")
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet", "both"],
+        default="json",
+        help="global_charts_by_date.json, a Parquet dataset partitioned by week (chart_dataset.py), or both",
+    )
+    parser.add_argument(
+        "--entities",
+        action="store_true",
+        help="Also write global_charts_entities.json, with entries referencing shared entity tables",
+    )
+    parser.add_argument("--compact", action="store_true", help="Write the JSON without indentation or spaces")
+    parser.add_argument(
+        "--ndjson",
+        choices=["date", "entry"],
+        help="Write global_charts_by_date.ndjson instead, with one date or one entry per line",
+    )
+    parser.add_argument("--gzip", action="store_true", help="Compress the JSON output (.gz)")
+    args = parser.parse_args()
+
+    csv_to_json(args.format, args.entities, args.compact, args.ndjson, args.gzip)
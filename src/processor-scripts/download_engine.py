@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Concurrent download engine for kworb pages.
+
+Fetches the pending URLs of a DownloadQueue on asyncio. Each host gets a
+throttle.HostThrottle that adapts the number of requests in flight and the
+request rate to how the server responds; 429, 5xx and timeouts are retried
+with jittered exponential backoff. Each page is checked for valid HTML before
+it is saved, and URLs whose file is already on disk are skipped.
+
+Pages are written to a store: LooseFileStore keeps one .html file per URL,
+and page_archive.PageArchive packs them into compressed segment files. Both
+offer `url in store`, `content_hash(url)`, `put(url, data)` and `commit()`.
+
+In refresh mode pages already stored are fetched again with a conditional
+request (If-None-Match / If-Modified-Since). A 304, or a 200 whose content
+hash matches the stored one, is recorded as not modified and the stored copy
+is left untouched.
+
+A page sink (stream_pipeline.StreamingParser) may be attached to receive each
+new or changed page body as it arrives. With a sink the store is optional:
+pages are then only parsed, not saved.
+
+Used by scrape_data.py and download_songs_urls.py.
+"""
+import asyncio
+import hashlib
+import heapq
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from download_queue import DONE, ERROR, IN_FLIGHT, PENDING, DownloadQueue, url_to_filename
+from page_archive import PageArchive
+from throttle import BACKOFF_STATUSES, RETRY_STATUSES, HostThrottle, backoff_delay, parse_retry_after
+from validated_manifest import ValidatedManifest
+
+# List of realistic User-Agent strings to rotate through
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+]
+
+# Markers checked in the first 500 characters of a saved file
+FILE_HTML_INDICATORS = ["<html", "<head", "<body", "<!doctype", "<title", "<div", "<span"]
+
+# Markers a freshly downloaded response must contain
+RESPONSE_HTML_INDICATORS = ["<html", "<head", "<body", "<!doctype"]
+
+
+def is_valid_html_file(filepath):
+    """Check if a file on disk contains valid HTML."""
+    try:
+        if not os.path.exists(filepath):
+            return False
+
+        with open(filepath, "r", encoding="utf-8") as f:
+            content = f.read(500)  # Read first 500 chars
+
+        # Check for common HTML indicators
+        if len(content) < 50:
+            return False
+
+        # Look for HTML tags or structure
+        return any(indicator in content.lower() for indicator in FILE_HTML_INDICATORS)
+    except Exception:
+        return False
+
+
+def hash_bytes(data):
+    """Content hash stored in the queue for change detection."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(filepath):
+    with open(filepath, "rb") as f:
+        return hash_bytes(f.read())
+
+
+def looks_like_html(content):
+    """Verify we got actual HTML content (not binary gibberish)."""
+    return len(content) >= 100 and any(tag in content.lower() for tag in RESPONSE_HTML_INDICATORS)
+
+
+def remove_corrupted_files(output_dir, manifest=None):
+    """
+    Clean up any corrupted files from previous runs.
+
+    Only files that are new or changed since they were last validated are
+    read; the results are saved to the directory's ValidatedManifest.
+    """
+    print("Checking for corrupted files from previous downloads...")
+    if manifest is None:
+        manifest = ValidatedManifest(output_dir)
+    checked, removed = manifest.sweep(is_valid_html_file)
+    manifest.save()
+    print(f"Checked {checked} new or changed files, removed {removed}, {len(manifest.files)} valid")
+    return manifest
+
+
+def build_headers():
+    """Request headers with a randomly chosen User-Agent."""
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept-Language": "en-US,en;q=0.9",
+        "Accept-Encoding": "gzip, deflate",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Connection": "keep-alive",
+        "Referer": "https://www.google.com/",
+    }
+
+
+class LooseFileStore:
+    """
+    Pages saved as one .html file per URL in `output_dir`.
+
+    Validity is looked up in the directory's ValidatedManifest, which is
+    reconciled with the directory once at startup, so membership checks do
+    not touch the disk.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = remove_corrupted_files(output_dir)
+
+    def _path(self, url):
+        return os.path.join(self.output_dir, url_to_filename(url))
+
+    def __contains__(self, url):
+        return url_to_filename(url) in self.manifest
+
+    def content_hash(self, url):
+        return hash_file(self._path(url))
+
+    def put(self, url, data):
+        filename = url_to_filename(url)
+        with open(self._path(url), "wb") as f:
+            f.write(data)
+        self.manifest.add(filename)
+
+    def commit(self):
+        self.manifest.save()
+
+    def close(self):
+        self.manifest.save()
+
+
+class DownloadEngine:
+    """
+    Download the pending URLs of a DownloadQueue into a page store.
+
+    Args:
+        queue: DownloadQueue holding the URLs and their state
+        store: LooseFileStore or PageArchive the pages are written to, or
+            None to keep no raw copy (only useful with a page_sink)
+        concurrency: Maximum number of requests in flight per host; the
+            throttle starts at half of this and adapts
+        rate_per_host: Starting requests per second for each host
+        max_rate: Requests per second the throttle may raise a host to
+        burst: Requests a host may receive back to back before the rate applies
+        timeout: Per-request timeout in seconds
+        refresh: Re-fetch pages already on disk with conditional requests
+            instead of skipping them
+        max_attempts: Attempts per URL before it is recorded as an error
+        report_every: Seconds between throttle status reports
+        page_sink: Optional object with async `start()`, `submit(url, html)`
+            and `close()` that receives every new or changed page
+    """
+
+    def __init__(
+        self,
+        queue,
+        store,
+        concurrency=8,
+        rate_per_host=4.0,
+        max_rate=20.0,
+        burst=2,
+        timeout=10,
+        refresh=False,
+        max_attempts=5,
+        report_every=30,
+        page_sink=None,
+    ):
+        self.queue = queue
+        self.store = store
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.max_rate = max_rate
+        self.burst = burst
+        self.timeout = timeout
+        self.refresh = refresh
+        self.max_attempts = max_attempts
+        self.report_every = report_every
+        self.page_sink = page_sink
+
+        self.throttles = {}
+        self.claimed = []
+        self.retry_heap = []
+        self.attempts = {}
+        self.retries = 0
+        self.latencies = []
+        self.downloaded = 0
+        self.skipped = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.total = 0
+        self.count = 0
+
+    def _throttle_for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.throttles:
+            self.throttles[host] = HostThrottle(
+                concurrency=max(1, self.concurrency // 2),
+                max_concurrency=self.concurrency,
+                rate=self.rate_per_host,
+                max_rate=self.max_rate,
+                burst=self.burst,
+            )
+        return self.throttles[host]
+
+    def _next_url(self):
+        # Retries whose backoff has elapsed go first
+        if self.retry_heap and self.retry_heap[0][0] <= time.monotonic():
+            return heapq.heappop(self.retry_heap)[1]
+
+        # Claim URLs from the queue in batches rather than one query per URL
+        if not self.claimed:
+            self.claimed = self.queue.claim(max(self.concurrency * 4, 64))
+            self.claimed.reverse()
+        return self.claimed.pop() if self.claimed else None
+
+    def _record(self, url, status, error=None, fetched=True, **fields):
+        if status == "error":
+            self.errors += 1
+            self.queue.mark(url, ERROR, error=error, fetched=fetched)
+            return
+
+        if status == "skipped":
+            self.skipped += 1
+        elif status == "not_modified":
+            self.not_modified += 1
+            fields["changed"] = 0
+        else:
+            self.downloaded += 1
+            fields["changed"] = 1
+        self.queue.mark(url, DONE, fetched=fetched, **fields)
+
+    def _retry_or_fail(self, url, throttle, reason, retry_after=None):
+        attempts = self.attempts[url] = self.attempts.get(url, 0) + 1
+        if attempts >= self.max_attempts:
+            print(f"Failed to download {url} after {attempts} attempts: {reason}")
+            self._record(url, "error", error=reason)
+            return
+
+        delay = max(retry_after or 0.0, backoff_delay(attempts))
+        print(f"Retrying {url} in {delay:.1f}s ({reason}, attempt {attempts}/{self.max_attempts})")
+        self.retries += 1
+        throttle.retries += 1
+        self.queue.mark(url, IN_FLIGHT, error=reason, fetched=True)
+        heapq.heappush(self.retry_heap, (time.monotonic() + delay, url))
+
+    async def _fetch(self, session, url):
+        self.count += 1
+        i = self.count
+
+        # Check if the page is already stored and valid
+        on_disk = self.store is not None and url in self.store
+        if on_disk and not self.refresh:
+            print(f"[{i}/{self.total}] Already downloaded, skipping: {url}")
+            self._record(url, "skipped", fetched=False)
+            return
+
+        headers = build_headers()
+        etag, last_modified, content_hash = None, None, None
+        # Only send validators when there is a stored copy to fall back on, or
+        # when pages are parsed without being stored and were parsed before
+        if on_disk or (self.store is None and self.refresh):
+            etag, last_modified, content_hash = self.queue.cache_info(url)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        throttle = self._throttle_for(url)
+        await throttle.acquire()
+        started = time.monotonic()
+
+        try:
+            print(f"[{i}/{self.total}] Downloading: {url}")
+            async with session.get(url, headers=headers) as response:
+                if response.status != 200:
+                    self.latencies.append(time.monotonic() - started)
+
+                if response.status in RETRY_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if response.status in BACKOFF_STATUSES:
+                        throttle.on_backoff(retry_after)
+                    self._retry_or_fail(url, throttle, f"HTTP {response.status}", retry_after)
+                    return
+
+                if response.status == 304:
+                    await throttle.on_success()
+                    print(f"[{i}/{self.total}] Not modified: {url}")
+                    self._record(url, "not_modified")
+                    return
+
+                response.raise_for_status()
+                body = await response.read()
+                self.latencies.append(time.monotonic() - started)
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+
+                # Ensure proper encoding
+                encoding = response.charset
+                if encoding is None or encoding.lower() == "iso-8859-1":
+                    encoding = "utf-8"
+
+            await throttle.on_success()
+            content = body.decode(encoding, errors="replace")
+
+            if not looks_like_html(content):
+                print(f"Warning: Content doesn't appear to be valid HTML for {url}")
+                self._record(url, "error", error="invalid html")
+                return
+
+            data = content.encode("utf-8")
+            new_hash = hash_bytes(data)
+
+            if on_disk or content_hash is not None:
+                # Pages saved before hashes were kept in the queue are hashed once
+                if content_hash is None:
+                    content_hash = self.store.content_hash(url)
+                if content_hash == new_hash:
+                    print(f"[{i}/{self.total}] Unchanged content: {url}")
+                    self._record(url, "not_modified", content_hash=new_hash, **validators)
+                    return
+
+            if self.store is not None:
+                self.store.put(url, data)
+            if self.page_sink is not None:
+                await self.page_sink.submit(url, content)
+
+            self._record(url, "downloaded", content_hash=new_hash, **validators)
+
+        except asyncio.TimeoutError:
+            throttle.on_backoff()
+            self._retry_or_fail(url, throttle, "timeout")
+        except aiohttp.ClientConnectionError as e:
+            self._retry_or_fail(url, throttle, str(e) or type(e).__name__)
+        except Exception as e:
+            print(f"Failed to download {url}: {e}")
+            self._record(url, "error", error=str(e))
+        finally:
+            await throttle.release()
+
+    async def _worker(self, session):
+        while True:
+            url = self._next_url()
+            if url is None:
+                if not self.retry_heap:
+                    return
+                # Only retries are left: wait for the earliest one
+                ready_at, url = heapq.heappop(self.retry_heap)
+                await asyncio.sleep(max(0.0, ready_at - time.monotonic()))
+            await self._fetch(session, url)
+
+    def print_status(self):
+        """Print each host's throttle state."""
+        for host, throttle in self.throttles.items():
+            state = throttle.snapshot()
+            print(
+                f"Throttle {host}: concurrency={state['concurrency']} in_flight={state['inFlight']} "
+                f"rate={state['rate']}/s paused={state['paused']}s ok={state['successes']} "
+                f"backoffs={state['backoffs']} retries={state['retries']}"
+            )
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_every)
+            self.print_status()
+
+    async def run(self):
+        """Download every pending URL, returning once the queue is drained."""
+        self.total = self.queue.counts()[PENDING]
+
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        if self.page_sink is not None:
+            await self.page_sink.start()
+        try:
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                reporter = asyncio.create_task(self._reporter())
+                workers = [self._worker(session) for _ in range(self.concurrency)]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    reporter.cancel()
+        finally:
+            if self.page_sink is not None:
+                await self.page_sink.close()
+            if self.store is not None:
+                self.store.commit()
+            self.queue.commit()
+
+
+def run_downloads(queue, store, **kwargs):
+    """
+    Run a DownloadEngine over the pending URLs of `queue` and return it.
+
+    A KeyboardInterrupt stops the run early. Progress made so far is committed
+    and URLs still in flight go back to pending on the next start.
+    """
+    engine = DownloadEngine(queue, store, **kwargs)
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        print("\nInterrupted, saving progress...")
+        if store is not None:
+            store.commit()
+        queue.commit()
+    return engine
+
+
+def download_tracking_files(
+    to_download_file,
+    downloaded_file,
+    error_file,
+    output_dir,
+    queue_db,
+    refresh=False,
+    archive_dir=None,
+    page_sink=None,
+    save_pages=True,
+    **kwargs,
+):
+    """
+    Download the URLs of a three-file tracking layout through a DownloadQueue.
+
+    The queue in `queue_db` is the source of truth while downloading; the text
+    files are imported at startup and rewritten from the queue at the end.
+    With `refresh`, URLs already done are queued again and fetched with
+    conditional requests. Pages go to `archive_dir` as a PageArchive when it
+    is given, otherwise to loose files in `output_dir` unless `save_pages` is
+    False. `page_sink` receives each new or changed page.
+    """
+    if archive_dir:
+        store = PageArchive(archive_dir)
+    elif save_pages:
+        store = LooseFileStore(output_dir)
+    else:
+        store = None
+    queue = DownloadQueue(queue_db)
+    try:
+        added = queue.import_tracking_files(to_download_file, downloaded_file, error_file)
+        if refresh:
+            print(f"Refreshing {queue.requeue(DONE)} downloaded URLs")
+        counts = queue.counts()
+        print(f"Queue: {added} new URLs, {counts[PENDING]} pending, {counts[DONE]} done, {counts[ERROR]} errors")
+
+        engine = run_downloads(queue, store, refresh=refresh, page_sink=page_sink, **kwargs)
+
+        queue.export_tracking_files(to_download_file, downloaded_file, error_file)
+        counts = queue.counts()
+    finally:
+        queue.close()
+        if store is not None:
+            store.close()
+
+    print(f"\nProcessing complete:")
+    print(f"- Downloaded: {engine.downloaded}")
+    print(f"- Already on disk: {engine.skipped}")
+    print(f"- Not modified: {engine.not_modified}")
+    print(f"- Retries: {engine.retries}")
+    print(f"- Errors: {engine.errors}")
+    print(f"- Remaining: {counts[PENDING] + counts[IN_FLIGHT]}")
+    if archive_dir:
+        print(f"- Pages stored in archive: {archive_dir}/")
+    elif save_pages:
+        print(f"- Files saved to: {output_dir}/")
+    engine.print_status()
+    return engine
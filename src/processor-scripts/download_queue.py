@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Durable download queue backed by SQLite in WAL mode.
+
+Each URL has a state (pending, in_flight, done, error), an attempt count and
+the time it was last fetched. State changes are committed in batches, so a
+crash loses at most one batch, and URLs left in flight are put back to
+pending when the queue is reopened.
+
+The queue also keeps the ETag, Last-Modified and content hash of each page so
+re-scrapes can send conditional requests, whether the last fetch changed the
+page, and the content hash and output file of the page's last extraction, so
+the extractor can skip pages it has already extracted as they are now.
+
+The queue can import and export the x_to_download / y_downloaded / z_error
+text files the downloaders used before.
+"""
+import sqlite3
+import time
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+ERROR = "error"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_fetched REAL,
+    last_error TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    changed INTEGER,
+    extracted_hash TEXT,
+    extracted_output TEXT
+);
+CREATE INDEX IF NOT EXISTS urls_state_seq ON urls (state, seq);
+"""
+
+# Columns added after the first schema, created on older databases when opened
+ADDED_COLUMNS = {
+    "etag": "TEXT",
+    "last_modified": "TEXT",
+    "content_hash": "TEXT",
+    "changed": "INTEGER",
+    "extracted_hash": "TEXT",
+    "extracted_output": "TEXT",
+}
+
+
+def url_to_filename(url):
+    """Clean up the URL to use as a filename."""
+    return url.replace("https://", "").replace("http://", "").replace("/", "_") + ".html"
+
+
+def read_url_file(path):
+    """Read a URL list file, returning [] if it does not exist."""
+    try:
+        with open(path, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+class DownloadQueue:
+    """
+    Persistent URL queue.
+
+    Args:
+        db_path: SQLite database file
+        batch_size: Number of state changes between commits
+    """
+
+    def __init__(self, db_path, batch_size=500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.uncommitted = 0
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.recover()
+
+    def _migrate(self):
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(urls)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE urls ADD COLUMN {column} {column_type}")
+        self.conn.commit()
+
+    def recover(self):
+        """Return URLs left in flight by a crashed run to pending."""
+        cur = self.conn.execute("UPDATE urls SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT))
+        self.conn.commit()
+        return cur.rowcount
+
+    def _next_seq(self):
+        (seq,) = self.conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM urls").fetchone()
+        return seq
+
+    def add(self, urls, state=PENDING):
+        """Add URLs that are not in the queue yet. Returns the number added."""
+        seq = self._next_seq()
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO urls (url, seq, state) VALUES (?, ?, ?)",
+            ((url, seq + i, state) for i, url in enumerate(urls)),
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def claim(self, limit):
+        """Move up to `limit` pending URLs to in_flight and return them in queue order."""
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE state = ? ORDER BY seq LIMIT ?", (PENDING, limit)
+        ).fetchall()
+        urls = [row[0] for row in rows]
+        self.conn.executemany("UPDATE urls SET state = ? WHERE url = ?", ((IN_FLIGHT, url) for url in urls))
+        self._count_writes(len(urls))
+        return urls
+
+    def mark(self, url, state, error=None, fetched=False, **fields):
+        """
+        Record the outcome for a URL.
+
+        Args:
+            url: URL to update
+            state: New state
+            error: Error message stored alongside an error state
+            fetched: Whether a request was made, which counts as an attempt
+            **fields: Cache columns to update (etag, last_modified,
+                content_hash, changed)
+        """
+        assignments = ["state = ?", "last_error = ?"]
+        values = [state, error]
+        if fetched:
+            assignments += ["attempts = attempts + 1", "last_fetched = ?"]
+            values.append(time.time())
+        for column, value in fields.items():
+            if column not in ADDED_COLUMNS:
+                raise ValueError(f"Unknown queue column: {column}")
+            assignments.append(f"{column} = ?")
+            values.append(value)
+        values.append(url)
+        self.conn.execute(f"UPDATE urls SET {', '.join(assignments)} WHERE url = ?", values)
+        self._count_writes(1)
+
+    def cache_info(self, url):
+        """Stored (etag, last_modified, content_hash) for a URL."""
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash FROM urls WHERE url = ?", (url,)
+        ).fetchone()
+        return row or (None, None, None)
+
+    def requeue(self, *states):
+        """Put URLs in the given states back to pending, e.g. for a refresh run."""
+        placeholders = ", ".join("?" for _ in states)
+        cur = self.conn.execute(f"UPDATE urls SET state = ? WHERE state IN ({placeholders})", (PENDING, *states))
+        self.conn.commit()
+        return cur.rowcount
+
+    def _count_writes(self, n):
+        self.uncommitted += n
+        if self.uncommitted >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def counts(self):
+        """Number of URLs in each state."""
+        counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, ERROR: 0}
+        for state, n in self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state"):
+            counts[state] = n
+        return counts
+
+    def urls_in_state(self, *states):
+        """Yield URLs in any of the given states, in queue order."""
+        placeholders = ", ".join("?" for _ in states)
+        query = f"SELECT url FROM urls WHERE state IN ({placeholders}) ORDER BY seq"
+        for (url,) in self.conn.execute(query, states):
+            yield url
+
+    def mark_extracted(self, url, output_name):
+        """Record that the page's current content was extracted to `output_name`."""
+        self.conn.execute(
+            "UPDATE urls SET extracted_hash = content_hash, extracted_output = ? WHERE url = ?", (output_name, url)
+        )
+        self._count_writes(1)
+
+    def extracted_filenames(self):
+        """
+        Pages whose stored content is the one last extracted.
+
+        A page re-fetched with new content since then is left out, whatever
+        later refreshes found, as is a page with no known content hash.
+
+        Returns:
+            Dict of filename (as saved by the downloaders) to the name of the
+            output file it was extracted to
+        """
+        query = "SELECT url, extracted_output FROM urls WHERE content_hash = extracted_hash ORDER BY seq"
+        return {url_to_filename(url): output_name for url, output_name in self.conn.execute(query)}
+
+    def urls_by_filename(self):
+        """Map of filename (as saved by the downloaders) to URL for every queued page."""
+        return {url_to_filename(url): url for (url,) in self.conn.execute("SELECT url FROM urls ORDER BY seq")}
+
+    def import_tracking_files(self, to_download_file, downloaded_file, error_file):
+        """
+        Load the three-file layout into the queue.
+
+        URLs already in the queue keep their state, so this can run at every
+        startup to pick up URLs newly appended to the to-download file. A URL
+        listed in several files is queued as pending.
+        """
+        added = self.add(read_url_file(to_download_file), PENDING)
+        added += self.add(read_url_file(downloaded_file), DONE)
+        added += self.add(read_url_file(error_file), ERROR)
+        return added
+
+    def export_tracking_files(self, to_download_file, downloaded_file, error_file):
+        """Rewrite the three-file layout from the queue state."""
+        self.commit()
+        for path, states in (
+            (to_download_file, (PENDING, IN_FLIGHT)),
+            (downloaded_file, (DONE,)),
+            (error_file, (ERROR,)),
+        ):
+            with open(path, "w") as f:
+                for url in self.urls_in_state(*states):
+                    f.write(url + "\n")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Dictionary-encoded chart data: entity tables plus integer chart entries.
+
+A chart entry repeats its track's id, name, artist names and genre list on
+every day the track charts. With --entities, csv_to_json.py and
+process_charts.py also write the entries in an encoded form. Each distinct
+artist, genre and track is numbered once, in order of first appearance:
+
+  "entities": {
+    "artists": ["Drake", ...],
+    "genres": ["canadian hip hop", ...],
+    "tracks": {
+      "track_id": [...], "track_name": [...],
+      "artists": [[0, 5], ...], "genres": [[0], ...],   (indexes into the lists above)
+      "duration_ms": [...], "explicit": [...]
+    }
+  }
+
+An entry is then a short array such as [position, streams, track], where
+`track` indexes the tracks table. A track whose name, artists, genres,
+duration or explicit flag differ between rows gets one table row per
+variant, so nothing is lost. An artists or genres value that is not a list
+is stored as a one-item list, as chart_dataset.py does.
+
+load_entity_tables() and load_entity_entries() read these files back with
+every string interned once and the entry columns in compact arrays.
+Entries can be expanded back to the usual dicts with
+EntityTables.entry().
+"""
+import json
+import sys
+from array import array
+
+TRACK_FIELDS = ["track_id", "track_name", "artists", "genres", "duration_ms", "explicit"]
+ENCODED_SEPARATORS = (",", ":")
+
+
+class EntityTable:
+    """Distinct values numbered 0, 1, ... in order of first appearance."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def id(self, value):
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def _items(value):
+    return tuple(value) if isinstance(value, (list, tuple)) else (value,)
+
+
+class EntityEncoder:
+    """
+    Number the artists, genres and tracks of chart rows as they are read.
+
+    One encoder is shared by all the files of an output, so the same id
+    means the same entity everywhere.
+    """
+
+    def __init__(self):
+        self.artists = EntityTable()
+        self.genres = EntityTable()
+        self.tracks = EntityTable()
+
+    def track(self, track_id, track_name, artists, genres, duration_ms, explicit):
+        """Id of a track row; artists and genres are lists of names."""
+        artists = _items(artists)
+        genres = _items(genres)
+        key = (track_id, track_name, artists, genres, duration_ms, explicit)
+        index = self.tracks.ids.get(key)
+        if index is None:
+            record = (
+                track_id,
+                track_name,
+                tuple(self.artists.id(name) for name in artists),
+                tuple(self.genres.id(name) for name in genres),
+                duration_ms,
+                explicit,
+            )
+            index = self.tracks.ids[key] = len(self.tracks.values)
+            self.tracks.values.append(record)
+        return index
+
+    def track_entry(self, entry):
+        """Id of the track of a chart entry dict (track_id, track_name, artists, ...)."""
+        return self.track(
+            entry["track_id"],
+            entry["track_name"],
+            entry["artists"],
+            entry["genres"],
+            entry["duration_ms"],
+            entry["explicit"],
+        )
+
+    def tables(self):
+        """The tables as the "entities" member of an encoded file."""
+        records = self.tracks.values
+        return {
+            "artists": self.artists.values,
+            "genres": self.genres.values,
+            "tracks": {name: [record[i] for record in records] for i, name in enumerate(TRACK_FIELDS)},
+        }
+
+
+def _interned(values):
+    return [sys.intern(value) if isinstance(value, str) else value for value in values]
+
+
+def _column(values, typecode):
+    """An array of `typecode` if every value fits, otherwise a list."""
+    try:
+        return array(typecode, values)
+    except (TypeError, OverflowError):
+        return values
+
+
+class EntityTables:
+    """
+    Entity tables as loaded from an encoded file.
+
+    Names are interned and the artist and genre id lists of equal tracks
+    are shared tuples.
+    """
+
+    def __init__(self, data):
+        self.artists = _interned(data["artists"])
+        self.genres = _interned(data["genres"])
+        tracks = data["tracks"]
+        self.track_id = _interned(tracks["track_id"])
+        self.track_name = _interned(tracks["track_name"])
+        shared = {}
+        self.track_artists = [shared.setdefault(ids, ids) for ids in map(tuple, tracks["artists"])]
+        self.track_genres = [shared.setdefault(ids, ids) for ids in map(tuple, tracks["genres"])]
+        self.duration_ms = _column(tracks["duration_ms"], "q")
+        self.explicit = tracks["explicit"]
+
+    def __len__(self):
+        return len(self.track_id)
+
+    def track(self, index):
+        """Track fields of track `index`, with artist and genre names."""
+        return {
+            "track_id": self.track_id[index],
+            "artists": [self.artists[i] for i in self.track_artists[index]],
+            "genres": [self.genres[i] for i in self.track_genres[index]],
+            "duration_ms": self.duration_ms[index],
+            "explicit": self.explicit[index],
+            "track_name": self.track_name[index],
+        }
+
+    def entry(self, position, streams, track):
+        """A chart entry dict as global_charts_by_date.json holds it."""
+        return {"position": position, "streams": streams, **self.track(track)}
+
+
+class EntryColumns:
+    """
+    Encoded entries held column by column.
+
+    Integer columns are arrays (32-bit for positions and track ids, 64-bit
+    otherwise); a column holding anything but integers stays a list. Dates
+    are lists of interned strings.
+    """
+
+    def __init__(self, fields, rows):
+        self.fields = list(fields)
+        columns = list(zip(*rows)) if rows else [() for _ in self.fields]
+        self.columns = {}
+        for name, values in zip(self.fields, columns):
+            if name == "date":
+                self.columns[name] = _interned(values)
+            else:
+                self.columns[name] = _column(list(values), "i" if name in ("position", "track") else "q")
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) if self.fields else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def load_entity_tables(path):
+    """
+    Read the entity tables of an encoded file, or of a standalone
+    entities.json holding only them.
+
+    Returns:
+        EntityTables
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return EntityTables(data.get("entities", data))
+
+
+def load_entity_entries(path, member):
+    """
+    Read the encoded entries of a file.
+
+    Args:
+        path: Encoded JSON file
+        member: "chart_data" for a list of entries, or "charts" for an
+            object of date -> entries
+
+    Returns:
+        (metadata dict without the entries, EntryColumns or dict of date -> EntryColumns)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.pop(member)
+    fields = data["entry_fields"]
+    if isinstance(entries, dict):
+        return data, {sys.intern(date): EntryColumns(fields, rows) for date, rows in entries.items()}
+    return data, EntryColumns(fields, entries)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+External merge sort for record streams larger than memory.
+
+Records are added with a precomputed sort key. Every `run_size` records the
+buffer is sorted and spilled to an anonymous temporary file as pickled
+blocks; reading back merges the runs (and whatever is still buffered) with a
+k-way heap merge. Equal keys keep the order they were added in, like
+`sorted()`. A stream that never fills the buffer is sorted in memory.
+"""
+import heapq
+import pickle
+import tempfile
+
+RUN_SIZE = 200_000
+MAX_FAN_IN = 128
+BLOCK_SIZE = 1024
+
+
+def _write_run(records, tmp_dir):
+    """Write sorted records to a temporary file in pickled blocks, ready to read."""
+    run = tempfile.TemporaryFile(dir=tmp_dir)
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) >= BLOCK_SIZE:
+            pickle.dump(block, run, pickle.HIGHEST_PROTOCOL)
+            block = []
+    if block:
+        pickle.dump(block, run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    try:
+        while True:
+            yield from pickle.load(run)
+    except EOFError:
+        pass
+    finally:
+        run.close()
+
+
+class ExternalSorter:
+    """
+    Sort (key, value) records with bounded memory.
+
+    Keys must be mutually comparable; values are never compared. Temporary
+    files are deleted when they have been merged, or when the process exits.
+
+    Args:
+        run_size: Records held in memory before a sorted run is spilled
+        tmp_dir: Directory for the run files (default: the system temp dir)
+        max_fan_in: Runs merged at once; more runs are merged in passes
+    """
+
+    def __init__(self, run_size=RUN_SIZE, tmp_dir=None, max_fan_in=MAX_FAN_IN):
+        self.run_size = run_size
+        self.tmp_dir = tmp_dir
+        self.max_fan_in = max_fan_in
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, key, value):
+        # The sequence number keeps equal keys stable and values out of comparisons
+        self.buffer.append((key, self.count, value))
+        self.count += 1
+        if len(self.buffer) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        self.buffer.sort()
+        self.runs.append(_write_run(self.buffer, self.tmp_dir))
+        self.buffer = []
+
+    def _merge_passes(self):
+        # Keep the final merge within the fan-in (plus the in-memory buffer)
+        while len(self.runs) > self.max_fan_in:
+            group, self.runs = self.runs[: self.max_fan_in], self.runs[self.max_fan_in :]
+            self.runs.append(_write_run(heapq.merge(*(_read_run(run) for run in group)), self.tmp_dir))
+
+    def items(self):
+        """Yield (key, value) in key order; the sorter is emptied as it goes."""
+        self.buffer.sort()
+        self._merge_passes()
+        sources = [_read_run(run) for run in self.runs] + [iter(self.buffer)]
+        self.runs = []
+        self.buffer = []
+        for key, _, value in heapq.merge(*sources) if len(sources) > 1 else sources[0]:
+            yield key, value
+
+    def values(self):
+        """Yield the values in key order."""
+        for _, value in self.items():
+            yield value
+
+    def close(self):
+        """Discard everything not yet read."""
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
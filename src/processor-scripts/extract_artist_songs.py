@@ -1,138 +1,316 @@
+import argparse
+import contextlib
+import functools
+import io
 import json
 import os
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from bs4 import BeautifulSoup
+from artist_parsers import DEFAULT_PARSER, PARSERS, available_parsers, parse_artist_html
+from download_queue import DownloadQueue, url_to_filename
+from extraction_manifest import MANIFEST_FILE, ExtractionManifest, hash_file
+from ordered_pool import iter_chunks, map_chunks_in_order
+from page_archive import PageArchive
 
+INPUT_DIR = "../../git_ignore/kworb_artist_songs"
+OUTPUT_DIR = "../data/artists-songs"
 
-def extract_artist_data(html_file_path):
+
+def extract_artist_data(html_file_path, parser=DEFAULT_PARSER):
     """Extract artist and song data from a single HTML file."""
     with open(html_file_path, "r", encoding="utf-8") as file:
         content = file.read()
 
-    soup = BeautifulSoup(content, "html.parser")
-
-    # Extract artist name from title
-    title_tag = soup.find("title")
-    if not title_tag:
-        print(f"No title tag found in {html_file_path}")
-        return None
-
-    title_text = title_tag.get_text()
-    artist_match = re.search(r"(.*?) - Spotify Top Songs", title_text)
-    if not artist_match:
-        print(f"Could not extract artist name from title: {title_text}")
-        return None
-
-    artist_name = artist_match.group(1).strip()
-
-    # Extract artist ID from the URL in the HTML
-    artist_id_match = re.search(r'/spotify/artist/([^_]+)_songs\.html">Songs</a>', content)
-    if not artist_id_match:
-        print(f"Could not extract artist ID from {html_file_path}")
-        return None
-
-    artist_id = artist_id_match.group(1)
-
-    # Find the songs table
-    table = soup.find("table", class_="addpos sortable")
-    if not table:
-        print(f"No songs table found in {html_file_path}")
-        return None
-
-    songs_data = []
-
-    # Extract songs from table rows
-    rows = table.find("tbody").find_all("tr") if table.find("tbody") else []
-
-    for row in rows:
-        cells = row.find_all("td")
-        if len(cells) < 3:
-            continue
-
-        # Extract track name and ID from the first cell
-        track_cell = cells[0]
-        track_link = track_cell.find("a")
-
-        if not track_link:
-            continue
-
-        # Extract track ID from Spotify URL
-        track_url = track_link.get("href", "")
-        track_id_match = re.search(r'https://open\.spotify\.com/track/([^"]+)', track_url)
-        if not track_id_match:
-            continue
-
-        track_id = track_id_match.group(1)
-        track_name = track_link.get_text().strip()
-
-        # Extract total streams and daily streams
-        total_streams = cells[1].get_text().strip().replace(",", "")
-        daily_streams = cells[2].get_text().strip().replace(",", "")
-
-        # Convert to integers if possible
-        try:
-            total_streams = int(total_streams)
-        except ValueError:
-            total_streams = total_streams
-
+    return parse_artist_html(content, html_file_path, parser)
+
+
+def list_source_pages(input_dir, archive_dir=None):
+    """
+    List every artist page without reading it, in a stable order.
+
+    Pages are the loose .html files in `input_dir`, or the pages of a page
+    archive when `archive_dir` is given; archive pages are named by the
+    filename the downloaders would have saved them under.
+
+    Returns:
+        List of (name, location, fingerprint): location is the file path, or
+        the URL key for archive pages, and fingerprint is (size, mtime_ns,
+        sha256). The hash is only known up front for archive pages and is
+        None for loose files.
+    """
+    if archive_dir:
+        with PageArchive(archive_dir) as archive:
+            return [
+                (url_to_filename(url), url, (size, int(fetched_at * 1e9), content_hash))
+                for url, content_hash, size, fetched_at in archive.page_index()
+                if url.endswith("_songs.html")
+            ]
+
+    pages = []
+    for filename in sorted(os.listdir(input_dir)):
+        if filename.endswith(".html"):
+            path = os.path.join(input_dir, filename)
+            stat = os.stat(path)
+            pages.append((filename, path, (stat.st_size, stat.st_mtime_ns, None)))
+    return pages
+
+
+def iter_source_files(input_dir, archive_dir=None, pages=None):
+    """
+    Yield (name, path, html) for `pages` from list_source_pages (default: all).
+
+    Loose files come with their path and html None, so whoever parses them
+    reads them. Archive pages come with path None and their html; only the
+    listed ones are decompressed.
+    """
+    if pages is None:
+        pages = list_source_pages(input_dir, archive_dir)
+
+    if archive_dir:
+        names = {url: name for name, url, _ in pages}
+        with PageArchive(archive_dir) as archive:
+            for url, content in archive.iter_pages(names):
+                yield names[url], None, content
+        return
+
+    for filename, path, _ in pages:
+        yield filename, path, None
+
+
+def iter_source_pages(input_dir, archive_dir=None):
+    """Yield (name, html) for every artist page (see iter_source_files)."""
+    for filename, path, content in iter_source_files(input_dir, archive_dir):
+        if content is None:
+            with open(path, "r", encoding="utf-8") as file:
+                content = file.read()
+        yield filename, content
+
+
+def extract_chunk(pages, parser=DEFAULT_PARSER):
+    """
+    Parse a chunk of pages from iter_source_files.
+
+    Runs in a worker process, so the artist JSON is serialized here and the
+    parser's messages are captured instead of printed.
+
+    Returns:
+        List of (name, result, message) in input order, where result is
+        (artist ID, artist name, song count, JSON text), or None with the
+        reason in `message` when the page failed
+    """
+    results = []
+    for filename, path, content in pages:
+        messages = io.StringIO()
         try:
-            daily_streams = int(daily_streams)
-        except ValueError:
-            daily_streams = daily_streams
-
-        song_data = {
-            "artist": artist_name,
-            "artistId": artist_id,
-            "trackName": track_name,
-            "trackId": track_id,
-            "total": total_streams,
-            "daily": daily_streams,
-        }
-
-        songs_data.append(song_data)
-
-    return {"artist": artist_name, "artistId": artist_id, "songs": songs_data}
-
+            with contextlib.redirect_stdout(messages):
+                if content is None:
+                    with open(path, "r", encoding="utf-8") as file:
+                        content = file.read()
+                artist_data = parse_artist_html(content, filename, parser)
+        except Exception as e:
+            results.append((filename, None, f"Error processing {filename}: {str(e)}"))
+            continue
 
-def process_all_files():
-    """Process all HTML files in the kworb_artist_songs directory."""
-    input_dir = "../../git_ignore/kworb_artist_songs"
-    output_dir = "../data/artists-songs"
+        if artist_data:
+            text = json.dumps(artist_data, indent=2, ensure_ascii=False)
+            results.append(
+                (filename, (artist_data["artistId"], artist_data["artist"], len(artist_data["songs"]), text), None)
+            )
+        else:
+            reason = messages.getvalue().strip()
+            message = f"Failed to extract data from {filename}" + (f" ({reason})" if reason else "")
+            results.append((filename, None, message))
+    return results
+
+
+def process_all_files(
+    input_dir=INPUT_DIR,
+    output_dir=OUTPUT_DIR,
+    skip_files=None,
+    archive_dir=None,
+    parser=DEFAULT_PARSER,
+    workers=1,
+    chunk_size=64,
+    progress_every=1000,
+    incremental=False,
+    manifest_file=MANIFEST_FILE,
+    queue=None,
+):
+    """
+    Process all HTML files in the kworb_artist_songs directory.
+
+    Files named in `skip_files` are left out; their JSON from the previous run
+    is kept as it is. `parser` picks the HTML backend (see artist_parsers.py).
+
+    With `queue` (the downloaders' DownloadQueue), pages whose content is the
+    same as at their last extraction are skipped too, unless their output
+    file is missing, and every page written is recorded in the queue as
+    extracted.
+
+    With `workers` > 1 pages are parsed in a process pool, `chunk_size` pages
+    per task. Results are written in source order whatever the scheduling,
+    so the output is the same as a single-process run; progress is printed
+    every `progress_every` pages and failures are listed at the end.
+
+    With `incremental`, only pages whose fingerprint or output changed since
+    the last run are parsed (see extraction_manifest.py), outputs whose
+    source pages are gone are deleted, and the added, changed and removed
+    artists are summarized. The manifest is `manifest_file`, in git_ignore/
+    by default. A page that fails keeps its previous output.
+    """
+    skip_files = set(skip_files or ())
 
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
     processed_count = 0
-
-    for filename in os.listdir(input_dir):
-        if filename.endswith(".html"):
-            file_path = os.path.join(input_dir, filename)
-            print(f"Processing {filename}...")
-
-            try:
-                artist_data = extract_artist_data(file_path)
-
-                if artist_data:
-                    # Create output filename based on artist ID
-                    output_filename = f"{artist_data['artistId']}.json"
-                    output_path = os.path.join(output_dir, output_filename)
-
-                    # Write JSON file
-                    with open(output_path, "w", encoding="utf-8") as f:
-                        json.dump(artist_data, f, indent=2, ensure_ascii=False)
-
-                    print(f"✓ Extracted {len(artist_data['songs'])} songs for {artist_data['artist']}")
-                    processed_count += 1
-                else:
-                    print(f"✗ Failed to extract data from {filename}")
-
-            except Exception as e:
-                print(f"✗ Error processing {filename}: {str(e)}")
+    skipped_count = 0
+    failures = []
+
+    urls = {}
+    if queue is not None:
+        for name, output_name in queue.extracted_filenames().items():
+            if output_name and os.path.exists(os.path.join(output_dir, output_name)):
+                skip_files.add(name)
+        urls = queue.urls_by_filename()
+
+    sources = list_source_pages(input_dir, archive_dir)
+    to_parse = [page for page in sources if page[0] not in skip_files]
+    skipped_count = len(sources) - len(to_parse)
+
+    manifest = None
+    fingerprints = {}
+    unchanged_count = 0
+    added_artists = set()
+    changed_artists = set()
+    if incremental:
+        manifest = ExtractionManifest(output_dir, manifest_file)
+        present = {name for name, _, _ in sources}
+        for name in [name for name in manifest.entries if name not in present]:
+            manifest.forget(name)
+
+        changed = []
+        for name, location, (size, mtime_ns, content_hash) in to_parse:
+            if manifest.is_unchanged(name, size, mtime_ns, content_hash, path=None if archive_dir else location):
+                unchanged_count += 1
+                continue
+            if content_hash is None:
+                content_hash = hash_file(location)
+            fingerprints[name] = (size, mtime_ns, content_hash)
+            changed.append((name, location, fingerprints[name]))
+        to_parse = changed
+
+    parse_chunk = functools.partial(extract_chunk, parser=parser)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    if executor is not None:
+        print(f"Parsing with {workers} worker processes...")
+        pages = iter_source_files(input_dir, archive_dir, to_parse)
+        results = map_chunks_in_order(executor, parse_chunk, iter_chunks(pages, chunk_size), workers * 4)
+    else:
+        pages = iter_source_files(input_dir, archive_dir, to_parse)
+        results = (result for chunk in iter_chunks(pages, 1) for result in parse_chunk(chunk))
+
+    started = time.monotonic()
+    try:
+        for done, (filename, result, message) in enumerate(results, 1):
+            if executor is None:
+                print(f"Processing {filename}...")
+
+            if result is None:
+                failures.append(message)
+                if executor is None:
+                    print(f"✗ {message}")
+                if manifest is not None:
+                    manifest.record(filename, fingerprints[filename])
+            else:
+                artist_id, artist, song_count, text = result
+
+                # Create output filename based on artist ID
+                output_path = os.path.join(output_dir, f"{artist_id}.json")
+                with open(output_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+
+                processed_count += 1
+                if filename in urls:
+                    queue.mark_extracted(urls[filename], f"{artist_id}.json")
+                if manifest is not None:
+                    manifest.record(filename, fingerprints[filename], artist_id, text)
+                    if artist_id in manifest.previous_artists:
+                        changed_artists.add(artist_id)
+                    else:
+                        added_artists.add(artist_id)
+                if executor is None:
+                    print(f"✓ Extracted {song_count} songs for {artist}")
+
+            if executor is not None and done % progress_every == 0:
+                rate = done / max(time.monotonic() - started, 1e-9)
+                print(f"  {done:,} pages ({rate:,.0f}/s), {processed_count:,} written, {len(failures):,} failed")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if manifest is not None:
+            manifest.save()
+
+    removed_artists = set()
+    if manifest is not None:
+        removed_artists = manifest.remove_orphans()
+        manifest.save()
 
     print(f"\nProcessing complete! Processed {processed_count} files.")
+    if skipped_count:
+        print(f"Skipped {skipped_count} unchanged files.")
+    if manifest is not None:
+        print(
+            f"Incremental: {len(added_artists)} added, {len(changed_artists)} changed, "
+            f"{len(removed_artists)} removed artists; {unchanged_count} pages unchanged."
+        )
+    if failures and executor is not None:
+        print(f"Failed {len(failures)} files:")
+        for message in failures[:20]:
+            print(f"  ✗ {message}")
+        if len(failures) > 20:
+            print(f"  ... and {len(failures) - 20} more")
     print(f"JSON files saved to: {output_dir}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Extract artist song data from kworb pages")
+    parser.add_argument(
+        "--skip-unchanged",
+        metavar="QUEUE_DB",
+        help="Skip pages the downloader's queue holds the same content for as when they were last extracted",
+    )
+    parser.add_argument("--archive", metavar="DIR", help="Read pages from a page archive instead of loose files")
+    parser.add_argument(
+        "--parser",
+        choices=sorted(PARSERS),
+        default=DEFAULT_PARSER,
+        help=f"HTML parser backend (installed: {', '.join(available_parsers())})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Parser processes (default: CPU count; 1 = inline)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-extract pages that changed since the last run and delete outputs of removed pages",
+    )
+    args = parser.parse_args()
+
+    queue = DownloadQueue(args.skip_unchanged) if args.skip_unchanged else None
+    try:
+        process_all_files(
+            archive_dir=args.archive,
+            parser=args.parser,
+            workers=args.workers,
+            incremental=args.incremental,
+            queue=queue,
+        )
+    finally:
+        if queue is not None:
+            queue.close()
+
+
 if __name__ == "__main__":
-    process_all_files()
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Fingerprint manifest for incremental artist-catalog extraction.
+
+For every source page the manifest records the page's fingerprint (size,
+mtime and sha256), the artist ID it produced and the fingerprint of that
+output file. A page is re-extracted only when its own fingerprint changed or
+its output is missing or was modified. Size and mtime are compared first;
+files are hashed only when those differ, so a run where nothing changed reads
+no files at all.
+
+The manifest is kept with the other pipeline state in git_ignore/, not in
+the output directory, which is published as it is.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "../../git_ignore/extract_manifest.json"
+# Where older versions kept it, inside the output directory
+LEGACY_MANIFEST_FILE = ".extract_manifest.json"
+MANIFEST_VERSION = 2
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionManifest:
+    """
+    Source and output fingerprints of one output directory, stored as JSON.
+
+    Entries map a source page name to
+    {"source": [size, mtime_ns, sha256], "artistId": id or None,
+    "output": [size, mtime_ns, sha256] or None}. A page that fails to parse
+    keeps the artistId and output of its last good extraction, so that
+    output stays published; artistId is None only for pages that never
+    parsed. Failed pages are not retried until they change.
+
+    Args:
+        output_dir: Directory of the artist JSON files
+        manifest_file: Manifest path; it records which output directory it
+            describes and starts empty for any other
+    """
+
+    def __init__(self, output_dir, manifest_file=MANIFEST_FILE):
+        self.output_dir = output_dir
+        self.path = manifest_file
+        self.entries = {}
+        self.dirty = False
+        self._load()
+        self.previous_artists = self.artist_ids()
+
+    def _load(self):
+        legacy_path = os.path.join(self.output_dir, LEGACY_MANIFEST_FILE)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Entries of a manifest left in the output directory are not
+            # carried over; the first run re-extracts and saves a new one
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+            return
+        if data.get("version") == MANIFEST_VERSION and data.get("outputDir") == os.path.abspath(self.output_dir):
+            self.entries = data.get("entries", {})
+
+    def save(self):
+        """Write the manifest if it changed, replacing the old file atomically."""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "outputDir": os.path.abspath(self.output_dir), "entries": self.entries},
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def artist_ids(self):
+        return {entry["artistId"] for entry in self.entries.values() if entry["artistId"] is not None}
+
+    def output_path(self, artist_id):
+        return os.path.join(self.output_dir, f"{artist_id}.json")
+
+    def _output_intact(self, entry):
+        if entry["artistId"] is None:
+            return True
+        recorded = entry["output"]
+        try:
+            stat = os.stat(self.output_path(entry["artistId"]))
+        except FileNotFoundError:
+            return False
+        if [stat.st_size, stat.st_mtime_ns] == recorded[:2]:
+            return True
+        if stat.st_size != recorded[0] or hash_file(self.output_path(entry["artistId"])) != recorded[2]:
+            return False
+        entry["output"] = [stat.st_size, stat.st_mtime_ns, recorded[2]]
+        self.dirty = True
+        return True
+
+    def is_unchanged(self, name, size, mtime_ns, content_hash=None, path=None):
+        """
+        Whether a source page and its output are as they were when last extracted.
+
+        Pass the page's sha256 as `content_hash` when it is already known, or
+        the file `path` to hash it if the size or mtime differs. Touched but
+        identical pages get their new mtime recorded.
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return False
+
+        recorded = entry["source"]
+        if [size, mtime_ns] != recorded[:2]:
+            if content_hash is None:
+                if size != recorded[0]:
+                    return False
+                content_hash = hash_file(path)
+            if content_hash != recorded[2]:
+                return False
+            entry["source"] = [size, mtime_ns, content_hash]
+            self.dirty = True
+        elif content_hash is not None and content_hash != recorded[2]:
+            return False
+
+        return self._output_intact(entry)
+
+    def record(self, name, source, artist_id=None, text=None):
+        """
+        Record the extraction of a page.
+
+        Args:
+            name: Source page name
+            source: (size, mtime_ns, sha256) of the page
+            artist_id: Artist ID of the written output, or None if the page failed
+            text: JSON text that was written to the output file
+        """
+        if artist_id is None:
+            # Keep the previous output: a truncated download or a parse error
+            # must not unpublish the artist
+            previous = self.entries.get(name) or {"artistId": None, "output": None}
+            self.entries[name] = {
+                "source": list(source),
+                "artistId": previous["artistId"],
+                "output": previous["output"],
+            }
+        else:
+            stat = os.stat(self.output_path(artist_id))
+            output = [stat.st_size, stat.st_mtime_ns, hash_bytes(text.encode("utf-8"))]
+            self.entries[name] = {"source": list(source), "artistId": artist_id, "output": output}
+        self.dirty = True
+
+    def forget(self, name):
+        if self.entries.pop(name, None) is not None:
+            self.dirty = True
+
+    def remove_orphans(self):
+        """
+        Delete output files no entry produces any more: those of source pages
+        that were removed, or that now produce another artist. Pages that
+        failed keep their artist.
+
+        Returns:
+            Artist IDs whose output was removed
+        """
+        removed = self.previous_artists - self.artist_ids()
+        for artist_id in removed:
+            try:
+                os.remove(self.output_path(artist_id))
+            except FileNotFoundError:
+                pass
+        return removed
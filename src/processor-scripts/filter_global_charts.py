@@ -1,51 +1,88 @@
 #!/usr/bin/env python3
 """
 Script to filter global charts from charts.csv and create a new format
+
+charts.csv is read in column chunks (chart_ingest.py), parsed by --workers
+processes over byte ranges of the file; non-global rows are dropped before
+any of their fields are converted.
+
+Usage:
+  python3 filter_global_charts.py
+  python3 filter_global_charts.py --engine python
+  python3 filter_global_charts.py --workers 8
+  python3 filter_global_charts.py --format both
 """
+import argparse
 import csv
 import json
-from datetime import datetime
+import os
+
+from chart_dataset import ChartDatasetWriter
+from chart_ingest import CHART_COLUMNS, DEFAULT_ENGINE, available_engines, read_chunks
+from list_literal import parse_list_literal
+
 
+def int_or_error(text):
+    try:
+        return int(text)
+    except ValueError as e:
+        return e
 
-def filter_global_charts():
+
+def list_or_error(text):
+    # Parse artists and genres (they appear to be string representations of lists)
+    try:
+        return parse_list_literal(text) if text.startswith("[") else (text,)
+    except (ValueError, SyntaxError) as e:
+        return e
+
+
+def filter_global_charts(engine=DEFAULT_ENGINE, output_format="json", workers=1):
     input_file = "../../git_ignore/charts.csv"
     output_csv = "../../git_ignore/global_charts.csv"
     output_json = "../../git_ignore/global_charts.json"
+    output_dataset = "../../git_ignore/global_charts_dataset"
 
     global_entries = []
+    list_cache = {}
 
     print("Reading and filtering global entries...")
 
-    with open(input_file, "r", encoding="utf-8") as infile:
-        reader = csv.DictReader(infile)
-
-        for row in reader:
-            if row["country"] == "global":
-                # Clean up the data
-                try:
-                    # Parse artists and genres (they appear to be string representations of lists)
-                    artists = eval(row["artists"]) if row["artists"].startswith("[") else [row["artists"]]
-                    genres = (
-                        eval(row["artist_genres"]) if row["artist_genres"].startswith("[") else [row["artist_genres"]]
-                    )
-
-                    clean_entry = {
-                        "date": row["date"],
-                        "position": int(row["position"]),
-                        "streams": int(row["streams"]),
-                        "track_id": row["track_id"],
-                        "artists": artists,
-                        "genres": genres,
-                        "duration_ms": int(row["duration"]),
-                        "explicit": row["explicit"].lower() == "true",
-                        "track_name": row["name"],
-                    }
-
-                    global_entries.append(clean_entry)
-
-                except (ValueError, SyntaxError) as e:
-                    print(f"Skipping problematic row: {e}")
-                    continue
+    for chunk in read_chunks(input_file, CHART_COLUMNS, engine, workers=workers, where=("country", "global")):
+        columns = zip(
+            chunk.text("date"),
+            chunk.ints("position", int_or_error),
+            chunk.ints("streams", int_or_error),
+            chunk.text("track_id"),
+            chunk.decoded("artists", list_or_error, list_cache),
+            chunk.decoded("artist_genres", list_or_error, list_cache),
+            chunk.ints("duration", int_or_error),
+            chunk.flags("explicit", lambda text: text.lower() == "true"),
+            chunk.text("name"),
+        )
+        for date, position, streams, track_id, artists, genres, duration, explicit, name in columns:
+            # Clean up the data; report the first field that failed, in the order they are parsed
+            error = next(
+                (value for value in (artists, genres, position, streams, duration) if isinstance(value, Exception)),
+                None,
+            )
+            if error is not None:
+                print(f"Skipping problematic row: {error}")
+                continue
+
+            clean_entry = {
+                "date": date,
+                "position": position,
+                "streams": streams,
+                "track_id": track_id,
+                "artists": artists,
+                "genres": genres,
+                "duration_ms": duration,
+                "explicit": explicit,
+                "track_name": name,
+            }
+
+            global_entries.append(clean_entry)
 
     print(f"Found {len(global_entries)} global entries")
 
@@ -73,38 +110,63 @@ def filter_global_charts():
             csv_entry["genres"] = json.dumps(entry["genres"])
             writer.writerow(csv_entry)
 
-    # Save as JSON with structured format
-    print(f"Saving to {output_json}...")
-    with open(output_json, "w", encoding="utf-8") as jsonfile:
-        # Group by date for better structure
-        grouped_by_date = {}
-        for entry in global_entries:
-            date = entry["date"]
-            if date not in grouped_by_date:
-                grouped_by_date[date] = []
-            grouped_by_date[date].append(entry)
-
-        # Sort dates
-        sorted_data = dict(sorted(grouped_by_date.items()))
-
-        output_data = {
-            "metadata": {
-                "total_entries": len(global_entries),
-                "date_range": {
-                    "start": min(global_entries, key=lambda x: x["date"])["date"],
-                    "end": max(global_entries, key=lambda x: x["date"])["date"],
+    if output_format != "json":
+        # Save as a Parquet dataset partitioned by chart week
+        print(f"Saving to {output_dataset}...")
+        with ChartDatasetWriter(output_dataset) as dataset:
+            for entry in global_entries:
+                dataset.add_entry("global", entry["date"], entry)
+
+    if output_format != "parquet":
+        # Save as JSON with structured format
+        print(f"Saving to {output_json}...")
+        with open(output_json, "w", encoding="utf-8") as jsonfile:
+            # Group by date for better structure
+            grouped_by_date = {}
+            for entry in global_entries:
+                date = entry["date"]
+                if date not in grouped_by_date:
+                    grouped_by_date[date] = []
+                grouped_by_date[date].append(entry)
+
+            # Sort dates
+            sorted_data = dict(sorted(grouped_by_date.items()))
+
+            output_data = {
+                "metadata": {
+                    "total_entries": len(global_entries),
+                    "date_range": {
+                        "start": min(global_entries, key=lambda x: x["date"])["date"],
+                        "end": max(global_entries, key=lambda x: x["date"])["date"],
+                    },
+                    "description": "Global Spotify charts data filtered from original charts.csv",
                 },
-                "description": "Global Spotify charts data filtered from original charts.csv",
-            },
-            "charts": sorted_data,
-        }
+                "charts": sorted_data,
+            }
 
-        json.dump(output_data, jsonfile, indent=2, ensure_ascii=False)
+            json.dump(output_data, jsonfile, indent=2, ensure_ascii=False)
 
+    outputs = [output_csv] + ([output_json] if output_format != "parquet" else [])
+    outputs += [output_dataset] if output_format != "json" else []
     print("Processing complete!")
-    print(f"Created {output_csv} and {output_json}")
+    print(f"Created {', '.join(outputs[:-1])} and {outputs[-1]}")
     print(f"Total global entries: {len(global_entries)}")
 
 
 if __name__ == "__main__":
-    filter_global_charts()
+    parser = argparse.ArgumentParser(description="Filter global chart entries out of charts.csv")
+    parser.add_argument(
+        "--engine", choices=available_engines(), default=DEFAULT_ENGINE, help="CSV reader (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="CSV parser processes (default: CPU count; 1 = inline)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet", "both"],
+        default="json",
+        help="global_charts.json, a Parquet dataset partitioned by week (chart_dataset.py), or both",
+    )
+    args = parser.parse_args()
+
+    filter_global_charts(args.engine, args.format, args.workers)
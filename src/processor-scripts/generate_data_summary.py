@@ -1,20 +1,28 @@
 #!/usr/bin/env python3
 """
 Script to generate data summary including total unique artists and total unique songs.
+
+Per-file trackId sets are kept in a stats cache (summary_cache.py), so only
+artist files added or changed since the last run are read, in parallel
+through artist_catalogs.py.
 """
 
 import json
 import os
 from pathlib import Path
-from typing import Dict, Set
+from typing import Dict
+
+from summary_cache import CACHE_DB, SummaryCache, collection_name, count_artist_catalogs
 
 
-def collect_database_stats(data_dir: str) -> Dict[str, int]:
+def collect_database_stats(data_dir: str, cache_db: str = CACHE_DB, workers: int = 1) -> Dict[str, int]:
     """
     Collect statistics about the database including total artists and songs.
 
     Args:
         data_dir: Path to the data directory containing artists-songs folder
+        cache_db: Stats cache database (see summary_cache.py)
+        workers: Worker processes for reading artist files
 
     Returns:
         Dictionary containing totalArtists and totalSongs
@@ -24,36 +32,16 @@ def collect_database_stats(data_dir: str) -> Dict[str, int]:
     if not artists_dir.exists():
         raise FileNotFoundError(f"Artists directory not found: {artists_dir}")
 
-    # Count unique artists (number of JSON files)
-    artist_files = list(artists_dir.glob("*.json"))
-    total_artists = len(artist_files)
-
-    # Track unique songs across all artists
-    unique_songs: Set[str] = set()
-
-    print(f"Processing {total_artists} artist files...")
-
-    for i, artist_file in enumerate(artist_files, 1):
-        try:
-            with open(artist_file, "r", encoding="utf-8") as f:
-                artist_data = json.load(f)
-
-            # Add all track IDs from this artist to the set
-            if "songs" in artist_data:
-                for song in artist_data["songs"]:
-                    if "trackId" in song:
-                        unique_songs.add(song["trackId"])
-
-            # Progress indicator
-            if i % 100 == 0:
-                print(f"  Processed {i}/{total_artists} artists...")
-
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            print(f"Warning: Could not process {artist_file}: {e}")
-            continue
+    # Count unique artists (number of JSON files) and songs, reading only changed files
+    with SummaryCache(cache_db) as cache:
+        stats, read, removed = count_artist_catalogs(artists_dir, cache, workers=workers)
+        for artist_file, error in cache.errors(collection_name("artists", artists_dir)):
+            print(f"Warning: Could not process {artist_file}: {error}")
 
-    total_songs = len(unique_songs)
+    total_artists = stats["totalArtists"]
+    total_songs = stats["totalSongs"]
 
+    print(f"Processed {total_artists} artist files: {read} new or changed, {removed} removed")
     print(f"✓ Found {total_artists} unique artists")
     print(f"✓ Found {total_songs} unique songs")
 
@@ -99,7 +87,7 @@ def main():
 
     try:
         # Collect statistics
-        stats = collect_database_stats(data_dir)
+        stats = collect_database_stats(data_dir, workers=os.cpu_count() or 1)
 
         # Update the summary file
         update_data_summary(data_dir, stats)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON writers.
+
+JsonArrayWriter writes a JSON array one element at a time, producing exactly
+the text `json.dump(items, f, indent=2, ensure_ascii=False)` would, without
+holding the whole list in memory. JsonObjectWriter does the same for an
+object's members and can open nested objects and arrays, so documents like
+{"metadata": {...}, "charts": {"<date>": [...], ...}} are streamed too.
+
+ByteOffsetWriter is a text file for these writers that counts the bytes
+written, so a caller can index where each value starts and ends, and can
+gzip each indexed value as its own member.
+"""
+import gzip
+import json
+
+
+class JsonArrayWriter:
+    """
+    Write the elements of a JSON array to an open text file as they arrive.
+
+    Elements are encoded `batch_size` at a time, which is much faster than
+    encoding them one by one with an indent; at most one batch is held.
+
+    Args:
+        f: Text file to write to
+        indent: Indent as for json.dump; None writes the compact form
+        ensure_ascii: As for json.dump
+        batch_size: Elements encoded together
+        level: Nesting depth of the array in the document, for its indentation
+        separators: As for json.dump
+    """
+
+    def __init__(self, f, indent=2, ensure_ascii=False, batch_size=1000, level=0, separators=None):
+        self.f = f
+        self.indent = indent
+        self.pad = indent_padding(indent, level)
+        self.encoder = json.JSONEncoder(indent=indent, ensure_ascii=ensure_ascii, separators=separators)
+        self.batch_size = batch_size
+        self.batch = []
+        self.count = 0
+        self.written = 0
+        self.closed = False
+
+    def write(self, item):
+        self.batch.append(item)
+        self.count += 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        text = self.encoder.encode(self.batch)
+        # Drop the batch's own brackets; the elements inside are already indented one level
+        if self.indent is None:
+            self.f.write(("[" if self.written == 0 else self.encoder.item_separator) + text[1:-1])
+        else:
+            text = text[2:-2]
+            if self.pad:
+                text = self.pad + text.replace("\n", "\n" + self.pad)
+            self.f.write(("[\n" if self.written == 0 else self.encoder.item_separator + "\n") + text)
+        self.written += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        """Finish the array; an array with no elements is written as []."""
+        if self.closed:
+            return
+        self.flush()
+        if self.written == 0:
+            self.f.write("[]")
+        else:
+            self.f.write("]" if self.indent is None else "\n" + self.pad + "]")
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def indent_padding(indent, level):
+    if indent is None or level == 0:
+        return ""
+    return (indent if isinstance(indent, str) else " " * indent) * level
+
+
+class JsonObjectWriter:
+    """
+    Write the members of a JSON object to an open text file as they arrive.
+
+    Members are written in call order. `object()` and `array()` start a
+    nested member and return its writer; close that writer before writing
+    the next member of this one.
+
+    Args:
+        f: Text file to write to
+        indent: Indent as for json.dump; None writes the compact form
+        ensure_ascii: As for json.dump
+        level: Nesting depth of the object in the document
+        separators: As for json.dump
+    """
+
+    def __init__(self, f, indent=2, ensure_ascii=False, level=0, separators=None):
+        self.f = f
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.level = level
+        self.separators = separators
+        self.pad = indent_padding(indent, level)
+        self.inner_pad = indent_padding(indent, level + 1)
+        self.encoder = json.JSONEncoder(indent=indent, ensure_ascii=ensure_ascii, separators=separators)
+        self.count = 0
+        self.closed = False
+
+    def key(self, name):
+        """
+        Start a member whose value the caller writes to `f` itself, indented
+        for one level deeper than this object.
+        """
+        item_separator, key_separator = self.encoder.item_separator, self.encoder.key_separator
+        if self.indent is None:
+            prefix = "{" if self.count == 0 else item_separator
+        else:
+            prefix = ("{\n" if self.count == 0 else item_separator + "\n") + self.inner_pad
+        self.f.write(prefix + self.encoder.encode(name) + key_separator)
+        self.count += 1
+
+    def member(self, name, value):
+        """Write one member whose value is encoded in full."""
+        self.key(name)
+        text = self.encoder.encode(value)
+        if self.inner_pad:
+            text = text.replace("\n", "\n" + self.inner_pad)
+        self.f.write(text)
+
+    def object(self, name):
+        """Start a member holding an object and return its writer."""
+        self.key(name)
+        return JsonObjectWriter(self.f, self.indent, self.ensure_ascii, self.level + 1, self.separators)
+
+    def array(self, name, batch_size=1000):
+        """Start a member holding an array and return its writer."""
+        self.key(name)
+        return JsonArrayWriter(self.f, self.indent, self.ensure_ascii, batch_size, self.level + 1, self.separators)
+
+    def close(self):
+        """Finish the object; an object with no members is written as {}."""
+        if self.closed:
+            return
+        if self.count == 0:
+            self.f.write("{}")
+        else:
+            self.f.write("}" if self.indent is None else "\n" + self.pad + "}")
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ByteOffsetWriter:
+    """
+    Text file over a binary file that counts the UTF-8 bytes written.
+
+    `offset` is the byte position the next write starts at, so the offsets
+    before and after a value give its location in the file. With
+    `gzip_level`, text is held until boundary() and then written as one
+    gzip member; `offset` then counts compressed bytes and only moves at
+    boundaries, and every value between two boundaries can be decompressed
+    on its own. Without it, boundary() does nothing.
+
+    Args:
+        raw: Binary file to write to
+        gzip_level: Compression level of the gzip members, or None
+    """
+
+    def __init__(self, raw, gzip_level=None):
+        self.raw = raw
+        self.gzip_level = gzip_level
+        self.pending = []
+        self.offset = 0
+
+    def write(self, text):
+        if self.gzip_level is not None:
+            self.pending.append(text)
+            return
+        data = text.encode("utf-8")
+        self.raw.write(data)
+        self.offset += len(data)
+
+    def boundary(self):
+        """End the current gzip member."""
+        if not self.pending:
+            return
+        data = gzip.compress("".join(self.pending).encode("utf-8"), self.gzip_level)
+        self.pending = []
+        self.raw.write(data)
+        self.offset += len(data)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for kworb.net used to test and benchmark the downloaders offline.
+
+Serves synthetic pages in kworb's markup, generated deterministically from the
+ID in the path:
+
+  /spotify/artist/{id}_songs.html   artist catalog page (extract_artist_songs.py)
+  /spotify/artist/{id}.html         artist page with ../track/ links (extract_track_urls.py)
+  /spotify/track/{id}.html          track page with the daily chart history
+
+Latency, server errors and 429 responses can be injected. Responses carry an
+ETag and honour If-None-Match, so refresh runs can be exercised too.
+
+Usage:
+  python3 kworb_fixture.py --port 8000 --latency 0.05 --error-rate 0.01 --rate-limit 0.02
+"""
+import argparse
+import hashlib
+import html
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ID_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+WORDS = [
+    "Love", "Night", "Blue", "Fire", "Dance", "Heart", "City", "Dream", "Gold", "Rain", "Wild", "Summer", "R&B", "Über"
+]
+
+ARTIST_SONGS_PATH = re.compile(r"^/spotify/artist/([A-Za-z0-9]+)_songs\.html$")
+ARTIST_PATH = re.compile(r"^/spotify/artist/([A-Za-z0-9]+)\.html$")
+TRACK_PATH = re.compile(r"^/spotify/track/([A-Za-z0-9]+)\.html$")
+
+
+def fake_id(rng):
+    return "".join(rng.choice(ID_ALPHABET) for _ in range(22))
+
+
+def fake_title(rng):
+    return html.escape(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))), quote=False)
+
+
+def page_rng(kind, page_id):
+    # Seeded from the path so every request for a page returns the same body
+    return random.Random(f"{kind}:{page_id}")
+
+
+def artist_songs_page(artist_id, songs=None):
+    """Artist catalog page in the layout extract_artist_data parses."""
+    rng = page_rng("artist_songs", artist_id)
+    artist = f"Artist {artist_id[:6]}"
+    songs = songs if songs is not None else rng.randint(20, 300)
+    rows = []
+    total = rng.randint(10**8, 5 * 10**9)
+    for _ in range(songs):
+        track_id = fake_id(rng)
+        title = fake_title(rng)
+        daily = rng.randint(0, total // 1000 + 1)
+        rows.append(
+            f'<tr><td class="text"><div><a href="https://open.spotify.com/track/{track_id}" target="_blank">'
+            f"{title}</a></div></td><td>{total:,}</td><td>{daily:,}</td></tr>"
+        )
+        total = max(1000, int(total * rng.uniform(0.6, 0.98)))
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{artist} - Spotify Top Songs</title>\n"
+        '<link rel="stylesheet" href="../../kworb.css">\n</head>\n<body>\n'
+        '<div class="container">\n<div class="subcontainer">\n'
+        f'<a href="{artist_id}.html">Overview</a> | '
+        f'<a href="/spotify/artist/{artist_id}_songs.html">Songs</a>\n'
+        f"<span class=\"pagetitle\">{artist} - Spotify Top Songs</span>\n"
+        '<table class="addpos sortable">\n<thead><tr><th class="text mp">Song Title</th>'
+        "<th>Streams</th><th>Daily</th></tr></thead>\n<tbody>\n" + "\n".join(rows) + "\n</tbody>\n</table>\n"
+        "</div>\n</div>\n</body>\n</html>\n"
+    )
+
+
+def artist_page(artist_id, songs=None):
+    """Artist page with relative track links, as read by extract_track_urls.py."""
+    rng = page_rng("artist", artist_id)
+    artist = f"Artist {artist_id[:6]}"
+    songs = songs if songs is not None else rng.randint(20, 300)
+    rows = []
+    for _ in range(songs):
+        track_id = fake_id(rng)
+        rows.append(
+            f'<tr><td class="text"><div><a href="../track/{track_id}.html">{fake_title(rng)}</a></div></td>'
+            f"<td>{rng.randint(1000, 10**9):,}</td><td>{rng.randint(0, 10**6):,}</td></tr>"
+        )
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{artist} - Spotify Chart History</title>\n</head>\n<body>\n"
+        '<div class="container">\n<table class="sortable">\n<thead><tr><th class="text">Song Title</th>'
+        "<th>Streams</th><th>Daily</th></tr></thead>\n<tbody>\n" + "\n".join(rows) + "\n</tbody>\n</table>\n"
+        "</div>\n</body>\n</html>\n"
+    )
+
+
+def track_page(track_id, days=None):
+    """
+    Track page with the daily chart history.
+
+    The history table has a Date column followed by one column per chart;
+    each chart cell holds the position and, in parentheses, the day's streams.
+    Days the track was off a chart have an empty cell.
+    """
+    rng = page_rng("track", track_id)
+    days = days if days is not None else rng.randint(30, 1500)
+    artist = f"Artist {fake_id(rng)[:6]}"
+    title = fake_title(rng)
+    day = date(2017, 1, 1) + timedelta(days=rng.randint(0, 2500))
+    streams = rng.randint(10**5, 5 * 10**6)
+    rows = []
+    for _ in range(days):
+        position = rng.randint(1, 200)
+        us = f"{rng.randint(1, 200)} ({streams // 5:,})" if rng.random() < 0.7 else ""
+        rows.append(
+            f'<tr><td class="text">{day:%Y/%m/%d}</td><td>{position} ({streams:,})</td><td>{us}</td></tr>'
+        )
+        day += timedelta(days=1)
+        streams = max(1000, int(streams * rng.uniform(0.9, 1.08)))
+    rows.reverse()  # newest first, like kworb
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{artist} - {title} - Spotify Chart History</title>\n</head>\n<body>\n"
+        '<div class="container">\n'
+        f'<span class="pagetitle"><a href="../artist/{fake_id(rng)}.html">{artist}</a> - {title}</span>\n'
+        '<table class="sortable">\n<thead><tr><th class="text">Date</th><th>Global</th><th>US</th></tr></thead>\n'
+        "<tbody>\n" + "\n".join(rows) + "\n</tbody>\n</table>\n</div>\n</body>\n</html>\n"
+    )
+
+
+def render(path):
+    """Body for a request path, or None for unknown paths."""
+    match = ARTIST_SONGS_PATH.match(path)
+    if match:
+        return artist_songs_page(match.group(1))
+    match = ARTIST_PATH.match(path)
+    if match:
+        return artist_page(match.group(1))
+    match = TRACK_PATH.match(path)
+    if match:
+        return track_page(match.group(1))
+    return None
+
+
+class FixtureConfig:
+    """
+    Fault injection settings shared by all request handlers.
+
+    Args:
+        latency: Mean delay in seconds added before each response
+        jitter: Fraction of `latency` the delay varies by
+        error_rate: Probability of a 500 response
+        rate_limit: Probability of a 429 response
+        max_rps: Requests per second above which every request gets a 429,
+            or None for no limit
+        retry_after: Retry-After seconds sent with 429 responses
+    """
+
+    def __init__(self, latency=0.0, jitter=0.5, error_rate=0.0, rate_limit=0.0, max_rps=None, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.requests = 0
+        self.statuses = {}
+
+    def over_limit(self):
+        """Count a request against the one-second window and report if it exceeds max_rps."""
+        with self.lock:
+            self.requests += 1
+            if self.max_rps is None:
+                return False
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count > self.max_rps
+
+    def count_status(self, status):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+class KworbHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = FixtureConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.config.count_status(status)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        config = self.config
+        if config.latency:
+            time.sleep(max(0.0, config.latency * random.uniform(1 - config.jitter, 1 + config.jitter)))
+
+        if config.over_limit() or random.random() < config.rate_limit:
+            self._send(429, headers={"Retry-After": str(config.retry_after)})
+            return
+        if random.random() < config.error_rate:
+            self._send(500)
+            return
+
+        page = render(self.path)
+        if page is None:
+            self._send(404)
+            return
+
+        body = page.encode("utf-8")
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers={"ETag": etag})
+            return
+        self._send(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+
+def make_server(host="127.0.0.1", port=0, config=None):
+    """Create the fixture server; port 0 picks a free port (see server.server_port)."""
+    handler = type("ConfiguredKworbHandler", (KworbHandler,), {"config": config or FixtureConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic kworb pages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 response")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--max-rps", type=float, help="Return 429 above this many requests per second")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    config = FixtureConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        max_rps=args.max_rps,
+        retry_after=args.retry_after,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Serving synthetic kworb pages on http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {config.requests} requests: {config.statuses}")
+
+
+if __name__ == "__main__":
+    main()
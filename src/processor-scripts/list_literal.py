@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Parser for the list fields of charts.csv ("['Drake', 'Rihanna']").
+
+The artists and artist_genres columns hold Python list literals, and the same
+few thousand lists repeat across millions of rows. parse_list_literal()
+returns what ast.literal_eval would, with lists as tuples:
+
+  - lists of plain quoted strings (no backslashes, prefixes or comments,
+    only spaces between items) are split with one regular expression
+  - anything else goes to ast.literal_eval, so escapes, numbers and
+    malformed text give exactly its result or its exception
+
+Results are memoized on the raw text in a bounded LRU cache. Callers share
+the cached tuples, which is why they are immutable. Item strings are
+interned, so an artist named in many different lists is stored once.
+
+Nothing is ever passed to eval().
+
+Check it against ast.literal_eval with bench_list_literal.py.
+"""
+import ast
+import re
+import sys
+from functools import lru_cache
+
+# Distinct lists kept; charts.csv has roughly this many artist and genre lists
+CACHE_SIZE = 1 << 16
+
+_ITEM = r"""'([^'\\\r\n\x00]*)'|"([^"\\\r\n\x00]*)\""""
+_ITEM_PATTERN = re.compile(_ITEM)
+_ANY_ITEM = _ITEM.replace("(", "(?:")
+_PLAIN_LIST = re.compile(rf"\[ *(?:(?:{_ANY_ITEM}) *, *)*(?:(?:{_ANY_ITEM}) *)?\]")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_list_literal(text):
+    """
+    Parse the text of a Python literal, normally a list of strings.
+
+    Args:
+        text: Field text, e.g. "['pop', 'dance pop']"
+
+    Returns:
+        A tuple for a list literal, otherwise whatever ast.literal_eval gives
+
+    Raises:
+        ValueError, SyntaxError: As ast.literal_eval, for text that is not a literal
+    """
+    if _PLAIN_LIST.fullmatch(text):
+        return tuple(sys.intern(single + double) for single, double in _ITEM_PATTERN.findall(text))
+    # Parse under eval()'s file name so error messages read as they did with eval
+    value = ast.literal_eval(ast.parse(text.lstrip(" \t"), "<string>", "eval"))
+    return tuple(value) if isinstance(value, list) else value
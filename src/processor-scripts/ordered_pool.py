@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Chunked work for process pools with results in submission order.
+
+Used by the page extractors so their output does not depend on which worker
+finishes first, while only a bounded number of chunks is queued at a time.
+"""
+from collections import deque
+
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def map_chunks_in_order(executor, fn, chunks, max_pending):
+    """
+    Run `fn` over chunks on `executor` and yield the results in submission order.
+
+    `fn` returns a list per chunk and its items are yielded one by one. At
+    most `max_pending` chunks are queued at once, so memory stays bounded
+    however many items there are, and the output order never depends on which
+    worker finishes first.
+    """
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(fn, chunk))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
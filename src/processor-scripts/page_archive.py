@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Compressed, content-addressed archive of raw HTML pages.
+
+Pages are compressed (zstd when `zstandard` is installed, gzip otherwise) and
+appended to numbered segment files. A SQLite index maps each key (the page
+URL) to the sha256 of its content and the time it was fetched, and each
+content hash to its segment, offset and length. Identical pages are stored
+once.
+
+Usage:
+  python3 page_archive.py import ../../git_ignore/downloaded_html_weekly ../../git_ignore/page_archive \
+      --urls ../../git_ignore/all_artists_songs_weekly_y_downloaded.txt
+  python3 page_archive.py stats ../../git_ignore/page_archive
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_FILE = "index.sqlite3"
+SEGMENT_TEMPLATE = "segment-{:05d}.pack"
+DEFAULT_SEGMENT_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    codec TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS blobs_position ON blobs (segment, offset);
+"""
+
+
+def compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive contains zstd blobs; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageArchive:
+    """
+    Raw page store backed by segment files and a SQLite index.
+
+    Args:
+        archive_dir: Directory holding the segments and the index
+        codec: "zstd" or "gzip"; defaults to zstd when available
+        segment_bytes: Size at which a new segment file is started
+        batch_size: Number of writes between index commits
+    """
+
+    def __init__(self, archive_dir, codec=None, segment_bytes=DEFAULT_SEGMENT_BYTES, batch_size=500):
+        if codec is None:
+            codec = "zstd" if zstandard is not None else "gzip"
+        if codec == "zstd" and zstandard is None:
+            raise RuntimeError("zstd codec requested but zstandard is not installed")
+
+        self.archive_dir = archive_dir
+        self.codec = codec
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.uncommitted = 0
+
+        os.makedirs(archive_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(archive_dir, INDEX_FILE))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        (last_segment,) = self.conn.execute("SELECT COALESCE(MAX(segment), 0) FROM blobs").fetchone()
+        self.segment = last_segment
+        self.writer = None
+        self.readers = {}
+
+    def _segment_path(self, segment):
+        return os.path.join(self.archive_dir, SEGMENT_TEMPLATE.format(segment))
+
+    def _writer_for(self, needed):
+        if self.writer is None:
+            # Bytes after the last indexed blob (from a crash) are simply never referenced
+            self.writer = open(self._segment_path(self.segment), "ab")
+        if self.writer.tell() > 0 and self.writer.tell() + needed > self.segment_bytes:
+            self.writer.close()
+            self.segment += 1
+            self.writer = open(self._segment_path(self.segment), "ab")
+        return self.writer
+
+    def put(self, key, content, fetched_at=None):
+        """
+        Store a page under `key` and return its content hash.
+
+        `content` may be str (stored as UTF-8) or bytes.
+        """
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        exists = self.conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (content_hash,)).fetchone()
+        if not exists:
+            blob = compress(data, self.codec)
+            writer = self._writer_for(len(blob))
+            offset = writer.tell()
+            writer.write(blob)
+            writer.flush()
+            self.conn.execute(
+                "INSERT INTO blobs (hash, segment, offset, length, size, codec) VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, self.segment, offset, len(blob), len(data), self.codec),
+            )
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (key, hash, fetched_at) VALUES (?, ?, ?)",
+            (key, content_hash, fetched_at if fetched_at is not None else time.time()),
+        )
+        self.uncommitted += 1
+        if self.uncommitted >= self.batch_size:
+            self.commit()
+        return content_hash
+
+    def commit(self):
+        if self.writer is not None:
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+        self.conn.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        if self.writer is not None:
+            self.writer.close()
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM pages WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+        return count
+
+    def keys(self):
+        """Yield every stored key."""
+        for (key,) in self.conn.execute("SELECT key FROM pages ORDER BY key"):
+            yield key
+
+    def page_index(self):
+        """Yield (key, content_hash, size, fetched_at) for every stored page without reading any content."""
+        yield from self.conn.execute(
+            "SELECT p.key, p.hash, b.size, p.fetched_at FROM pages p JOIN blobs b ON b.hash = p.hash ORDER BY p.key"
+        )
+
+    def info(self, key):
+        """Return (content_hash, fetched_at) for a key, or None if it is not stored."""
+        return self.conn.execute("SELECT hash, fetched_at FROM pages WHERE key = ?", (key,)).fetchone()
+
+    def content_hash(self, key):
+        info = self.info(key)
+        return info[0] if info else None
+
+    def _read_blob(self, segment, offset, length, codec):
+        if segment == self.segment and self.writer is not None:
+            self.writer.flush()
+        reader = self.readers.get(segment)
+        if reader is None:
+            reader = self.readers[segment] = open(self._segment_path(segment), "rb")
+        reader.seek(offset)
+        return decompress(reader.read(length), codec)
+
+    def get_bytes(self, key):
+        """Raw bytes of the page stored under `key`, or None."""
+        row = self.conn.execute(
+            "SELECT b.segment, b.offset, b.length, b.codec FROM pages p JOIN blobs b ON b.hash = p.hash "
+            "WHERE p.key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return self._read_blob(*row)
+
+    def get(self, key):
+        """Decoded HTML of the page stored under `key`, or None."""
+        data = self.get_bytes(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def iter_page_bytes(self, keys=None):
+        """
+        Yield (key, raw bytes) for every stored page, or only for `keys`.
+
+        Pages are read in segment order so a full pass reads each segment file
+        front to back.
+        """
+        rows = self.conn.execute(
+            "SELECT p.key, b.segment, b.offset, b.length, b.codec FROM pages p JOIN blobs b ON b.hash = p.hash "
+            "ORDER BY b.segment, b.offset, p.key"
+        ).fetchall()
+        wanted = set(keys) if keys is not None else None
+        for key, segment, offset, length, codec in rows:
+            if wanted is not None and key not in wanted:
+                continue
+            yield key, self._read_blob(segment, offset, length, codec)
+
+    def iter_pages(self, keys=None):
+        """Yield (key, html) for every stored page, or only for `keys` (see iter_page_bytes)."""
+        for key, data in self.iter_page_bytes(keys):
+            yield key, data.decode("utf-8")
+
+    def stats(self):
+        (pages,) = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+        blobs, stored, raw = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()
+        return {"pages": pages, "blobs": blobs, "storedBytes": stored, "rawBytes": raw}
+
+    def import_directory(self, html_dir, urls):
+        """
+        Copy loose downloaded files into the archive.
+
+        Args:
+            html_dir: Directory of files named by the downloaders' URL mangling
+            urls: URLs to look for; each is stored under its URL as the key
+
+        Returns:
+            Number of pages imported
+        """
+        # Imported here to keep the archive usable without the download stack
+        from download_queue import url_to_filename
+
+        imported = 0
+        for url in urls:
+            filepath = os.path.join(html_dir, url_to_filename(url))
+            if not os.path.exists(filepath):
+                continue
+            with open(filepath, "rb") as f:
+                self.put(url, f.read(), fetched_at=os.path.getmtime(filepath))
+            imported += 1
+            if imported % 10000 == 0:
+                print(f"  Imported {imported:,} pages...")
+        self.commit()
+        return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the raw HTML page archive")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import loose HTML files")
+    import_parser.add_argument("html_dir")
+    import_parser.add_argument("archive_dir")
+    import_parser.add_argument("--urls", required=True, help="File listing the URLs of the pages to import")
+
+    stats_parser = subparsers.add_parser("stats", help="Show archive size")
+    stats_parser.add_argument("archive_dir")
+
+    args = parser.parse_args()
+
+    with PageArchive(args.archive_dir) as archive:
+        if args.command == "import":
+            from download_queue import read_url_file
+
+            imported = archive.import_directory(args.html_dir, read_url_file(args.urls))
+            print(f"Imported {imported:,} pages into {args.archive_dir}")
+
+        stats = archive.stats()
+        print(f"Pages: {stats['pages']:,} ({stats['blobs']:,} unique)")
+        print(f"Raw size: {stats['rawBytes']:,} bytes")
+        print(f"Stored size: {stats['storedBytes']:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
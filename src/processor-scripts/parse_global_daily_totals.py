@@ -10,63 +10,141 @@ with entries having the following fields:
   - peakStreams
   - total
 
+The page is read in chunks and records are written as they are parsed, so
+memory use does not grow with the page.
+
 Usage:
   pip install beautifulsoup4 lxml
   python3 parse_global_daily_totals.py
+  python3 parse_global_daily_totals.py --archive ../../git_ignore/page_archive \
+      --key https://kworb.net/spotify/toplists/global_daily_totals.html
 """
-import json
+import argparse
+import io
 import re
 
+from json_stream import JsonArrayWriter
+from page_archive import PageArchive
+
 INPUT_HTML = "../../git_ignore/kworb_pages/global_daily_totals.html"
 OUTPUT_JSON = "../../git_ignore/global_daily_totals.json"
 
 
+ROW_PATTERN = re.compile(r"<tr[^>]*>(.*?)</tr>", re.S)
+ARTIST_LINK_PATTERN = re.compile(r'<a[^>]*href="[^"]*/artist/([^"]+)\.html"[^>]*>([^<]+)</a>')
+SONG_LINK_PATTERN = re.compile(r'<a[^>]*href="[^"]*/track/([^"]+)\.html"[^>]*>([^<]+)</a>')
+CELL_PATTERN = re.compile(r"<td[^>]*>(.*?)</td>", re.S)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_rows(f, chunk_size=CHUNK_SIZE):
+    """
+    Yield the inner HTML of every <tr>...</tr> in a text file, reading it in chunks.
+
+    Only the unfinished tail of the last chunk is carried over, so memory
+    stays bounded by the chunk size and the longest row.
+    """
+    buffer = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+
+        pos = 0
+        while True:
+            match = ROW_PATTERN.search(buffer, pos)
+            if not match:
+                break
+            yield match.group(1)
+            pos = match.end()
+
+        # Keep from the next row start that has not been closed yet
+        start = buffer.find("<tr", pos)
+        if start == -1:
+            start = max(pos, len(buffer) - 2)
+        buffer = buffer[start:]
+
+    yield from ROW_PATTERN.findall(buffer)
+
+
+def parse_row(tr):
+    """Build the record for one row, or None if it is not a song row."""
+    # extract artist id and name
+    artist_match = ARTIST_LINK_PATTERN.search(tr)
+    # extract song id and title
+    song_match = SONG_LINK_PATTERN.search(tr)
+    # extract all td values (including those with attributes)
+    tds = CELL_PATTERN.findall(tr)
+    if not artist_match or not song_match or len(tds) < 4:
+        return None
+
+    artist_id, artist_name = artist_match.groups()
+    song_id, song_title = song_match.groups()
+
+    try:
+        days = int(tds[1].strip())
+        peak_streams = int(tds[2].strip().replace(",", ""))
+        total = int(tds[-1].strip().replace(",", ""))
+    except ValueError:
+        return None
+
+    return {
+        "artist": artist_name,
+        "artistId": artist_id,
+        "songTitle": song_title,
+        "songId": song_id,
+        "days": days,
+        "peakStreams": peak_streams,
+        "total": total,
+    }
+
+
+def iter_records(f, chunk_size=CHUNK_SIZE):
+    """Yield the song records of a global daily totals page read from a text file."""
+    for tr in iter_rows(f, chunk_size):
+        entry = parse_row(tr)
+        if entry is not None:
+            yield entry
+
+
 def parse_html_to_json(input_path):
     with open(input_path, "r", encoding="utf-8") as f:
-        html = f.read()
-
-    results = []
-    # find all <tr>...</tr> entries
-    entries = re.findall(r"<tr[^>]*>(.*?)</tr>", html, re.S)
-    for tr in entries:
-        # extract artist id and name
-        artist_match = re.search(r'<a[^>]*href="[^"]*/artist/([^"]+)\.html"[^>]*>([^<]+)</a>', tr)
-        # extract song id and title
-        song_match = re.search(r'<a[^>]*href="[^"]*/track/([^"]+)\.html"[^>]*>([^<]+)</a>', tr)
-        # extract all td values (including those with attributes)
-        tds = re.findall(r"<td[^>]*>(.*?)</td>", tr, re.S)
-        if not artist_match or not song_match or len(tds) < 4:
-            continue
-
-        artist_id, artist = artist_match.groups()
-        song_id, song_title = song_match.groups()
-
-        try:
-            days = int(tds[1].strip())
-            peak_streams = int(tds[2].strip().replace(",", ""))
-            total = int(tds[-1].strip().replace(",", ""))
-        except ValueError:
-            continue
-
-        entry = {
-            "artist": artist,
-            "artistId": artist_id,
-            "songTitle": song_title,
-            "songId": song_id,
-            "days": days,
-            "peakStreams": peak_streams,
-            "total": total,
-        }
-        results.append(entry)
-    return results
+        return list(iter_records(f))
+
+
+def parse_html(html):
+    return list(iter_records(io.StringIO(html)))
+
+
+def write_records(records, output_path):
+    """Stream records into a JSON array file and return how many were written."""
+    with open(output_path, "w", encoding="utf-8") as out, JsonArrayWriter(out) as writer:
+        for entry in records:
+            writer.write(entry)
+    return writer.count
 
 
 def main():
-    data = parse_html_to_json(INPUT_HTML)
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as out:
-        json.dump(data, out, indent=2, ensure_ascii=False)
-    print(f"Wrote {len(data)} records to {OUTPUT_JSON}")
+    parser = argparse.ArgumentParser(description="Parse kworb global daily totals")
+    parser.add_argument("--archive", metavar="DIR", help="Read the page from a page archive")
+    parser.add_argument("--key", help="URL of the page in the archive")
+    args = parser.parse_args()
+    if args.archive and not args.key:
+        parser.error("--archive requires --key")
 
+    if args.archive:
+        with PageArchive(args.archive) as archive:
+            html = archive.get(args.key)
+        if html is None:
+            print(f"{args.key} is not in {args.archive}")
+            return
+        count = write_records(iter_records(io.StringIO(html)), OUTPUT_JSON)
+    else:
+        with open(INPUT_HTML, "r", encoding="utf-8") as f:
+            count = write_records(iter_records(f), OUTPUT_JSON)
+    print(f"Wrote {count} records to {OUTPUT_JSON}")
 
 if __name__ == "__main__":
     main()
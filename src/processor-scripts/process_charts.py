@@ -2,136 +2,327 @@
 """
 Script to process charts.csv and create separate JSON files for each country.
 Each JSON file will contain all chart entries for that specific country.
+
+charts.csv is read in column chunks (chart_ingest.py, --engine), parsed by
+--workers processes over byte ranges of the file, and rows are
+streamed into per-country shards (sharded_writer.py) instead of
+being held until the end: once the buffered rows pass --max-memory-mb the
+largest countries are spilled to temporary files, which are joined into the
+country files at the end. Output is the same as building every list in memory.
+
+With --entities the rows are also written to --entities-dir in an
+entity-encoded form (entity_tables.py): entities.json holds the artist, genre
+and track tables, and each <country>.json lists entries as
+[date, position, streams, track].
+
+Usage:
+  python3 process_charts.py
+  python3 process_charts.py --max-memory-mb 256 --max-open-files 32
+  python3 process_charts.py --engine python
+  python3 process_charts.py --workers 8
+  python3 process_charts.py --format both --dataset-dir ../../output/charts_dataset
+  python3 process_charts.py --entities
 """
 
-import ast
-import csv
+import argparse
+import contextlib
 import json
 import os
-from collections import defaultdict
+
+from chart_dataset import ChartDatasetWriter
+from chart_ingest import CHART_COLUMNS, DEFAULT_ENGINE, available_engines, read_chunks
+from entity_tables import ENCODED_SEPARATORS, EntityEncoder
+from json_stream import JsonObjectWriter
+from list_literal import parse_list_literal
+from sharded_writer import MAX_MEMORY, MAX_OPEN_FILES, ShardedArrayWriter
+
+CSV_FILE = "../data/charts.csv"
+OUTPUT_DIR = "../../output/countries"
+DATASET_DIR = "../../output/charts_dataset"
+ENTITIES_DIR = "../../output/countries_entities"
+
+# Rough in-memory size of a processed row beyond its text (dict, ints; lists are shared)
+ROW_OVERHEAD = 600
+# Same for an encoded row: [date, position, streams, track]
+ENCODED_ROW_SIZE = 150
 
 
 def parse_list_string(list_str):
     """
-    Parse string representation of list into actual list.
+    Parse string representation of list into a tuple.
     Handles cases like "['item1', 'item2']" and empty lists.
     """
     if not list_str or list_str == "[]":
-        return []
+        return ()
     try:
-        # Use ast.literal_eval for safe evaluation of list strings
-        return ast.literal_eval(list_str)
+        # Memoized literal parser (list_literal.py); same result as ast.literal_eval
+        return parse_list_literal(list_str)
     except (ValueError, SyntaxError):
         # Fallback: try to parse manually
         if list_str.startswith("[") and list_str.endswith("]"):
             # Remove brackets and split by comma
             inner = list_str[1:-1]
             if not inner:
-                return []
+                return ()
             # Split and clean items
             items = []
             for item in inner.split(","):
                 item = item.strip().strip("'\"")
                 if item:
                     items.append(item)
-            return items
-        return [list_str]  # Return as single item if parsing fails
+            return tuple(items)
+        return (list_str,)  # Return as single item if parsing fails
+
+
+def int_or_text(text):
+    return int(text) if text.isdigit() else text
 
 
-def process_csv_to_json():
+def flag_or_text(text):
+    return text.lower() == "true" if text.lower() in ["true", "false"] else text
+
+
+def process_csv_to_json(
+    csv_file_path=CSV_FILE,
+    output_dir=OUTPUT_DIR,
+    max_memory=MAX_MEMORY,
+    max_open_files=MAX_OPEN_FILES,
+    engine=DEFAULT_ENGINE,
+    output_format="json",
+    dataset_dir=DATASET_DIR,
+    entities_dir=None,
+    workers=1,
+):
     """
     Process the charts.csv file and create separate JSON files for each country.
-    """
-    csv_file_path = "../data/charts.csv"
-    output_dir = "../../output/countries"
 
+    Args:
+        csv_file_path: charts.csv with rows for every country
+        output_dir: Directory for the <country>.json files
+        max_memory: Approximate bytes of buffered rows before spilling to disk
+        max_open_files: Spill files kept open at once
+        engine: chart_ingest engine used to read the CSV
+        output_format: "json", "parquet" (a chart_dataset.py dataset in
+            `dataset_dir`) or "both"
+        dataset_dir: Directory of the Parquet dataset
+        entities_dir: Directory for entity-encoded country files, or None to
+            skip them. Their rows are buffered separately, with the same
+            `max_memory` limit
+        workers: Processes parsing the CSV; 1 reads it in this process
+    """
     # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    if output_format != "parquet":
+        os.makedirs(output_dir, exist_ok=True)
 
-    # Dictionary to store data by country
-    country_data = defaultdict(list)
+    with contextlib.ExitStack() as stack:
+        country_data = None
+        dataset = None
+        if output_format != "parquet":
+            country_data = stack.enter_context(ShardedArrayWriter(max_memory, max_open_files, level=1))
+        if output_format != "json":
+            dataset = stack.enter_context(ChartDatasetWriter(dataset_dir))
+        encoded = None
+        if entities_dir is not None:
+            os.makedirs(entities_dir, exist_ok=True)
+            encoded_data = stack.enter_context(
+                ShardedArrayWriter(max_memory, max_open_files, indent=None, separators=ENCODED_SEPARATORS)
+            )
+            encoded = (encoded_data, EntityEncoder())
 
-    print("Processing CSV file...")
+        counts = write_country_files(csv_file_path, output_dir, country_data, engine, dataset, encoded, workers)
+        if counts is None:
+            if dataset is not None:
+                dataset.abort()
+            return
+        if encoded is not None:
+            write_encoded_files(entities_dir, *encoded)
+        print_summary(counts)
 
-    # Read and process the CSV file
-    try:
-        with open(csv_file_path, "r", encoding="utf-8") as file:
-            csv_reader = csv.DictReader(file)
+    if dataset is not None:
+        print(f"\nParquet dataset written to '{dataset_dir}'")
 
-            row_count = 0
-            for row in csv_reader:
-                row_count += 1
 
-                # Show progress every 100k rows
-                if row_count % 100000 == 0:
-                    print(f"Processed {row_count:,} rows...")
+def write_country_files(
+    csv_file_path, output_dir, country_data, engine=DEFAULT_ENGINE, dataset=None, encoded=None, workers=1
+):
+    """
+    Stream the CSV into `country_data` and write one JSON file per country;
+    rows also go to the ChartDatasetWriter `dataset` when one is given, and
+    are encoded into the (ShardedArrayWriter, EntityEncoder) pair `encoded`.
 
-                country = row["country"]
+    Returns:
+        Entries per country, or None if the CSV could not be read
+    """
+    print("Processing CSV file...")
 
-                # Parse the row data and handle list fields
+    # Read and process the CSV file
+    row_count = 0
+    list_cache = {}
+    try:
+        for chunk in read_chunks(csv_file_path, CHART_COLUMNS, engine, workers=workers):
+            # Parse the row data and handle list fields, a column at a time
+            columns = zip(
+                chunk.text("date"),
+                chunk.text("country"),
+                chunk.ints("position", int_or_text),
+                chunk.ints("streams", int_or_text),
+                chunk.text("track_id"),
+                chunk.decoded("artists", parse_list_string, list_cache),
+                chunk.decoded("artist_genres", parse_list_string, list_cache),
+                chunk.ints("duration", int_or_text),
+                chunk.flags("explicit", flag_or_text),
+                chunk.text("name"),
+            )
+            for date, country, position, streams, track_id, artists, genres, duration, explicit, name in columns:
                 processed_row = {
-                    "date": row["date"],
-                    "position": int(row["position"]) if row["position"].isdigit() else row["position"],
-                    "streams": int(row["streams"]) if row["streams"].isdigit() else row["streams"],
-                    "track_id": row["track_id"],
-                    "artists": parse_list_string(row["artists"]),
-                    "artist_genres": parse_list_string(row["artist_genres"]),
-                    "duration": int(row["duration"]) if row["duration"].isdigit() else row["duration"],
-                    "explicit": (
-                        row["explicit"].lower() == "true"
-                        if row["explicit"].lower() in ["true", "false"]
-                        else row["explicit"]
-                    ),
-                    "name": row["name"],
+                    "date": date,
+                    "position": position,
+                    "streams": streams,
+                    "track_id": track_id,
+                    "artists": artists,
+                    "artist_genres": genres,
+                    "duration": duration,
+                    "explicit": explicit,
+                    "name": name,
                 }
 
                 # Add to country data
-                country_data[country].append(processed_row)
+                if country_data is not None:
+                    country_data.write(country, processed_row, ROW_OVERHEAD + len(name) + len(track_id) + len(date))
+                if dataset is not None and country != "country":
+                    dataset.add(country, date, position, streams, track_id, artists, genres, duration, explicit, name)
+                if encoded is not None:
+                    track = encoded[1].track(track_id, name, artists, genres, duration, explicit)
+                    encoded[0].write(country, [date, position, streams, track], ENCODED_ROW_SIZE)
+
+            # Show progress every 100k rows
+            for shown in range(row_count // 100000 + 1, (row_count + len(chunk)) // 100000 + 1):
+                print(f"Processed {shown * 100000:,} rows...")
+            row_count += len(chunk)
 
     except FileNotFoundError:
         print(f"Error: Could not find {csv_file_path}")
-        return
+        return None
     except Exception as e:
         print(f"Error processing CSV: {e}")
-        return
+        return None
 
+    if country_data is not None:
+        counts = country_data.counts
+    elif dataset is not None:
+        counts = dataset.counts
+    else:
+        counts = encoded[0].counts
     print(f"Finished processing {row_count:,} rows")
-    print(f"Found {len(country_data)} unique countries")
+    print(f"Found {len(counts)} unique countries")
+    if country_data is None:
+        return counts
+    if country_data.spills:
+        print(f"Spilled to disk {country_data.spills:,} times to stay under the memory limit")
 
     # Write JSON files for each country
     print("\nCreating JSON files for each country...")
 
-    for country, data in country_data.items():
+    for country, count in country_data.counts.items():
         if country == "country":  # Skip header row if it got through
             continue
 
         output_file = os.path.join(output_dir, f"{country}.json")
 
         try:
-            with open(output_file, "w", encoding="utf-8") as file:
-                json.dump(
-                    {"country": country, "total_entries": len(data), "chart_data": data},
-                    file,
-                    indent=2,
-                    ensure_ascii=False,
-                )
+            with open(output_file, "w", encoding="utf-8") as file, JsonObjectWriter(file) as document:
+                document.member("country", country)
+                document.member("total_entries", count)
+                document.key("chart_data")
+                country_data.write_array(country, file)
 
-            print(f"Created {output_file} with {len(data):,} entries")
+            print(f"Created {output_file} with {count:,} entries")
 
         except Exception as e:
             print(f"Error writing {output_file}: {e}")
 
     print(f"\nCompleted! JSON files created in '{output_dir}' directory")
+    return counts
+
+
+def write_encoded_files(entities_dir, encoded_data, entities):
+    """Write entities.json and one entity-encoded file per country."""
+    print(f"\nCreating entity-encoded files in '{entities_dir}'...")
 
-    # Print summary statistics
+    for country, count in encoded_data.counts.items():
+        if country == "country":  # Skip header row if it got through
+            continue
+
+        output_file = os.path.join(entities_dir, f"{country}.json")
+        with open(output_file, "w", encoding="utf-8") as file, JsonObjectWriter(file, indent=None) as document:
+            document.member("country", country)
+            document.member("total_entries", count)
+            document.member("entry_fields", ["date", "position", "streams", "track"])
+            document.key("chart_data")
+            encoded_data.write_array(country, file)
+
+    tables_file = os.path.join(entities_dir, "entities.json")
+    with open(tables_file, "w", encoding="utf-8") as file:
+        json.dump(entities.tables(), file, ensure_ascii=False, separators=ENCODED_SEPARATORS)
+    print(
+        f"Created {tables_file}: {len(entities.tracks):,} tracks, {len(entities.artists):,} artists, "
+        f"{len(entities.genres):,} genres"
+    )
+
+
+def print_summary(counts):
+    """Print summary statistics"""
     print("\nSummary:")
-    print(f"Total countries: {len(country_data)}")
-    top_countries = sorted(country_data.items(), key=lambda x: len(x[1]), reverse=True)[:10]
+    print(f"Total countries: {len(counts)}")
+    top_countries = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:10]
     print("\nTop 10 countries by number of chart entries:")
-    for country, data in top_countries:
+    for country, count in top_countries:
         if country != "country":
-            print(f"  {country}: {len(data):,} entries")
+            print(f"  {country}: {count:,} entries")
 
 
 if __name__ == "__main__":
-    process_csv_to_json()
+    parser = argparse.ArgumentParser(description="Split charts.csv into one JSON file per country")
+    parser.add_argument("--input", default=CSV_FILE, help=f"charts.csv to read (default: {CSV_FILE})")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help=f"Directory for country files (default: {OUTPUT_DIR})")
+    parser.add_argument(
+        "--max-memory-mb",
+        type=int,
+        default=MAX_MEMORY // (1024 * 1024),
+        help="Approximate memory for buffered rows before spilling to disk (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-open-files", type=int, default=MAX_OPEN_FILES, help="Spill files kept open at once (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--engine", choices=available_engines(), default=DEFAULT_ENGINE, help="CSV reader (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="CSV parser processes (default: CPU count; 1 = inline)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet", "both"],
+        default="json",
+        help="Country JSON files, a Parquet dataset partitioned by country and week (chart_dataset.py), or both",
+    )
+    parser.add_argument("--dataset-dir", default=DATASET_DIR, help=f"Parquet dataset directory (default: {DATASET_DIR})")
+    parser.add_argument(
+        "--entities", action="store_true", help="Also write entity-encoded country files (entity_tables.py)"
+    )
+    parser.add_argument(
+        "--entities-dir", default=ENTITIES_DIR, help=f"Directory for entity-encoded files (default: {ENTITIES_DIR})"
+    )
+    args = parser.parse_args()
+
+    process_csv_to_json(
+        args.input,
+        args.output_dir,
+        args.max_memory_mb * 1024 * 1024,
+        args.max_open_files,
+        args.engine,
+        args.format,
+        args.dataset_dir,
+        args.entities_dir if args.entities else None,
+        args.workers,
+    )
@@ -2,12 +2,22 @@
 """
 Script to reorganize global_charts.csv by artist.
 Creates a new CSV where tracks with multiple artists get separate rows for each artist.
+
+Rows are sorted with an external merge sort (external_sort.py), so only
+--run-size rows are held in memory however large the output grows.
+
+Usage:
+  python3 reorganize_by_artist.py
+  python3 reorganize_by_artist.py --run-size 500000 --tmp-dir /mnt/scratch
 """
 
+import argparse
 import csv
 import json
 import os
 
+from external_sort import RUN_SIZE, ExternalSorter
+
 
 def parse_artists_field(artists_str):
     """Parse the artists field which is a JSON-formatted string list."""
@@ -22,46 +32,62 @@ def parse_artists_field(artists_str):
         return [artist.strip() for artist in clean_str.split(",")]
 
 
-def reorganize_csv_by_artist(input_file, output_file):
-    """Reorganize CSV data by artist, creating separate rows for each artist."""
+def reorganize_csv_by_artist(input_file, output_file, run_size=RUN_SIZE, tmp_dir=None):
+    """
+    Reorganize CSV data by artist, creating separate rows for each artist.
 
-    with open(input_file, "r", encoding="utf-8") as infile:
+    Args:
+        input_file: global_charts.csv to read
+        output_file: CSV to write, sorted by artist
+        run_size: Rows held in memory before a sorted run is spilled
+        tmp_dir: Directory for the sort runs (default: the system temp dir)
+    """
+
+    with open(input_file, "r", encoding="utf-8") as infile, ExternalSorter(run_size, tmp_dir) as sorter:
         reader = csv.DictReader(infile)
 
         # Get the fieldnames from the original CSV
         fieldnames = reader.fieldnames
-
-        # Prepare output data
-        output_rows = []
+        artists_index = fieldnames.index("artists")
 
         for row in reader:
             # Parse the artists field
-            artists_str = row["artists"]
-            artists_list = parse_artists_field(artists_str)
+            values = [row[field] for field in fieldnames]
+            artists_list = parse_artists_field(values[artists_index])
 
-            # Create a separate row for each artist
+            # Create a separate row for each artist, keyed once on the name the
+            # single-artist field parses back to
             for artist in artists_list:
-                new_row = row.copy()
-                # Replace the artists field with just this single artist
-                new_row["artists"] = f'["{artist}"]'
-                output_rows.append(new_row)
+                single = f'["{artist}"]'
+                values[artists_index] = single
+                sorter.add(parse_artists_field(single)[0], tuple(values))
 
-    # Sort by artist name for better organization
-    output_rows.sort(key=lambda x: parse_artists_field(x["artists"])[0])
+        # Write to output file in artist order
+        with open(output_file, "w", encoding="utf-8", newline="") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(fieldnames)
+            writer.writerows(sorter.values())
 
-    # Write to output file
-    with open(output_file, "w", encoding="utf-8", newline="") as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(output_rows)
+        rows = len(sorter)
 
-    print(f"Successfully reorganized {len(output_rows)} rows by artist.")
+    print(f"Successfully reorganized {rows} rows by artist.")
     print(f"Output saved to: {output_file}")
 
 
 def main():
-    input_file = "../../git_ignore/global_charts.csv"
-    output_file = "../../git_ignore/global_charts_by_artist.csv"
+    parser = argparse.ArgumentParser(description="Expand global_charts.csv to one row per artist, sorted by artist")
+    parser.add_argument("--input", default="../../git_ignore/global_charts.csv", help="CSV to read (default: %(default)s)")
+    parser.add_argument(
+        "--output", default="../../git_ignore/global_charts_by_artist.csv", help="CSV to write (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--run-size", type=int, default=RUN_SIZE, help=f"Rows per sort run held in memory (default: {RUN_SIZE})"
+    )
+    parser.add_argument("--tmp-dir", help="Directory for sort runs (default: system temp dir)")
+    args = parser.parse_args()
+
+    input_file = args.input
+    output_file = args.output
 
     if not os.path.exists(input_file):
         print(f"Error: Input file {input_file} not found.")
@@ -70,7 +96,7 @@ def main():
     print(f"Reading from: {input_file}")
     print(f"Writing to: {output_file}")
 
-    reorganize_csv_by_artist(input_file, output_file)
+    reorganize_csv_by_artist(input_file, output_file, args.run_size, args.tmp_dir)
 
 
 if __name__ == "__main__":
@@ -1,83 +1,121 @@
 #!/usr/bin/env python3
 """
 Script to reorganize global charts by date with positions sorted from 1 to highest for each date
+
+Rows are sorted with an external merge sort (external_sort.py) on a key
+computed once per row, so only --run-size rows are held in memory.
+
+Usage:
+  python3 reorganize_charts.py
+  python3 reorganize_charts.py --run-size 500000 --tmp-dir /mnt/scratch
 """
+import argparse
 import csv
-from collections import defaultdict
 from datetime import datetime
 
+from external_sort import RUN_SIZE, ExternalSorter
+
+INPUT_FILE = "../../git_ignore/global_charts.csv"
+OUTPUT_FILE = "../../git_ignore/global_charts_by_date.csv"
+SUMMARY_FILE = "charts_organization_summary.txt"
+
+FIELDNAMES = [
+    "date",
+    "position",
+    "streams",
+    "track_id",
+    "artists",
+    "genres",
+    "duration_ms",
+    "explicit",
+    "track_name",
+]
+
+
+def parse_date(date_str):
+    """Sort dates chronologically (handle different date formats)"""
+    try:
+        return datetime.strptime(date_str, "%Y/%m/%d")
+    except ValueError:
+        try:
+            return datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            print(f"Warning: Unable to parse date {date_str}")
+            return datetime.min
+
+
+class DateStats:
+    """Entry count and position range of one chart date."""
+
+    __slots__ = ("order", "sort_value", "count", "low", "high")
+
+    def __init__(self, order, sort_value):
+        self.order = order
+        self.sort_value = sort_value
+        self.count = 0
+        self.low = None
+        self.high = None
+
+    def add(self, position):
+        self.count += 1
+        if self.low is None or position < self.low:
+            self.low = position
+        if self.high is None or position > self.high:
+            self.high = position
 
-def reorganize_charts_by_date():
-    input_file = "../../git_ignore/global_charts.csv"
-    output_file = "../../git_ignore/global_charts_by_date.csv"
 
+def reorganize_charts_by_date(input_file=INPUT_FILE, output_file=OUTPUT_FILE, run_size=RUN_SIZE, tmp_dir=None):
     print("Reading global charts data...")
 
-    # Dictionary to group entries by date
-    charts_by_date = defaultdict(list)
+    # Stats per date, in first-seen order; rows go to the sorter keyed on
+    # (chronological date, first-seen order of the date, position)
+    charts_by_date = {}
 
-    with open(input_file, "r", encoding="utf-8") as infile:
-        reader = csv.DictReader(infile)
+    with ExternalSorter(run_size, tmp_dir) as sorter:
+        with open(input_file, "r", encoding="utf-8") as infile:
+            reader = csv.DictReader(infile)
 
-        for row in reader:
-            date = row["date"]
-            charts_by_date[date].append(row)
+            for row in reader:
+                date = row["date"]
+                stats = charts_by_date.get(date)
+                if stats is None:
+                    stats = charts_by_date[date] = DateStats(len(charts_by_date), parse_date(date).toordinal())
+                position = int(row["position"])
+                stats.add(position)
+                sorter.add((stats.sort_value, stats.order, position), tuple(row.get(field, "") for field in FIELDNAMES))
 
-    print(f"Found {len(charts_by_date)} unique dates")
+        print(f"Found {len(charts_by_date)} unique dates")
 
-    # Sort dates chronologically (handle different date formats)
-    def parse_date(date_str):
-        try:
-            return datetime.strptime(date_str, "%Y/%m/%d")
-        except ValueError:
-            try:
-                return datetime.strptime(date_str, "%Y-%m-%d")
-            except ValueError:
-                print(f"Warning: Unable to parse date {date_str}")
-                return datetime.min
-
-    sorted_dates = sorted(charts_by_date.keys(), key=parse_date)
-
-    print(f"Date range: {sorted_dates[0]} to {sorted_dates[-1]}")
-
-    # Create the reorganized file
-    print(f"Creating reorganized file: {output_file}")
-
-    with open(output_file, "w", newline="", encoding="utf-8") as outfile:
-        fieldnames = [
-            "date",
-            "position",
-            "streams",
-            "track_id",
-            "artists",
-            "genres",
-            "duration_ms",
-            "explicit",
-            "track_name",
-        ]
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        total_entries = 0
-
-        for date in sorted_dates:
-            # Sort entries for this date by position (1 to highest)
-            date_entries = sorted(charts_by_date[date], key=lambda x: int(x["position"]))
-
-            print(
-                f"Processing {date}: {len(date_entries)} entries (positions {date_entries[0]['position']} to {date_entries[-1]['position']})"
-            )
-
-            # Write all entries for this date
-            for entry in date_entries:
+        sorted_dates = sorted(charts_by_date, key=lambda date: (charts_by_date[date].sort_value, charts_by_date[date].order))
+
+        print(f"Date range: {sorted_dates[0]} to {sorted_dates[-1]}")
+
+        # Create the reorganized file
+        print(f"Creating reorganized file: {output_file}")
+
+        with open(output_file, "w", newline="", encoding="utf-8") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(FIELDNAMES)
+
+            total_entries = 0
+            current = None
+
+            for entry in sorter.values():
+                date = entry[0]
+                if date != current:
+                    current = date
+                    stats = charts_by_date[date]
+                    print(f"Processing {date}: {stats.count} entries (positions {stats.low} to {stats.high})")
+
+                # Write all entries for this date
                 writer.writerow(entry)
                 total_entries += 1
 
-        print(f"Successfully reorganized {total_entries} entries")
-        print(f"Output saved to: {output_file}")
+            print(f"Successfully reorganized {total_entries} entries")
+            print(f"Output saved to: {output_file}")
 
     # Create a summary report
-    summary_file = "charts_organization_summary.txt"
+    summary_file = SUMMARY_FILE
     with open(summary_file, "w", encoding="utf-8") as summary:
         summary.write(f"Global Charts Organization Summary\n")
         summary.write(f"================================\n\n")
@@ -95,19 +133,26 @@ def reorganize_charts_by_date():
         # Sample of entries per date
         summary.write("Sample entries per date:\n")
         for i, date in enumerate(sorted_dates[:5]):  # First 5 dates
-            entries = charts_by_date[date]
-            positions = [int(e["position"]) for e in entries]
-            summary.write(f"{date}: {len(entries)} entries, positions {min(positions)}-{max(positions)}\n")
+            stats = charts_by_date[date]
+            summary.write(f"{date}: {stats.count} entries, positions {stats.low}-{stats.high}\n")
 
         if len(sorted_dates) > 5:
             summary.write("...\n")
             for date in sorted_dates[-2:]:  # Last 2 dates
-                entries = charts_by_date[date]
-                positions = [int(e["position"]) for e in entries]
-                summary.write(f"{date}: {len(entries)} entries, positions {min(positions)}-{max(positions)}\n")
+                stats = charts_by_date[date]
+                summary.write(f"{date}: {stats.count} entries, positions {stats.low}-{stats.high}\n")
 
     print(f"Summary report saved to: {summary_file}")
 
 
 if __name__ == "__main__":
-    reorganize_charts_by_date()
+    parser = argparse.ArgumentParser(description="Sort global_charts.csv by date, then position")
+    parser.add_argument("--input", default=INPUT_FILE, help=f"CSV to read (default: {INPUT_FILE})")
+    parser.add_argument("--output", default=OUTPUT_FILE, help=f"CSV to write (default: {OUTPUT_FILE})")
+    parser.add_argument(
+        "--run-size", type=int, default=RUN_SIZE, help=f"Rows per sort run held in memory (default: {RUN_SIZE})"
+    )
+    parser.add_argument("--tmp-dir", help="Directory for sort runs (default: system temp dir)")
+    args = parser.parse_args()
+
+    reorganize_charts_by_date(args.input, args.output, args.run_size, args.tmp_dir)
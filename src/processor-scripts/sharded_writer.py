@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory writer for many JSON arrays filled in interleaved order.
+
+Items are buffered per shard (a country, say). When the buffers together pass
+the memory ceiling, the largest ones are encoded and appended to that shard's
+spill file, through a small LRU pool of open file handles. At the end each
+shard's array is the concatenation of its spill file and what is still
+buffered, so items come out in the order they were written - the same text
+json.dump would give for the whole list.
+"""
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+from json_stream import indent_padding
+
+MAX_MEMORY = 512 * 1024 * 1024
+MAX_OPEN_FILES = 64
+
+
+class ShardedArrayWriter:
+    """
+    Collect items into one JSON array per shard with bounded memory.
+
+    Sizes passed to `write` are estimates of what an item costs in memory;
+    the writer spills once their sum exceeds `max_memory`.
+
+    Args:
+        max_memory: Buffered bytes allowed before spilling
+        max_open_files: Spill files kept open at once
+        indent: Indent as for json.dump
+        ensure_ascii: As for json.dump
+        separators: As for json.dump
+        level: Nesting depth of the arrays in the documents they end up in
+        tmp_dir: Parent directory for the spill files (default: the system temp dir)
+    """
+
+    def __init__(
+        self,
+        max_memory=MAX_MEMORY,
+        max_open_files=MAX_OPEN_FILES,
+        indent=2,
+        ensure_ascii=False,
+        level=0,
+        tmp_dir=None,
+        separators=None,
+    ):
+        self.max_memory = max_memory
+        self.max_open_files = max_open_files
+        self.indent = indent
+        self.pad = indent_padding(indent, level)
+        self.encoder = json.JSONEncoder(indent=indent, ensure_ascii=ensure_ascii, separators=separators)
+        # What goes between two elements, as the encoder writes it inside one array
+        self.item_separator = ",\n" if indent is not None else self.encoder.item_separator
+        self.spill_dir = tempfile.mkdtemp(prefix="shards-", dir=tmp_dir)
+        self.counts = {}
+        self.paths = {}
+        self.buffers = {}
+        self.buffered = {}
+        self.memory = 0
+        self.spilled = set()
+        self.handles = OrderedDict()
+        self.spills = 0
+
+    def write(self, shard, item, size):
+        buffer = self.buffers.get(shard)
+        if buffer is None:
+            buffer = self.buffers[shard] = []
+            self.buffered[shard] = 0
+            self.counts[shard] = 0
+            self.paths[shard] = os.path.join(self.spill_dir, f"{len(self.paths)}.json")
+        buffer.append(item)
+        self.counts[shard] += 1
+        self.buffered[shard] += size
+        self.memory += size
+        if self.memory > self.max_memory:
+            self._spill()
+
+    def _spill(self):
+        # Spill the biggest buffers until half the ceiling is free
+        for shard in sorted(self.buffered, key=self.buffered.get, reverse=True):
+            if self.memory <= self.max_memory // 2:
+                break
+            if self.buffers[shard]:
+                self._spill_shard(shard)
+
+    def _spill_shard(self, shard):
+        handle = self._handle(shard)
+        if shard in self.spilled:
+            handle.write(self.item_separator)
+        handle.write(self._encode(self.buffers[shard]))
+        self.spilled.add(shard)
+        self.memory -= self.buffered[shard]
+        self.buffers[shard] = []
+        self.buffered[shard] = 0
+        self.spills += 1
+
+    def _handle(self, shard):
+        handle = self.handles.pop(shard, None)
+        if handle is None:
+            if len(self.handles) >= self.max_open_files:
+                _, oldest = self.handles.popitem(last=False)
+                oldest.close()
+            handle = open(self.paths[shard], "a", encoding="utf-8")
+        self.handles[shard] = handle
+        return handle
+
+    def _encode(self, items):
+        """Array elements without the brackets, indented for their level."""
+        text = self.encoder.encode(items)
+        if self.indent is None:
+            return text[1:-1]
+        text = text[2:-2]
+        if self.pad:
+            text = self.pad + text.replace("\n", "\n" + self.pad)
+        return text
+
+    def write_array(self, shard, f):
+        """Write the whole array of `shard` to the text file `f` and release it."""
+        if not self.counts.get(shard):
+            f.write("[]")
+            return
+        f.write("[" if self.indent is None else "[\n")
+        if shard in self.spilled:
+            handle = self.handles.pop(shard, None)
+            if handle is not None:
+                handle.close()
+            with open(self.paths[shard], "r", encoding="utf-8") as spill:
+                shutil.copyfileobj(spill, f, 1024 * 1024)
+            os.remove(self.paths[shard])
+            if self.buffers[shard]:
+                f.write(self.item_separator)
+        if self.buffers[shard]:
+            f.write(self._encode(self.buffers[shard]))
+        f.write("]" if self.indent is None else "\n" + self.pad + "]")
+        self.memory -= self.buffered[shard]
+        self.buffers[shard] = []
+        self.buffered[shard] = 0
+
+    def close(self):
+        """Close the spill files and remove the spill directory."""
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Streaming download-to-parse pipeline.
+
+The download engine hands each page body to a StreamingParser instead of (or
+as well as) saving it. Pages go through a bounded queue to a pool of parser
+processes, and the structured records are written as soon as each page is
+parsed:
+
+  - artist catalog JSON, as written by extract_artist_songs.py
+  - track page URLs, as collected by extract_track_urls.py, appended to the
+    track downloader's to-download list
+
+Extraction overlaps with network wait, and pages no longer have to be written
+to disk and read back before they are parsed.
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from artist_parsers import DEFAULT_PARSER, parse_artist_html
+from track_links import TRACK_LINK_PATTERN, TRACK_URL_TEMPLATE
+
+
+def extract_records(url, html, parser=DEFAULT_PARSER):
+    """
+    Parse one artist page into its records.
+
+    Runs in a worker process, so the catalog JSON is serialized here too.
+    `parser` picks the HTML backend (see artist_parsers.py).
+
+    Returns:
+        Dictionary with the page URL, the artist's name, ID, song count and
+        serialized catalog (None when the page has no catalog) and the track
+        page URLs found on it
+    """
+    record = {"url": url, "artist": None, "artistId": None, "songs": 0, "json": None, "trackUrls": []}
+
+    artist_data = parse_artist_html(html, url, parser)
+    if artist_data:
+        record["artist"] = artist_data["artist"]
+        record["artistId"] = artist_data["artistId"]
+        record["songs"] = len(artist_data["songs"])
+        record["json"] = json.dumps(artist_data, indent=2, ensure_ascii=False)
+
+    record["trackUrls"] = [TRACK_URL_TEMPLATE.format(track_id) for track_id in TRACK_LINK_PATTERN.findall(html)]
+    return record
+
+
+class RecordWriter:
+    """
+    Write parsed records as they arrive.
+
+    Args:
+        artists_dir: Directory for the per-artist catalog JSON files, or None
+            to skip them
+        track_urls_file: URL list the new track URLs are appended to, or None
+            to skip them. URLs already in the file are not added again.
+    """
+
+    def __init__(self, artists_dir=None, track_urls_file=None):
+        self.artists_dir = artists_dir
+        self.track_urls_file = track_urls_file
+        self.artists_written = 0
+        self.track_urls_added = 0
+        self.failed = 0
+
+        if artists_dir:
+            os.makedirs(artists_dir, exist_ok=True)
+
+        self.seen_track_urls = set()
+        self.track_file = None
+        if track_urls_file:
+            if os.path.exists(track_urls_file):
+                with open(track_urls_file, "r") as f:
+                    self.seen_track_urls = {line.strip() for line in f if line.strip()}
+            self.track_file = open(track_urls_file, "a")
+
+    def write(self, record):
+        if record["json"] is None:
+            self.failed += 1
+            print(f"✗ Failed to extract data from {record['url']}")
+        elif self.artists_dir:
+            output_path = os.path.join(self.artists_dir, f"{record['artistId']}.json")
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(record["json"])
+            self.artists_written += 1
+            print(f"✓ Extracted {record['songs']} songs for {record['artist']}")
+
+        if self.track_file is not None:
+            for track_url in record["trackUrls"]:
+                if track_url not in self.seen_track_urls:
+                    self.seen_track_urls.add(track_url)
+                    self.track_file.write(track_url + "\n")
+                    self.track_urls_added += 1
+
+    def close(self):
+        if self.track_file is not None:
+            self.track_file.close()
+            self.track_file = None
+
+
+class StreamingParser:
+    """
+    Bounded queue of pages feeding a pool of parser processes.
+
+    `submit` waits while the queue is full, which slows the downloader down
+    to the speed of the parsers instead of buffering pages without limit.
+
+    Args:
+        writer: RecordWriter receiving the parsed records
+        workers: Parser processes; defaults to the number of CPUs
+        max_pending: Pages that may wait in the queue
+        parse: Function `(url, html) -> record` run in the workers
+    """
+
+    def __init__(self, writer, workers=None, max_pending=64, parse=extract_records):
+        self.writer = writer
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.parse = parse
+        self.queue = None
+        self.pool = None
+        self.tasks = []
+        self.parsed = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def submit(self, url, html):
+        await self.queue.put((url, html))
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                url, html = item
+                # A failure must not end this consumer, or submit() would block once the queue fills
+                try:
+                    record = await loop.run_in_executor(self.pool, self.parse, url, html)
+                    self.writer.write(record)
+                except Exception as e:
+                    print(f"✗ Error processing {url}: {e}")
+                    self.writer.failed += 1
+                    continue
+                self.parsed += 1
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        """Drain the queue, stop the workers and close the writer."""
+        for _ in self.tasks:
+            await self.queue.put(None)
+        await asyncio.gather(*self.tasks)
+        self.pool.shutdown()
+        self.writer.close()
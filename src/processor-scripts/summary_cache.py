@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Persistent per-file stats for the data-summary generators.
+
+generate_data_summary.py, update_summary.py and update_data_summary.py count
+unique trackIds (and, for the weekly charts, artists and dates) across many
+JSON files. This cache keeps, for every file it has read, the size and mtime
+it had and the set of values it contributed, plus a reference count per
+distinct value. A refresh stats each file, re-reads only the new or changed
+ones and drops the removed ones, updating the reference counts as it goes;
+the totals are then counts over the cache. Regenerating a summary after a
+small scrape reads only the pages that changed.
+
+Files are grouped into collections, one per directory (collection_name()),
+so each summary counts distinct values over its own files and reading one
+directory never disturbs another's entries. The cache is SQLite, kept in
+git_ignore/ next to the download queue. Deleting it forces a full rebuild.
+"""
+import json
+import os
+import sqlite3
+
+from artist_catalogs import load_catalog, load_catalogs
+
+CACHE_DB = "../../git_ignore/summary_cache.sqlite3"
+CACHE_VERSION = 2
+# Stored for a JSON null member value (a "trackId": null song), which counts
+# as one distinct value, as it does in a Python set
+NULL_VALUE = "\x00null"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    error TEXT,
+    UNIQUE (collection, path)
+);
+CREATE TABLE IF NOT EXISTS members (
+    file_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (file_id, kind, value)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS refs (
+    collection TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    refs INTEGER NOT NULL,
+    PRIMARY KEY (collection, kind, value)
+) WITHOUT ROWID;
+"""
+
+
+def artist_catalog_members(path):
+    """trackIds of an artist catalog file (src/data/latest/artists-songs/<id>.json)."""
+    catalog = load_catalog(path)
+    if catalog.error is not None:
+        raise ValueError(catalog.error)
+    return {"trackId": catalog.track_ids}
+
+
+def weekly_charts_members(path):
+    """Dates, track IDs and artists of global_charts_by_date.json."""
+    with open(path, "r", encoding="utf-8") as f:
+        charts_data = json.load(f)
+    dates, tracks, artists = [], [], []
+    for date, entries in charts_data.get("charts", {}).items():
+        dates.append(date)
+        for entry in entries:
+            if "track_id" in entry:
+                tracks.append(entry["track_id"])
+            if "artists" in entry:
+                artists.extend(entry["artists"])
+    return {"date": dates, "track": tracks, "artist": artists}
+
+
+def daily_totals_members(path):
+    """Artists and track IDs of global_daily_totals.json."""
+    with open(path, "r", encoding="utf-8") as f:
+        totals_data = json.load(f)
+    tracks, artists = [], []
+    for entry in totals_data:
+        if "artistId" in entry:
+            artists.append(entry["artist"])
+        if "trackId" in entry:
+            tracks.append(entry["trackId"])
+    return {"track": tracks, "artist": artists}
+
+
+def collection_name(kind, directory):
+    """Collection for the files of `directory`, e.g. ("artists", "../data/latest/artists-songs")."""
+    return f"{kind}:{os.path.abspath(directory)}"
+
+
+def _extract(extract, path):
+    try:
+        return extract(path), None
+    except (ValueError, FileNotFoundError) as e:
+        return {}, str(e)
+
+
+def _fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return (-1, -1)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class SummaryCache:
+    """
+    Per-file member sets and distinct-value counts stored in SQLite.
+
+    Args:
+        db_path: SQLite database file
+    """
+
+    def __init__(self, db_path=CACHE_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        if version != CACHE_VERSION:
+            for table in ("files", "members", "refs"):
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def refresh(self, collection, sources):
+        """
+        Bring a collection up to date with its files.
+
+        Args:
+            collection: Collection name
+            sources: Mapping of every file in the collection to the function
+                that reads it, `extract(path) -> {kind: values}`. Files that
+                fail with a ValueError (JSONDecodeError) or FileNotFoundError
+                are kept with their error and no members. Files of the
+                collection missing from `sources` are removed.
+
+        Returns:
+            (files read, files removed)
+        """
+        extracts = {os.path.abspath(path): extract for path, extract in sources.items()}
+
+        def read(stale):
+            for path in stale:
+                yield _extract(extracts[path], path)
+
+        return self.refresh_files(collection, extracts, read)
+
+    def refresh_files(self, collection, paths, read):
+        """
+        refresh() with the reading done in bulk: `read(stale_paths)` yields
+        `(members, error)` for each new or changed file, in order. Lets a
+        collection be read through a parallel loader.
+        """
+        known = {}
+        ids = {}
+        for file_id, path, size, mtime_ns in self.conn.execute(
+            "SELECT id, path, size, mtime_ns FROM files WHERE collection = ?", (collection,)
+        ):
+            known[path] = (size, mtime_ns)
+            ids[path] = file_id
+        wanted = {os.path.abspath(path) for path in paths}
+
+        fingerprints = {path: _fingerprint(path) for path in wanted}
+        stale = sorted(path for path in wanted if known.get(path) != fingerprints[path])
+        removed = [path for path in known if path not in wanted]
+        # Reference counts are adjusted per value for small updates and
+        # recounted from the member sets when much of the collection changed
+        recount = len(stale) + len(removed) > max(len(known) // 8, 1)
+
+        for path in removed:
+            self._forget(collection, ids[path], recount)
+        for path, (members, error) in zip(stale, read(stale)):
+            if path in known:
+                self._forget(collection, ids[path], recount)
+            self._record(collection, path, fingerprints[path], members, error, recount)
+
+        if recount:
+            self.conn.execute("DELETE FROM refs WHERE collection = ?", (collection,))
+            self.conn.execute(
+                "INSERT INTO refs (collection, kind, value, refs) SELECT files.collection, kind, value, COUNT(*) "
+                "FROM members JOIN files ON files.id = members.file_id WHERE files.collection = ? GROUP BY kind, value",
+                (collection,),
+            )
+        self.conn.commit()
+        return len(stale), len(removed)
+
+    def _forget(self, collection, file_id, recount=False):
+        if not recount:
+            file_members = "(kind, value) IN (SELECT kind, value FROM members WHERE file_id = ?)"
+            params = (collection, file_id)
+            self.conn.execute(f"UPDATE refs SET refs = refs - 1 WHERE collection = ? AND {file_members}", params)
+            self.conn.execute(f"DELETE FROM refs WHERE collection = ? AND refs <= 0 AND {file_members}", params)
+        self.conn.execute("DELETE FROM members WHERE file_id = ?", (file_id,))
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _record(self, collection, path, fingerprint, members, error, recount=False):
+        file_id = self.conn.execute(
+            "INSERT INTO files (collection, path, size, mtime_ns, error) VALUES (?, ?, ?, ?, ?)",
+            (collection, path, *fingerprint, error),
+        ).lastrowid
+        rows = [
+            (kind, NULL_VALUE if value is None else value) for kind, values in members.items() for value in set(values)
+        ]
+        self.conn.executemany(
+            "INSERT INTO members (file_id, kind, value) VALUES (?, ?, ?)", ((file_id, *row) for row in rows)
+        )
+        if recount:
+            return
+        self.conn.executemany(
+            "INSERT INTO refs (collection, kind, value, refs) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (collection, kind, value) DO UPDATE SET refs = refs + 1",
+            ((collection, *row) for row in rows),
+        )
+
+    def file_count(self, collection):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM files WHERE collection = ?", (collection,)).fetchone()
+        return count
+
+    def distinct(self, collection, kind):
+        """Number of distinct values of `kind` across the collection's files."""
+        (count,) = self.conn.execute(
+            "SELECT COUNT(*) FROM refs WHERE collection = ? AND kind = ?", (collection, kind)
+        ).fetchone()
+        return count
+
+    def errors(self, collection):
+        """(path, error) of the files that could not be read, by path."""
+        return self.conn.execute(
+            "SELECT path, error FROM files WHERE collection = ? AND error IS NOT NULL ORDER BY path", (collection,)
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def count_artist_catalogs(artists_dir, cache, collection=None, workers=1, catalogs=None):
+    """
+    Artist and unique song counts of a directory of artist catalog files.
+
+    Args:
+        artists_dir: Directory of <artistId>.json catalogs
+        cache: SummaryCache to refresh
+        collection: Cache collection the directory is kept under (default:
+            collection_name("artists", artists_dir))
+        workers: Worker processes for reading new or changed catalogs
+        catalogs: artist_catalogs.CatalogCache shared with other computations
+            in this run (default: none)
+
+    Returns:
+        ({"totalArtists": ..., "totalSongs": ...}, files read, files removed)
+    """
+    collection = collection or collection_name("artists", artists_dir)
+    paths = [os.path.join(artists_dir, name) for name in os.listdir(artists_dir) if name.endswith(".json")]
+
+    def read(stale):
+        for catalog in load_catalogs(stale, workers, catalogs):
+            yield {"trackId": catalog.track_ids}, catalog.error
+
+    read_count, removed = cache.refresh_files(collection, paths, read)
+    stats = {"totalArtists": cache.file_count(collection), "totalSongs": cache.distinct(collection, "trackId")}
+    return stats, read_count, removed
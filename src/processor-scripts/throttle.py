@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Adaptive request throttling for the download engine.
+
+HostThrottle runs an additive-increase / multiplicative-decrease (AIMD)
+controller for one host: while responses are healthy it slowly raises the
+number of requests in flight and the request rate, and on a 429, 503 or
+timeout it cuts both and pauses for the server's Retry-After. Retries use
+jittered exponential backoff with a cap.
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# Statuses that mean the server wants us to slow down
+BACKOFF_STATUSES = {429, 503}
+
+# Statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=1.0, cap=120.0):
+    """Full-jitter exponential backoff: a random delay up to base * 2^(attempt - 1), capped."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the request rate to a single host.
+
+    Tokens refill continuously at `rate` per second up to `burst`; each request
+    takes one token and waits when the bucket is empty.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class HostThrottle:
+    """
+    AIMD controller for the concurrency and request rate of one host.
+
+    Args:
+        concurrency: Starting number of requests in flight
+        max_concurrency: Upper bound for requests in flight
+        rate: Starting requests per second
+        max_rate: Upper bound for requests per second
+        burst: Token bucket size
+        increase_every: Successful responses between additive increases
+        rate_step: Requests per second added on each increase
+        decrease_factor: Multiplier applied to concurrency and rate on backoff
+        cooldown: Seconds after a backoff during which further backoff
+            signals are ignored, so one burst of 429s only counts once
+    """
+
+    def __init__(
+        self,
+        concurrency=2,
+        max_concurrency=8,
+        rate=4.0,
+        max_rate=20.0,
+        burst=2,
+        increase_every=10,
+        rate_step=1.0,
+        decrease_factor=0.7,
+        cooldown=2.0,
+    ):
+        self.limit = concurrency
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.min_rate = min(rate, 0.5)
+        self.increase_every = increase_every
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.paused_until = 0.0
+        self.last_backoff = 0.0
+        self.healthy_streak = 0
+
+        self.successes = 0
+        self.backoffs = 0
+        self.retries = 0
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    async def acquire(self):
+        """Wait for a free slot, any Retry-After pause and a rate token."""
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self.bucket.acquire()
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def on_success(self):
+        """Healthy response: additive increase after every `increase_every` since the last decrease."""
+        self.successes += 1
+        self.healthy_streak += 1
+        if self.healthy_streak < self.increase_every:
+            return
+        self.healthy_streak = 0
+        self.bucket.rate = min(self.max_rate, self.bucket.rate + self.rate_step)
+        if self.limit < self.max_concurrency:
+            async with self.condition:
+                self.limit += 1
+                self.condition.notify_all()
+
+    def on_backoff(self, retry_after=None):
+        """429, 503 or timeout: multiplicative decrease and an optional pause."""
+        now = time.monotonic()
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self.last_backoff < self.cooldown:
+            return
+        self.last_backoff = now
+        self.healthy_streak = 0
+        self.backoffs += 1
+        self.limit = max(1, int(self.limit * self.decrease_factor))
+        self.bucket.rate = max(self.min_rate, self.bucket.rate * self.decrease_factor)
+
+    def snapshot(self):
+        """Controller state for progress reports."""
+        return {
+            "concurrency": self.limit,
+            "inFlight": self.in_flight,
+            "rate": round(self.bucket.rate, 2),
+            "paused": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "successes": self.successes,
+            "backoffs": self.backoffs,
+            "retries": self.retries,
+        }
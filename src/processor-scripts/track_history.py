@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Parse kworb track pages into a columnar per-track time series store.
+
+Each track page has a history table: a Date column followed by one column per
+chart, where a cell holds the track's position and, in parentheses, the day's
+streams. For one chart (Global by default) every track's series is appended
+to three flat little-endian arrays:
+
+  days.i32       date, as days since 1970-01-01
+  streams.i64    streams on that day (or summed over the week with --weekly)
+  positions.i16  chart position (the best position of the week with --weekly)
+
+index.json maps each track ID to [offset, length, title, artist, artistId],
+so looking up a track costs one dict lookup and one slice of each array,
+instead of loading and scanning whole JSON documents.
+
+Usage:
+  python3 track_history.py
+  python3 track_history.py --input-dir ../../git_ignore/downloaded_html_weekly --output-dir ../data/track-history
+  python3 track_history.py --archive ../../git_ignore/page_archive --chart US --weekly
+  python3 track_history.py --show 0VjIjW4GlUZAMYd2vXMi3b
+"""
+import argparse
+import functools
+import html
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from ordered_pool import iter_chunks, map_chunks_in_order
+from page_archive import PageArchive
+
+INPUT_DIR = "../../git_ignore/downloaded_html_weekly"
+OUTPUT_DIR = "../data/track-history"
+DEFAULT_CHART = "Global"
+
+INDEX_FILE = "index.json"
+STORE_VERSION = 1
+# file name -> array typecode; "i", "q" and "h" are 4, 8 and 2 bytes on every supported platform
+COLUMNS = {"days": ("days.i32", "i"), "streams": ("streams.i64", "q"), "positions": ("positions.i16", "h")}
+
+EPOCH = date(1970, 1, 1)
+
+TRACK_ID_PATTERN = re.compile(r"track[/_]([A-Za-z0-9]+)\.html")
+PAGE_TITLE_PATTERN = re.compile(
+    r'<span class="pagetitle"><a href="[^"]*/artist/([A-Za-z0-9]+)\.html">(.*?)</a>\s*-\s*(.*?)</span>', re.S
+)
+TITLE_PATTERN = re.compile(r"<title>(.*?) - (.*?) - Spotify Chart History</title>", re.S)
+HEADER_PATTERN = re.compile(r"<tr[^>]*>\s*(<th[^>]*>\s*Date\s*</th>.*?)</tr>", re.S | re.I)
+HEADER_CELL_PATTERN = re.compile(r"<th[^>]*>(.*?)</th>", re.S)
+ROW_PATTERN = re.compile(r"<tr[^>]*>(.*?)</tr>", re.S)
+CELL_PATTERN = re.compile(r"<td[^>]*>(.*?)</td>", re.S)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+DATE_PATTERN = re.compile(r"(\d{4})[/-](\d{2})[/-](\d{2})")
+VALUE_PATTERN = re.compile(r"^\s*(\d+)\s*\(\s*([\d,]+)\s*\)")
+
+
+def cell_text(fragment):
+    return html.unescape(TAG_PATTERN.sub("", fragment)).strip()
+
+
+def parse_track_page(content, chart=DEFAULT_CHART):
+    """
+    Extract one chart's history from a track page.
+
+    Returns:
+        Dictionary with the title, artist, artistId and the `days`, `streams`
+        and `positions` lists in date order, or None when the page has no
+        history table or no column for `chart`
+    """
+    header = HEADER_PATTERN.search(content)
+    if not header:
+        return None
+    columns = [cell_text(cell) for cell in HEADER_CELL_PATTERN.findall(header.group(1))]
+    if chart not in columns:
+        return None
+    column = columns.index(chart)
+
+    series = {}
+    for row in ROW_PATTERN.finditer(content, header.end()):
+        cells = CELL_PATTERN.findall(row.group(1))
+        if len(cells) <= column:
+            continue
+        date_match = DATE_PATTERN.search(cells[0])
+        value_match = VALUE_PATTERN.match(cell_text(cells[column]))
+        if not date_match or not value_match:
+            continue
+        day = (date(*map(int, date_match.groups())) - EPOCH).days
+        series[day] = (int(value_match.group(2).replace(",", "")), int(value_match.group(1)))
+
+    days = sorted(series)
+    title_match = PAGE_TITLE_PATTERN.search(content)
+    if title_match:
+        artist_id = title_match.group(1)
+        artist, title = cell_text(title_match.group(2)), cell_text(title_match.group(3))
+    else:
+        title_tag = TITLE_PATTERN.search(content)
+        artist_id = None
+        artist, title = (html.unescape(part) for part in title_tag.groups()) if title_tag else (None, None)
+
+    return {
+        "title": title,
+        "artist": artist,
+        "artistId": artist_id,
+        "days": days,
+        "streams": [series[day][0] for day in days],
+        "positions": [series[day][1] for day in days],
+    }
+
+
+def to_weekly(track):
+    """
+    Sum a daily series into Spotify chart weeks (Friday to Thursday).
+
+    Each week is dated by its Thursday; its position is the best daily
+    position of the week.
+    """
+    weeks = {}
+    for day, streams, position in zip(track["days"], track["streams"], track["positions"]):
+        # 1970-01-01 was a Thursday, so (day - 1) // 7 groups Friday..Thursday
+        week_end = (day - 1) // 7 * 7 + 7
+        total, best = weeks.get(week_end, (0, position))
+        weeks[week_end] = (total + streams, min(best, position))
+    days = sorted(weeks)
+    return dict(track, days=days, streams=[weeks[d][0] for d in days], positions=[weeks[d][1] for d in days])
+
+
+def track_id_from_name(name):
+    match = TRACK_ID_PATTERN.search(name)
+    return match.group(1) if match else None
+
+
+def parse_chunk(pages, chart=DEFAULT_CHART, weekly=False):
+    """
+    Parse a chunk of (name, path, html) pages; runs in a worker process.
+
+    Returns:
+        List of (track ID, track or None) in input order
+    """
+    results = []
+    for name, path, content in pages:
+        if content is None:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+        track = parse_track_page(content, chart)
+        if track is not None and weekly:
+            track = to_weekly(track)
+        results.append((track_id_from_name(name), track))
+    return results
+
+
+def iter_track_pages(input_dir, archive_dir=None):
+    """Yield (name, path, html) for every track page; loose files come with html None."""
+    if archive_dir:
+        with PageArchive(archive_dir) as archive:
+            keys = [key for key in archive.keys() if "/track/" in key]
+            for key, content in archive.iter_pages(keys):
+                yield key, None, content
+        return
+
+    for filename in sorted(os.listdir(input_dir)):
+        if track_id_from_name(filename) and filename.endswith(".html"):
+            yield filename, os.path.join(input_dir, filename), None
+
+
+class TrackHistoryWriter:
+    """
+    Append track series to the columnar store.
+
+    Files are written under temporary names and moved into place by close(),
+    so readers never see a half-written store.
+    """
+
+    def __init__(self, output_dir, chart=DEFAULT_CHART, weekly=False):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.files = {
+            column: open(os.path.join(output_dir, filename + ".tmp"), "wb")
+            for column, (filename, _) in COLUMNS.items()
+        }
+        self.index = {}
+        self.meta = {"version": STORE_VERSION, "chart": chart, "weekly": weekly}
+        self.offset = 0
+
+    def add(self, track_id, track):
+        if track_id in self.index or not track["days"]:
+            return False
+        for column, (_, typecode) in COLUMNS.items():
+            values = array(typecode, track[column])
+            if sys.byteorder != "little":
+                values.byteswap()
+            values.tofile(self.files[column])
+        length = len(track["days"])
+        self.index[track_id] = [self.offset, length, track["title"], track["artist"], track["artistId"]]
+        self.offset += length
+        return True
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        for filename, _ in COLUMNS.values():
+            path = os.path.join(self.output_dir, filename)
+            os.replace(path + ".tmp", path)
+        index_path = os.path.join(self.output_dir, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dict(self.meta, tracks=self.index), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(index_path + ".tmp", index_path)
+
+
+class TrackHistoryStore:
+    """
+    Read-only access to a store written by TrackHistoryWriter.
+
+    The arrays are memory-mapped; `get` slices out one track's values.
+    """
+
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported track history store version: {data.get('version')}")
+        self.chart = data["chart"]
+        self.weekly = data["weekly"]
+        self.tracks = data["tracks"]
+
+        self.maps = {}
+        self.views = {}
+        for column, (filename, typecode) in COLUMNS.items():
+            with open(os.path.join(store_dir, filename), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    self.views[column] = memoryview(b"").cast(typecode)
+                    continue
+                self.maps[column] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.views[column] = memoryview(self.maps[column]).cast(typecode)
+
+    def __contains__(self, track_id):
+        return track_id in self.tracks
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def get(self, track_id):
+        """Series of one track as a dict with ISO `dates`, `streams` and `positions`, or None."""
+        entry = self.tracks.get(track_id)
+        if entry is None:
+            return None
+        offset, length, title, artist, artist_id = entry
+        window = slice(offset, offset + length)
+        values = {}
+        for column, (_, typecode) in COLUMNS.items():
+            values[column] = array(typecode, self.views[column][window])
+            if sys.byteorder != "little":
+                values[column].byteswap()
+        return {
+            "trackId": track_id,
+            "title": title,
+            "artist": artist,
+            "artistId": artist_id,
+            "dates": [(EPOCH + timedelta(days=day)).isoformat() for day in values["days"]],
+            "streams": values["streams"].tolist(),
+            "positions": values["positions"].tolist(),
+        }
+
+    def close(self):
+        for view in self.views.values():
+            view.release()
+        for mapped in self.maps.values():
+            mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_store(
+    input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, archive_dir=None, chart=DEFAULT_CHART, weekly=False, workers=1
+):
+    """
+    Parse every track page and write the store.
+
+    Returns:
+        Number of tracks stored
+    """
+    writer = TrackHistoryWriter(output_dir, chart, weekly)
+    pages = iter_track_pages(input_dir, archive_dir)
+    parse = functools.partial(parse_chunk, chart=chart, weekly=weekly)
+
+    processed = 0
+    skipped = 0
+    started = time.monotonic()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is not None:
+            results = map_chunks_in_order(executor, parse, iter_chunks(pages, 64), workers * 4)
+        else:
+            results = (result for chunk in iter_chunks(pages, 64) for result in parse(chunk))
+
+        for track_id, track in results:
+            processed += 1
+            if track_id is None or track is None or not writer.add(track_id, track):
+                skipped += 1
+            if processed % 10000 == 0:
+                rate = processed / max(time.monotonic() - started, 1e-9)
+                print(f"  {processed:,} pages ({rate:,.0f}/s), {len(writer.index):,} tracks")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    writer.close()
+
+    print(f"Stored {len(writer.index):,} tracks ({writer.offset:,} {'weeks' if weekly else 'days'}) in {output_dir}")
+    if skipped:
+        print(f"Skipped {skipped:,} pages without a {chart} history")
+    return len(writer.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the per-track history store from kworb track pages")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Directory of downloaded track pages")
+    parser.add_argument("--archive", metavar="DIR", help="Read pages from a page archive instead of loose files")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Directory for the store")
+    parser.add_argument("--chart", default=DEFAULT_CHART, help="Chart column to store (default: Global)")
+    parser.add_argument("--weekly", action="store_true", help="Store Friday-Thursday weekly sums instead of days")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--show", metavar="TRACK_ID", help="Print one track from an existing store and exit")
+    args = parser.parse_args()
+
+    if args.show:
+        with TrackHistoryStore(args.output_dir) as store:
+            track = store.get(args.show)
+        if track is None:
+            print(f"{args.show} is not in {args.output_dir}")
+            return
+        print(json.dumps(track, indent=2, ensure_ascii=False))
+        return
+
+    build_store(args.input_dir, args.output_dir, args.archive, args.chart, args.weekly, args.workers)
+
+
+if __name__ == "__main__":
+    main()
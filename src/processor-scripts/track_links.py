@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Track page links on kworb artist pages.
+
+The link pattern is shared by extract_track_urls.py and the streaming
+pipeline. scan_file runs the bytes form of the pattern over a memory-mapped
+file, so pages are neither decoded nor copied into Python strings.
+"""
+import mmap
+import os
+import re
+
+# Looking for: <td class="text"><div><a href="../track/TRACK_ID.html">
+TRACK_LINK_PATTERN = re.compile(r'<td class="text"><div><a href="\.\./track/([a-zA-Z0-9]+)\.html">')
+TRACK_LINK_BYTES_PATTERN = re.compile(TRACK_LINK_PATTERN.pattern.encode("ascii"))
+TRACK_URL_TEMPLATE = "https://kworb.net/spotify/track/{}.html"
+
+
+def scan_bytes(data):
+    """Track IDs linked from a page given as bytes (or any buffer), in page order."""
+    return [track_id.decode("ascii") for track_id in TRACK_LINK_BYTES_PATTERN.findall(data)]
+
+
+def scan_file(path):
+    """Track IDs linked from the page at `path`, scanned through mmap."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan_bytes(data)
+
+
+def scan_files(paths):
+    """
+    Scan a chunk of pages; runs in a worker process.
+
+    IDs already seen earlier in the chunk are dropped, which keeps the first
+    occurrence of every ID and sends less back to the parent.
+
+    Returns:
+        List of (path, new track IDs, links found, error message or None) in
+        input order
+    """
+    seen = set()
+    results = []
+    for path in paths:
+        try:
+            track_ids = scan_file(path)
+        except (OSError, ValueError) as e:
+            results.append((path, [], 0, str(e)))
+            continue
+        new_ids = [track_id for track_id in track_ids if not (track_id in seen or seen.add(track_id))]
+        results.append((path, new_ids, len(track_ids), None))
+    return results
@@ -1,42 +1,36 @@
 #!/usr/bin/env python3
 """
 Script to update data summary with total artists and songs count for both latest and weekly data.
+
+Per-file stats are kept in a cache (summary_cache.py): artist files and the
+weekly charts JSON are read again only when their size or mtime changed.
+Artist files are read in parallel through artist_catalogs.py.
 """
 
 import json
 import os
-from collections import defaultdict
 from pathlib import Path
 
+from summary_cache import (
+    SummaryCache,
+    collection_name,
+    count_artist_catalogs,
+    daily_totals_members,
+    weekly_charts_members,
+)
+
 
-def count_latest_data():
+def count_latest_data(cache):
     """Count artists and songs in the latest data directory."""
     data_dir = Path("../data/latest")
     artists_dir = data_dir / "artists-songs"
 
     print("Counting latest data...")
 
-    # Count artists (number of JSON files)
-    artist_files = list(artists_dir.glob("*.json"))
-    total_artists = len(artist_files)
-
-    # Count unique songs across all artists
-    unique_songs = set()
-
-    for artist_file in artist_files:
-        try:
-            with open(artist_file, "r", encoding="utf-8") as f:
-                artist_data = json.load(f)
-
-            # Add track IDs to set
-            for song in artist_data.get("songs", []):
-                if "trackId" in song:
-                    unique_songs.add(song["trackId"])
-
-        except (json.JSONDecodeError, FileNotFoundError):
-            continue
-
-    total_songs = len(unique_songs)
+    # Count artists (number of JSON files) and unique songs across all artists
+    stats, _, _ = count_artist_catalogs(artists_dir, cache, workers=os.cpu_count() or 1)
+    total_artists = stats["totalArtists"]
+    total_songs = stats["totalSongs"]
 
     print(f"   Latest - Total Artists: {total_artists:,}")
     print(f"   Latest - Total Songs: {total_songs:,}")
@@ -44,64 +38,30 @@ def count_latest_data():
     return {"totalArtists": total_artists, "totalSongs": total_songs}
 
 
-def count_weekly_data():
+def count_weekly_data(cache):
     """Count artists and songs in the weekly data."""
     weekly_dir = Path("../data/weekly")
 
     print("Counting weekly data...")
 
-    # Initialize counters
-    unique_artists = set()
-    unique_songs = set()
-    unique_dates = set()
-
-    # Process global_charts_by_date.json
+    # global_charts_by_date.json gives dates, track IDs and artists;
+    # global_daily_totals.json adds its own track IDs and artists
+    sources = {}
     charts_file = weekly_dir / "global_charts_by_date.json"
     if charts_file.exists():
-        try:
-            with open(charts_file, "r", encoding="utf-8") as f:
-                charts_data = json.load(f)
-
-            # Get metadata if available
-            metadata = charts_data.get("metadata", {})
-
-            # Count from charts data
-            charts = charts_data.get("charts", {})
-            for date, entries in charts.items():
-                unique_dates.add(date)
-                for entry in entries:
-                    # Add track ID
-                    if "track_id" in entry:
-                        unique_songs.add(entry["track_id"])
-
-                    # Add artists
-                    if "artists" in entry:
-                        for artist in entry["artists"]:
-                            unique_artists.add(artist)
-
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            print(f"Error reading charts data: {e}")
-
-    # Process global_daily_totals.json
+        sources[charts_file] = weekly_charts_members
     totals_file = weekly_dir / "global_daily_totals.json"
     if totals_file.exists():
-        try:
-            with open(totals_file, "r", encoding="utf-8") as f:
-                totals_data = json.load(f)
-
-            # Count from daily totals
-            for entry in totals_data:
-                if "artistId" in entry:
-                    unique_artists.add(entry["artist"])
-                if "trackId" in entry:
-                    unique_songs.add(entry["trackId"])
+        sources[totals_file] = daily_totals_members
 
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            print(f"Error reading daily totals: {e}")
+    collection = collection_name("weekly", weekly_dir)
+    cache.refresh(collection, sources)
+    for path, error in cache.errors(collection):
+        print(f"Error reading {os.path.basename(path)}: {error}")
 
-    total_artists = len(unique_artists)
-    total_songs = len(unique_songs)
-    total_dates = len(unique_dates)
+    total_artists = cache.distinct(collection, "artist")
+    total_songs = cache.distinct(collection, "track")
+    total_dates = cache.distinct(collection, "date")
 
     print(f"   Weekly - Total Artists: {total_artists:,}")
     print(f"   Weekly - Total Songs: {total_songs:,}")
@@ -114,8 +74,9 @@ def update_data_summary():
     """Generate and update data summary with artist and song counts."""
 
     # Get counts for both latest and weekly data
-    latest_stats = count_latest_data()
-    weekly_stats = count_weekly_data()
+    with SummaryCache() as cache:
+        latest_stats = count_latest_data(cache)
+        weekly_stats = count_weekly_data(cache)
 
     # Prepare summary data
     summary = {"latest": latest_stats, "weekly": weekly_stats}
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """
 Quick script to update data summary with total artists and songs count.
+
+Only artist files added or changed since the last run are read (in parallel,
+via artist_catalogs.py); the rest come from the stats cache (summary_cache.py).
 """
 
 import json
 import os
 from pathlib import Path
 
+from summary_cache import SummaryCache, count_artist_catalogs
+
 
 def update_data_summary():
     """Generate and update data summary with artist and song counts."""
@@ -18,27 +23,12 @@ def update_data_summary():
 
     print("Counting artists and songs...")
 
-    # Count artists (number of JSON files)
-    artist_files = list(artists_dir.glob("*.json"))
-    total_artists = len(artist_files)
-
-    # Count unique songs across all artists
-    unique_songs = set()
-
-    for artist_file in artist_files:
-        try:
-            with open(artist_file, "r", encoding="utf-8") as f:
-                artist_data = json.load(f)
-
-            # Add track IDs to set
-            for song in artist_data.get("songs", []):
-                if "trackId" in song:
-                    unique_songs.add(song["trackId"])
-
-        except (json.JSONDecodeError, FileNotFoundError):
-            continue
+    # Count artists (number of JSON files) and unique songs across all artists
+    with SummaryCache() as cache:
+        summary, _, _ = count_artist_catalogs(artists_dir, cache, workers=os.cpu_count() or 1)
 
-    total_songs = len(unique_songs)
+    total_artists = summary["totalArtists"]
+    total_songs = summary["totalSongs"]
 
     # Prepare summary data
     summary = {"totalArtists": total_artists, "totalSongs": total_songs}
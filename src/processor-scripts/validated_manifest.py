@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Persistent manifest of HTML files that have passed validation.
+
+Each entry maps a filename to the size and mtime it had when it was checked.
+On startup only files whose size or mtime changed (or that are new) are read
+again, so restarting a download over a large directory costs one directory
+scan instead of one file read per page.
+"""
+import json
+import os
+
+MANIFEST_FILE = ".validated_manifest.json"
+MANIFEST_VERSION = 1
+
+
+class ValidatedManifest:
+    """
+    Validated-file manifest stored as JSON inside the directory it describes.
+
+    Args:
+        directory: Directory of .html files
+        manifest_file: Filename of the manifest within `directory`
+    """
+
+    def __init__(self, directory, manifest_file=MANIFEST_FILE):
+        self.directory = directory
+        self.path = os.path.join(directory, manifest_file)
+        self.files = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = {name: tuple(entry) for name, entry in data.get("files", {}).items()}
+
+    def save(self):
+        """Write the manifest if it changed, replacing the old file atomically."""
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __contains__(self, filename):
+        return filename in self.files
+
+    def add(self, filename, stat=None):
+        """Record a file as valid with its current size and mtime."""
+        if stat is None:
+            stat = os.stat(os.path.join(self.directory, filename))
+        self.files[filename] = (stat.st_size, stat.st_mtime_ns)
+        self.dirty = True
+
+    def discard(self, filename):
+        if self.files.pop(filename, None) is not None:
+            self.dirty = True
+
+    def sweep(self, is_valid, remove_invalid=True):
+        """
+        Bring the manifest in line with the directory.
+
+        Files whose size and mtime match their entry are trusted; every other
+        .html file is checked with `is_valid(filepath)` and removed when it
+        fails (if `remove_invalid`). Entries for deleted files are dropped.
+
+        Returns:
+            (checked, removed) counts
+        """
+        seen = set()
+        checked = 0
+        removed = 0
+
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".html"):
+                    continue
+                stat = entry.stat()
+                seen.add(entry.name)
+                if self.files.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+
+                checked += 1
+                if is_valid(entry.path):
+                    self.add(entry.name, stat)
+                else:
+                    self.discard(entry.name)
+                    if remove_invalid:
+                        print(f"Removing corrupted file: {entry.name}")
+                        os.remove(entry.path)
+                        removed += 1
+
+        for name in [name for name in self.files if name not in seen]:
+            self.discard(name)
+
+        return checked, removed